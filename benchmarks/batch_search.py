@@ -0,0 +1,164 @@
+"""
+Throughput of search_records_many against a loop of search_records calls.
+
+Every backend is seeded with the same chunks, then the same queries are searched
+one by one and in a single search_records_many call. The embeddings model answers
+each request after --embed-latency-ms (up to --embed-batch texts per request) to
+stand in for the remote embedding API, so batching the query embeddings shows.
+The results of both paths are compared. The in process backends need no store,
+"pg" needs PG_CONNECTION (see pg_common.py) and "local" needs hnswlib.
+
+    python benchmarks/batch_search.py --backends memory local chroma --queries 500
+"""
+
+import argparse
+import tempfile
+import time
+import uuid
+
+from common import timed, write_report
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from wizit_context_ingestor.infra.rag.kdb_registry import create_embeddings_manager
+
+
+class RemoteEmbeddings(Embeddings):
+    """Fake embeddings with the batched embed API and latency of a remote model."""
+
+    def __init__(self, vector_size: int, latency_seconds: float, batch: int):
+        self.embeddings = DeterministicFakeEmbedding(size=vector_size)
+        self.latency_seconds = latency_seconds
+        self.batch = batch
+        self.requests = 0
+
+    def embed(
+        self,
+        texts: list[str],
+        batch_size: int = 0,
+        embeddings_task_type: str | None = None,
+        dimensions: int | None = None,
+    ) -> list[list[float]]:
+        for _ in range(0, len(texts), self.batch):
+            self.requests += 1
+            time.sleep(self.latency_seconds)
+        return self.embeddings.embed_documents(texts)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        # chunks are embedded without latency, only searches are measured
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed([text], embeddings_task_type="RETRIEVAL_QUERY")[0]
+
+
+def gen_chunks(size: int, chunks_per_file: int) -> list[Document]:
+    return [
+        Document(
+            page_content=f"chunk {index} of file {index // chunks_per_file}",
+            metadata={"source": f"file_{index // chunks_per_file}"},
+        )
+        for index in range(size)
+    ]
+
+
+def create_manager(backend: str, embeddings, workdir: str, args):
+    if backend == "pg":
+        from pg_common import create_benchmark_manager
+
+        manager = create_benchmark_manager(
+            vector_size=args.vector_size, table_prefix="bench_many"
+        )
+        manager.embeddings_model = embeddings
+        return manager
+    kdb_params = {}
+    if backend == "local":
+        kdb_params = {"index_path": f"{workdir}/local"}
+    elif backend == "chroma":
+        kdb_params = {
+            "collection_name": f"bench_{uuid.uuid4().hex[:8]}",
+            "persist_directory": f"{workdir}/chroma",
+        }
+    return create_embeddings_manager(backend, embeddings, **kdb_params)
+
+
+def benchmark_backend(backend: str, chunks, queries, args) -> dict:
+    embeddings = RemoteEmbeddings(
+        args.vector_size, args.embed_latency_ms / 1000, args.embed_batch
+    )
+    result = {"backend": backend}
+    timings = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        manager = create_manager(backend, embeddings, workdir, args)
+        with timed(timings, "seed"):
+            manager.bulk_index_documents(chunks)
+        for filters_name, filters in (
+            ("unfiltered", None),
+            ("filtered", {"source": [f"file_{index}" for index in range(3)]}),
+        ):
+            embeddings.requests = 0
+            with timed(timings, f"{filters_name}_loop"):
+                one_by_one = [
+                    manager.search_records(query, k=args.k, filters=filters)
+                    for query in queries
+                ]
+            loop_requests = embeddings.requests
+            embeddings.requests = 0
+            with timed(timings, f"{filters_name}_many"):
+                batched = manager.search_records_many(
+                    queries, k=args.k, filters=filters
+                )
+            result[filters_name] = {
+                "loop_queries_per_second": len(queries)
+                / timings[f"{filters_name}_loop"],
+                "many_queries_per_second": len(queries)
+                / timings[f"{filters_name}_many"],
+                "speedup": timings[f"{filters_name}_loop"]
+                / timings[f"{filters_name}_many"],
+                "loop_embedding_requests": loop_requests,
+                "many_embedding_requests": embeddings.requests,
+                "same_results": all(
+                    [doc.id for doc in single] == [doc.id for doc in many]
+                    for single, many in zip(one_by_one, batched)
+                ),
+            }
+        if hasattr(manager, "close"):
+            manager.close()
+        if backend == "pg":
+            from pg_common import drop_benchmark_tables
+
+            drop_benchmark_tables(manager)
+    result["seed_seconds"] = timings["seed"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=["memory", "local", "chroma"],
+        choices=["memory", "local", "chroma", "pg"],
+    )
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--chunks-per-file", type=int, default=200)
+    parser.add_argument("--vector-size", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--embed-latency-ms", type=float, default=40)
+    parser.add_argument("--embed-batch", type=int, default=250)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    chunks = gen_chunks(args.chunks, args.chunks_per_file)
+    queries = [
+        f"question {index} about file {index % 50}" for index in range(args.queries)
+    ]
+    results = [
+        benchmark_backend(backend, chunks, queries, args) for backend in args.backends
+    ]
+    write_report("batch_search", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Ingestion throughput of the Chroma backend on a local persistent client.
+
+Chunks spread over files of --chunks-per-file chunks are indexed file by file
+with add_documents (the previous behaviour, a single call fails above the max
+batch size of chroma) and with batched, concurrent index_documents, in chunks
+per second. Embeddings are fake, --embed-latency-ms simulates the round trip
+of a remote embeddings model per call. A source is then deleted and a filtered
+search is timed.
+
+    python benchmarks/chroma_ingest.py --sizes 10000 50000
+"""
+
+import argparse
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+from common import latency_summary, timed, write_report
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from wizit_context_ingestor.infra.rag.chroma_embeddings import (
+    ChromaEmbeddingsManager,
+)
+
+
+class SlowFakeEmbedding(DeterministicFakeEmbedding):
+    """Fake embeddings paying a fixed latency per call, like a remote model."""
+
+    latency_seconds: float = 0.0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        time.sleep(self.latency_seconds)
+        return super().embed_documents(texts)
+
+
+def gen_chunks(size: int, chunks_per_file: int) -> list[Document]:
+    return [
+        Document(
+            id=str(uuid.uuid5(uuid.NAMESPACE_OID, f"chunk-{index}")),
+            page_content=f"chunk {index} of file {index // chunks_per_file}",
+            metadata={"source": f"file_{index // chunks_per_file}", "chunk": index},
+        )
+        for index in range(size)
+    ]
+
+
+def create_manager(persist_directory: str, args, **manager_params):
+    embeddings = SlowFakeEmbedding(
+        size=args.vector_size, latency_seconds=args.embed_latency_ms / 1000
+    )
+    return ChromaEmbeddingsManager(
+        embeddings,
+        collection_name=f"bench_{uuid.uuid4().hex[:8]}",
+        persist_directory=persist_directory,
+        **manager_params,
+    )
+
+
+def benchmark_size(size: int, persist_directory: str, args) -> dict:
+    result = {"chunks": size}
+    timings = {}
+    chunks = gen_chunks(size, args.chunks_per_file)
+
+    chunks_by_file = defaultdict(list)
+    for chunk in chunks:
+        chunks_by_file[chunk.metadata["source"]].append(chunk)
+    manager = create_manager(persist_directory, args)
+    with timed(timings, "per_file"):
+        for file_chunks in chunks_by_file.values():
+            manager.chroma.add_documents(file_chunks)
+
+    manager = create_manager(
+        persist_directory,
+        args,
+        batch_size=args.batch_size,
+        max_concurrent_batches=args.max_concurrent_batches,
+    )
+    with timed(timings, "batched"):
+        manager.index_documents(chunks)
+    with timed(timings, "reindex_unchanged"):
+        result["reindex_result"] = manager.bulk_index_documents(chunks)
+    with timed(timings, "delete_source"):
+        result["delete_result"] = manager.delete_documents_by_source_id("file_0")
+
+    latencies = []
+    for query_index in range(args.queries):
+        start = time.perf_counter()
+        manager.search_records(
+            f"chunk {query_index}",
+            k=5,
+            filters={"source": [f"file_{query_index % 10 + 1}", "file_20"]},
+        )
+        latencies.append(time.perf_counter() - start)
+    result["filtered_search"] = latency_summary(latencies)
+
+    for name, seconds in timings.items():
+        result[f"{name}_seconds"] = seconds
+    for name in ("per_file", "batched"):
+        result[f"{name}_chunks_per_second"] = size / timings[name]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--chunks-per-file", type=int, default=200)
+    parser.add_argument("--vector-size", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-concurrent-batches", type=int, default=4)
+    parser.add_argument("--embed-latency-ms", type=float, default=50)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as persist_directory:
+        results = [benchmark_size(size, persist_directory, args) for size in args.sizes]
+    write_report("chroma_ingest", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
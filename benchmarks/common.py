@@ -0,0 +1,82 @@
+"""Helpers shared by the benchmark scripts."""
+
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager, redirect_stdout
+
+from langchain_core.embeddings import Embeddings
+
+SRC_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"
+)
+if SRC_PATH not in sys.path:
+    sys.path.insert(0, SRC_PATH)
+
+# library logs would drown the JSON report
+logging.disable(logging.CRITICAL)
+
+
+@contextmanager
+def timed(timings: dict, name: str):
+    """Store the elapsed seconds of the block in timings[name]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+@contextmanager
+def discard_stdout():
+    """Discard what the block prints, without keeping it in memory."""
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        yield
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[rank]
+
+
+def latency_summary(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "mean_ms": (statistics.fmean(values) * 1000) if values else 0.0,
+    }
+
+
+def write_report(benchmark: str, results: dict, output: str | None = None) -> dict:
+    """Print the JSON report of a benchmark, and write it to output when given."""
+    report = {"benchmark": benchmark, "results": results}
+    print(json.dumps(report, indent=2, default=str))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+    return report
+
+
+class QueryVectors(Embeddings):
+    """Embeddings stand-in returning the precomputed vector of each query."""
+
+    def __init__(self, vectors: dict[str, list[float]]):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.vectors[text]
+
+
+def recall(found: list[list[str]], expected: list[list[str]]) -> float:
+    hits = sum(len(set(ids) & set(exact)) for ids, exact in zip(found, expected))
+    return hits / max(sum(map(len, expected)), 1)
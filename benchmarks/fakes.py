@@ -0,0 +1,284 @@
+"""Offline stand-ins for the models and storage of the pipeline benchmarks.
+
+Fake chat models and embeddings answer after a configurable latency with jitter
+and report token usage like the real providers, storage reads local files or
+memory, and synthetic PDFs mix text, table and scanned pages.
+"""
+
+import io
+import json
+import random
+import threading
+import time
+import uuid
+from typing import Any, List, Optional
+
+import pymupdf
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from PIL import Image
+
+LOW_QUALITY_MARKER = "[low quality]"
+# tokens billed for a page image by the usual vision models
+IMAGE_TOKENS = 1600
+WORDS = (
+    "revenue costs headcount region quarter growth margin forecast budget "
+    "contract supplier invoice balance payment policy report audit risk "
+    "customer product market share target review plan result"
+).split()
+
+
+def gen_sentences(words: int, rng: random.Random) -> str:
+    """Text of about words words, in sentences of 8 to 16 words."""
+    sentences = []
+    while words > 0:
+        length = min(rng.randint(8, 16), max(words, 1))
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(f"{sentence.capitalize()}.")
+        words -= length
+    return " ".join(sentences)
+
+
+class FakeVisionChatModel(BaseChatModel):
+    """Fake chat model transcribing and scoring pages after a latency."""
+
+    model_id: str
+    latency_seconds: float
+    jitter: float = 0.25
+    failure_rate: float = 0.0
+    transcription_tokens: int = 600
+    seed: int = 7
+    rng: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "vision-fake"
+
+    def with_structured_output(self, schema, **kwargs):
+        return self.bind(schema_name=schema.__name__) | RunnableLambda(
+            lambda message: schema.model_validate_json(message.content)
+        )
+
+    def _sleep(self):
+        if self.rng is None:
+            self.rng = random.Random(self.seed)
+        time.sleep(
+            self.latency_seconds * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        )
+
+    def _input_tokens(self, messages: List[BaseMessage]) -> int:
+        tokens = 0
+        for message in messages:
+            if isinstance(message.content, str):
+                tokens += len(message.content) // 4
+                continue
+            for part in message.content:
+                if part.get("type") == "image_url":
+                    tokens += IMAGE_TOKENS
+                else:
+                    tokens += len(part.get("text", "")) // 4
+        return tokens
+
+    def _result(
+        self, messages: List[BaseMessage], message: AIMessage, output_tokens: int
+    ) -> ChatResult:
+        input_tokens = self._input_tokens(messages)
+        message.response_metadata = {"model_name": self.model_id}
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        schema_name: str = "Transcription",
+        **kwargs,
+    ) -> ChatResult:
+        self._sleep()
+        if schema_name == "TranscriptionCheck":
+            low_quality = LOW_QUALITY_MARKER in messages[0].content
+            content = {
+                "is_correct_transcription": not low_quality,
+                "transcription_accuracy": 0.5 if low_quality else 0.97,
+                "transcription_notes": "",
+            }
+            output_tokens = 80
+        else:
+            text = gen_sentences(self.transcription_tokens * 3 // 4, self.rng)
+            if self.rng.random() < self.failure_rate:
+                text = f"{LOW_QUALITY_MARKER} {text}"
+            content = {"transcription": text}
+            output_tokens = self.transcription_tokens
+        return self._result(
+            messages, AIMessage(content=json.dumps(content)), output_tokens
+        )
+
+
+class FakeContextChatModel(FakeVisionChatModel):
+    """
+    Fake chat model of the context workflow, calling complete_context_gen with a
+    context of context_tokens after a latency. The prompt holds the whole
+    document, so input tokens grow with the document size.
+    """
+
+    context_tokens: int = 80
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs,
+    ) -> ChatResult:
+        self._sleep()
+        message = AIMessage(
+            content="",
+            tool_calls=[
+                {
+                    "name": "complete_context_gen",
+                    "args": {"context": "context " * self.context_tokens},
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                }
+            ],
+        )
+        return self._result(messages, message, self.context_tokens)
+
+
+class LatencyEmbeddings(Embeddings):
+    """
+    Deterministic fake embeddings paying a remote call latency: latency_seconds
+    per call plus per_text_seconds per embedded text, with jitter.
+    """
+
+    def __init__(
+        self,
+        vector_size: int,
+        latency_seconds: float = 0.0,
+        per_text_seconds: float = 0.0,
+        jitter: float = 0.25,
+        seed: int = 7,
+    ):
+        self.embeddings = DeterministicFakeEmbedding(size=vector_size)
+        self.latency_seconds = latency_seconds
+        self.per_text_seconds = per_text_seconds
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _sleep(self, texts: int):
+        with self._lock:
+            self.calls += 1
+            self.texts += texts
+            factor = self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        time.sleep((self.latency_seconds + self.per_text_seconds * texts) * factor)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self._sleep(len(texts))
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        self._sleep(1)
+        return self.embeddings.embed_query(text)
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """
+    Embeddings returning the vectors computed beforehand for known texts, and
+    asking the wrapped embeddings for the others. Separates the embedding time
+    of a bulk index from the time spent in the vector store.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self.vectors: dict[str, list[float]] = {}
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        missing = [text for text in texts if text not in self.vectors]
+        if missing:
+            self.vectors.update(zip(missing, self.embeddings.embed_documents(missing)))
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+
+class FakeModels:
+    def __init__(self, chat_model):
+        self.chat_model = chat_model
+        self.llm_model_id = chat_model.model_id
+
+    def load_chat_model(self, **kwargs):
+        return self.chat_model
+
+
+class LocalFile:
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def retrieve_raw_file(self, file_key: str) -> str:
+        return self.file_path
+
+
+class MemoryMarkdownFiles:
+    """Markdown documents kept in memory, by file key."""
+
+    def __init__(self):
+        self.files: dict[str, str] = {}
+
+    def save_markdown_file_content(self, file_key: str, content: str):
+        self.files[file_key] = content
+
+    def load_markdown_file_content(self, file_key: str) -> str:
+        return self.files[file_key]
+
+
+def noise_png(width: int, height: int, rng: random.Random) -> bytes:
+    image = Image.frombytes(
+        "L", (width, height), bytes(rng.getrandbits(8) for _ in range(width * height))
+    )
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def gen_pdf(path: str, pages: int, simple_share: float, rng: random.Random) -> dict:
+    """Synthetic PDF of text, table and scanned pages, returns the page kinds."""
+    document = pymupdf.open()
+    kinds = {"text": 0, "table": 0, "scan": 0}
+    scan_png = noise_png(300, 400, rng)
+    paragraph = "The quarterly report covers revenue, costs and headcount. " * 6
+    for _ in range(pages):
+        page = document.new_page()
+        if rng.random() < simple_share:
+            kinds["text"] += 1
+            page.insert_textbox(pymupdf.Rect(50, 50, 560, 780), paragraph * 4)
+        elif rng.random() < 0.5:
+            kinds["table"] += 1
+            page.insert_text((50, 60), "Balance by region")
+            for row in range(11):
+                page.draw_line((50, 80 + row * 30), (550, 80 + row * 30))
+            for column in range(5):
+                page.draw_line((50 + column * 125, 80), (50 + column * 125, 380))
+            for row in range(10):
+                for column in range(4):
+                    page.insert_text(
+                        (55 + column * 125, 100 + row * 30), f"{rng.randint(0, 9999)}"
+                    )
+        else:
+            kinds["scan"] += 1
+            page.insert_image(page.rect, stream=scan_png)
+    document.save(path)
+    return kinds
@@ -0,0 +1,122 @@
+"""
+Import time benchmark for the package entry points.
+
+Every entry point is imported in a fresh interpreter, the wall time is measured
+and the heavy backends it loaded are listed. The script exits with status 1 when
+an entry point loads a backend it must not load or exceeds its time budget.
+
+    python benchmarks/import_time.py [--runs 5] [--output import_time.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+
+HEAVY_MODULES = [
+    "langchain_postgres",
+    "langchain_redis",
+    "langchain_chroma",
+    "langchain_aws",
+    "langchain_google_vertexai",
+    "langchain_experimental",
+    "langgraph",
+    "boto3",
+    "pymupdf",
+    "PIL",
+]
+
+# statement, modules it must not load, time budget in seconds
+ENTRY_POINTS = {
+    "package": (
+        "import wizit_context_ingestor",
+        HEAVY_MODULES,
+        0.5,
+    ),
+    "transcription": (
+        "from wizit_context_ingestor import TranscriptionManager",
+        [
+            "langchain_postgres",
+            "langchain_redis",
+            "langchain_chroma",
+            "langchain_aws",
+            "langchain_experimental",
+        ],
+        None,
+    ),
+    "chunks": (
+        "from wizit_context_ingestor import ChunksManager",
+        ["langchain_redis", "langchain_chroma", "langchain_aws"],
+        None,
+    ),
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure(statement: str, runs: int) -> dict:
+    env = {**os.environ, "PYTHONPATH": SRC_PATH}
+    timings = []
+    loaded_modules = set()
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE.format(statement=statement)],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        timings.append(probe["seconds"])
+        loaded_modules = set(probe["modules"])
+    return {
+        "median_seconds": statistics.median(timings),
+        "max_seconds": max(timings),
+        "heavy_modules": [
+            module for module in HEAVY_MODULES if module in loaded_modules
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    for name, (statement, forbidden_modules, budget) in ENTRY_POINTS.items():
+        result = measure(statement, args.runs)
+        unexpected_modules = [
+            module for module in result["heavy_modules"] if module in forbidden_modules
+        ]
+        if unexpected_modules:
+            failures.append(f"{name} loads {', '.join(unexpected_modules)}")
+        if budget is not None and result["median_seconds"] > budget:
+            failures.append(
+                f"{name} takes {result['median_seconds']:.3f}s, budget {budget}s"
+            )
+        results[name] = {**result, "budget_seconds": budget}
+
+    report = {"benchmark": "import_time", "results": results, "failures": failures}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
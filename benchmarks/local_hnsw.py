@@ -0,0 +1,151 @@
+"""
+Recall, latency and persistence of the local HNSW backend on an on-disk store.
+
+Synthetic vectors scattered around cluster centers are indexed in batches, the
+graph is snapshot, then the store is reopened with every --ef-search value and
+searched from one and from --threads threads. Recall is measured against an
+exact scan. Reopening without snapshot (graph rebuilt from the vectors file),
+filtered searches and deletes by source are timed too.
+
+    python benchmarks/local_hnsw.py --rows 100000 --vector-size 384
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from common import QueryVectors, latency_summary, recall, timed, write_report
+from langchain_core.documents import Document
+
+from wizit_context_ingestor.infra.rag.local_embeddings import (
+    GRAPH_FILE,
+    LocalHnswEmbeddingsManager,
+)
+
+
+def clustered_vectors(rows: int, vector_size: int, clusters: int, rng) -> np.ndarray:
+    centers = rng.normal(size=(clusters, vector_size)).astype(np.float32)
+    noise = rng.normal(scale=0.5, size=(rows, vector_size)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size=rows)] + noise
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def search_all(manager, queries: list[str], k: int, threads: int, **search_kwargs):
+    """Ids found for every query, the latency of each search and the throughput."""
+
+    def search(query: str):
+        start = time.perf_counter()
+        docs = manager.search_records(query, k=k, **search_kwargs)
+        return [doc.id for doc in docs], time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(search, queries))
+    elapsed = time.perf_counter() - start
+    found = [ids for ids, _ in results]
+    return found, [latency for _, latency in results], len(queries) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--vector-size", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--chunks-per-file", type=int, default=200)
+    parser.add_argument("--batch-rows", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    # queries are drawn around the same centers as the indexed vectors
+    vectors = clustered_vectors(
+        args.rows + args.queries, args.vector_size, args.clusters, rng
+    )
+    vectors, query_vectors = vectors[: args.rows], vectors[args.rows :]
+    texts = [f"row {index}" for index in range(args.rows)]
+    queries = [f"query {index}" for index in range(args.queries)]
+    embeddings = QueryVectors(
+        {
+            **dict(zip(texts, vectors.tolist())),
+            **dict(zip(queries, query_vectors.tolist())),
+        }
+    )
+    docs = [
+        Document(
+            id=f"{index:08d}",
+            page_content=text,
+            metadata={"source": f"file_{index // args.chunks_per_file}"},
+        )
+        for index, text in enumerate(texts)
+    ]
+    exact_top = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, : args.k]
+    expected = [[docs[index].id for index in row] for row in exact_top]
+
+    results = {"rows": args.rows, "vector_size": args.vector_size}
+    timings = {}
+    with tempfile.TemporaryDirectory() as index_path:
+        manager = LocalHnswEmbeddingsManager(embeddings, index_path=index_path)
+        with timed(timings, "ingest"):
+            for batch_start in range(0, args.rows, args.batch_rows):
+                manager.bulk_index_documents(
+                    docs[batch_start : batch_start + args.batch_rows]
+                )
+        with timed(timings, "snapshot"):
+            manager.close()
+        results["ingest_rows_per_second"] = args.rows / timings["ingest"]
+        results["store_mb"] = (
+            sum(
+                os.path.getsize(os.path.join(index_path, name))
+                for name in os.listdir(index_path)
+            )
+            / 2**20
+        )
+
+        results["ef_search"] = []
+        for ef_search in args.ef_search:
+            with timed(timings, f"load_ef_{ef_search}"):
+                manager = LocalHnswEmbeddingsManager(
+                    embeddings, index_path=index_path, ef_search=ef_search
+                )
+            found, latencies, _ = search_all(manager, queries, args.k, threads=1)
+            _, _, qps = search_all(manager, queries, args.k, threads=args.threads)
+            results["ef_search"].append(
+                {
+                    "ef_search": ef_search,
+                    "recall": recall(found, expected),
+                    "latency": latency_summary(latencies),
+                    "qps_single_thread": 1 / (sum(latencies) / len(latencies)),
+                    f"qps_{args.threads}_threads": qps,
+                }
+            )
+            manager.connection.close()
+
+        manager = LocalHnswEmbeddingsManager(embeddings, index_path=index_path)
+        sources = [f"file_{index}" for index in range(5)]
+        _, latencies, _ = search_all(
+            manager, queries, args.k, threads=1, filters={"source": sources}
+        )
+        results["filtered_search"] = latency_summary(latencies)
+        with timed(timings, "delete_source"):
+            results["delete_result"] = manager.delete_documents_by_source_id("file_0")
+        manager.connection.close()
+
+        os.remove(os.path.join(index_path, GRAPH_FILE))
+        with timed(timings, "load_without_snapshot"):
+            manager = LocalHnswEmbeddingsManager(embeddings, index_path=index_path)
+        manager.connection.close()
+
+    for name, seconds in timings.items():
+        results[f"{name}_seconds"] = seconds
+    write_report("local_hnsw", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Ingest and search throughput of the in memory backend, end to end through KdbService.
+
+The embeddings manager is built from the kdb backend registry like ChunksManager
+does, with fake embeddings, so the run needs no database nor cloud credentials.
+For every size, chunks are bulk indexed, re-indexed unchanged, searched with and
+without a source filter, and a source is deleted.
+
+    python benchmarks/memory_backend.py --sizes 10000 100000
+"""
+
+import argparse
+import time
+
+from common import latency_summary, timed, write_report
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from wizit_context_ingestor.application.kdb_service import KdbService
+from wizit_context_ingestor.data.kdb import KdbServices
+from wizit_context_ingestor.infra.rag.kdb_registry import create_embeddings_manager
+
+
+def gen_chunks(size: int, chunks_per_file: int) -> list[Document]:
+    return [
+        Document(
+            page_content=f"chunk {index} of file {index // chunks_per_file}",
+            metadata={"source": f"file_{index // chunks_per_file}", "chunk": index},
+        )
+        for index in range(size)
+    ]
+
+
+def search_latencies(kdb_service: KdbService, queries: int, filtered: bool) -> dict:
+    latencies = []
+    for query_index in range(queries):
+        filters = {"source": [f"file_{query_index % 10}"]} if filtered else None
+        start = time.perf_counter()
+        kdb_service.embeddings_manager.search_records(
+            f"chunk {query_index}", k=10, filters=filters
+        )
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies)
+
+
+def benchmark_size(size: int, args) -> dict:
+    result = {"chunks": size}
+    timings = {}
+    embeddings_manager = create_embeddings_manager(
+        KdbServices.MEMORY.value,
+        DeterministicFakeEmbedding(size=args.vector_size),
+    )
+    kdb_service = KdbService(embeddings_manager)
+    chunks = gen_chunks(size, args.chunks_per_file)
+    with timed(timings, "initial"):
+        kdb_service.bulk_index_documents_in_vector_store(chunks)
+    with timed(timings, "reindex"):
+        result["reindex_result"] = kdb_service.bulk_index_documents_in_vector_store(
+            chunks
+        )
+    result["search"] = search_latencies(kdb_service, args.queries, filtered=False)
+    result["filtered_search"] = search_latencies(
+        kdb_service, args.queries, filtered=True
+    )
+    with timed(timings, "delete_source"):
+        result["delete_result"] = kdb_service.delete_documents_by_file_name("file_0")
+
+    for name, seconds in timings.items():
+        result[f"{name}_seconds"] = seconds
+    result["initial_chunks_per_second"] = size / timings["initial"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--chunks-per-file", type=int, default=200)
+    parser.add_argument("--vector-size", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = [benchmark_size(size, args) for size in args.sizes]
+    write_report("memory_backend", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Peak memory of large documents with and without the low memory guardrails.
+
+Transcription: a synthetic PDF of --pages scanned (noise image) pages is
+transcribed by a fake vision model, rendering every page up front, then with
+max_inflight_page_bytes of --max-inflight-mb. Context chunks: a markdown
+document of --document-chars characters is chunked and contextualized by a
+fake context model, sending the whole document with every chunk, then with
+max_full_context_chars of --max-context-chars. Every mode runs in a fresh
+process with the memory profiler on. Reported per mode: wall time, peak RSS,
+peak traced memory by stage, peak rendered page bytes held, LLM input tokens
+and the guardrails hit.
+
+    python benchmarks/memory_guardrails.py --pages 60 --max-inflight-mb 8
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from common import discard_stdout, write_report
+from fakes import (
+    FakeContextChatModel,
+    FakeModels,
+    FakeVisionChatModel,
+    LatencyEmbeddings,
+    LocalFile,
+    MemoryMarkdownFiles,
+    gen_pdf,
+    gen_sentences,
+)
+from pipeline import peak_rss_mb
+
+from wizit_context_ingestor.application.context_chunk_service import (
+    ContextChunksInDocumentService,
+)
+from wizit_context_ingestor.application.transcription_service import (
+    TranscriptionService,
+)
+from wizit_context_ingestor.data.kdb import KdbServices
+from wizit_context_ingestor.infra.rag.kdb_registry import create_embeddings_manager
+from wizit_context_ingestor.infra.rag.semantic_chunks import SemanticChunks
+from wizit_context_ingestor.utils.concurrency_utils import ByteBudget
+from wizit_context_ingestor.utils.memory_utils import MemoryProfiler
+from wizit_context_ingestor.utils.metrics_utils import MetricsRecorder
+
+MODES = ("transcription", "transcription_guarded", "context", "context_guarded")
+
+
+async def transcribe(args, pdf_path: str, guarded: bool) -> dict:
+    max_inflight_page_bytes = int(args.max_inflight_mb * 2**20) if guarded else None
+    page_bytes_budget = ByteBudget(max_inflight_page_bytes) if guarded else None
+    service = TranscriptionService(
+        FakeModels(
+            FakeVisionChatModel(
+                model_id="vision", latency_seconds=args.llm_latency_ms / 1000
+            )
+        ),
+        LocalFile(pdf_path),
+        llm_semaphore=asyncio.Semaphore(args.max_concurrent_calls),
+        max_inflight_page_bytes=max_inflight_page_bytes,
+        page_bytes_budget=page_bytes_budget,
+    )
+    memory_profiler = MemoryProfiler()
+    metrics_recorder = MetricsRecorder("large.pdf", "transcription", memory_profiler)
+    with memory_profiler.session():
+        parsed_pages, _ = await service.process_document("large.pdf", metrics_recorder)
+    # rendered up front, every page image is held until the document ends
+    page_bytes_held_peak = (
+        page_bytes_budget.peak_bytes
+        if guarded
+        else sum(len(page.page_base64) for page in parsed_pages)
+    )
+    return {
+        "pages": len(parsed_pages),
+        "page_bytes_held_peak": page_bytes_held_peak,
+        "metrics": metrics_recorder.finish(),
+    }
+
+
+async def contextualize(args, guarded: bool) -> dict:
+    markdown_files = MemoryMarkdownFiles()
+    markdown_files.save_markdown_file_content(
+        "large.md", gen_sentences(args.document_chars // 7, random.Random(7))
+    )
+    embeddings = LatencyEmbeddings(64)
+    service = ContextChunksInDocumentService(
+        FakeModels(
+            FakeContextChatModel(
+                model_id="context", latency_seconds=args.llm_latency_ms / 1000
+            )
+        ),
+        markdown_files,
+        SemanticChunks(embeddings),
+        create_embeddings_manager(KdbServices.MEMORY.value, embeddings),
+        llm_semaphore=asyncio.Semaphore(args.max_concurrent_calls),
+        max_full_context_chars=args.max_context_chars if guarded else None,
+    )
+    memory_profiler = MemoryProfiler()
+    metrics_recorder = MetricsRecorder("large.md", "context_chunks", memory_profiler)
+    with memory_profiler.session():
+        chunks = await service.get_context_chunks_in_document(
+            "large.md", {}, metrics_recorder
+        )
+    return {"chunks": len(chunks), "metrics": metrics_recorder.finish()}
+
+
+def run_mode(args, pdf_path: str, mode: str) -> dict:
+    """Run a mode, in a fresh process so the peak RSS is its own."""
+    guarded = mode.endswith("_guarded")
+    start = time.perf_counter()
+    # keep the errors printed by the workflow nodes out of the report
+    with discard_stdout():
+        if mode.startswith("transcription"):
+            result = asyncio.run(transcribe(args, pdf_path, guarded))
+        else:
+            result = asyncio.run(contextualize(args, guarded))
+    seconds = time.perf_counter() - start
+    metrics = result.pop("metrics")
+    return {
+        "mode": mode,
+        **result,
+        "seconds": seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "stage_peak_memory_mb": {
+            stage: peak_bytes / 2**20
+            for stage, peak_bytes in metrics.stage_peak_memory_bytes.items()
+        },
+        "llm_input_tokens": metrics.llm.input_tokens,
+        "guardrails": metrics.guardrails,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--max-inflight-mb", type=float, default=8)
+    parser.add_argument("--document-chars", type=int, default=1_000_000)
+    parser.add_argument("--max-context-chars", type=int, default=50_000)
+    parser.add_argument("--llm-latency-ms", type=float, default=20)
+    parser.add_argument("--max-concurrent-calls", type=int, default=16)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "large.pdf")
+        gen_pdf(pdf_path, args.pages, 0.0, random.Random(7))
+        for mode in args.modes:
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                results.append(executor.submit(run_mode, args, pdf_path, mode).result())
+    write_report("memory_guardrails", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
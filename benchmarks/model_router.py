@@ -0,0 +1,135 @@
+"""
+Throughput of ModelRouter against a single provider that throttles.
+
+Every fake provider answers after its latency (with jitter) and raises a 429
+once more than its quota of requests are in flight, like a per region quota.
+--requests chat calls are made by --clients concurrent callers, first against
+the first provider alone, then through a ModelRouter over all of them. Reported:
+successful calls, calls per second, p95 latency and the share of each route.
+
+    python benchmarks/model_router.py --requests 3000 --clients 48
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List, Optional
+
+from common import latency_summary, write_report
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from wizit_context_ingestor.infra.model_router import ModelRoute, ModelRouter
+
+
+class QuotaChatModel(BaseChatModel):
+    """Fake provider with a latency and a quota of concurrent requests."""
+
+    name_: str
+    latency_seconds: float
+    quota: int
+    in_flight: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "quota-fake"
+
+    def _generate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs
+    ) -> ChatResult:
+        raise NotImplementedError("the benchmark calls the async API")
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs
+    ) -> ChatResult:
+        if self.in_flight >= self.quota:
+            raise RuntimeError(f"429 Resource exhausted on {self.name_}")
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency_seconds * random.uniform(0.8, 1.5))
+        finally:
+            self.in_flight -= 1
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=self.name_))]
+        )
+
+
+def gen_providers(args) -> list[QuotaChatModel]:
+    return [
+        QuotaChatModel(name_=name, latency_seconds=latency_ms / 1000, quota=quota)
+        for name, latency_ms, quota in (
+            ("vertex-us-east5", args.latency_ms, args.quota),
+            ("vertex-europe-west1", args.latency_ms * 1.5, args.quota),
+            ("bedrock-us-east-1", args.latency_ms * 2, args.quota * 2),
+        )
+    ]
+
+
+async def run_calls(model, args) -> dict:
+    latencies = []
+    answered_by = {}
+    failures = 0
+    queue = asyncio.Queue()
+    for _ in range(args.requests):
+        queue.put_nowait(None)
+
+    async def client():
+        nonlocal failures
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                message = await model.ainvoke("transcribe the page")
+                latencies.append(time.perf_counter() - start)
+                answered_by[message.content] = answered_by.get(message.content, 0) + 1
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(args.clients)])
+    elapsed = time.perf_counter() - start
+    return {
+        "succeeded": len(latencies),
+        "failed": failures,
+        "calls_per_second": len(latencies) / elapsed,
+        "latency": latency_summary(latencies),
+        "answered_by": answered_by,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--clients", type=int, default=48)
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--quota", type=int, default=12)
+    parser.add_argument("--route-concurrency", type=int, default=16)
+    parser.add_argument("--cooldown-ms", type=float, default=100)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    random.seed(7)
+    single = run_calls(gen_providers(args)[0], args)
+    results = {"single_provider": asyncio.run(single)}
+    providers = gen_providers(args)
+    router = ModelRouter(
+        [
+            ModelRoute(
+                name=provider.name_,
+                model=provider,
+                max_concurrency=args.route_concurrency,
+            )
+            for provider in providers
+        ],
+        base_cooldown_seconds=args.cooldown_ms / 1000,
+        max_cooldown_seconds=args.cooldown_ms * 32 / 1000,
+    )
+    results["router"] = asyncio.run(run_calls(router.load_chat_model(), args))
+    results["router"]["routes"] = router.get_stats()
+    write_report("model_router", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Bulk re-index throughput on Postgres, in chunks per second.
+
+For every size, chunks spread over files of --chunks-per-file chunks are loaded
+with bulk_index_documents, then re-indexed with --changed-ratio of them edited.
+Sizes up to --legacy-max-chunks are also indexed file by file with index_documents.
+
+    PG_CONNECTION=postgresql+psycopg://... python benchmarks/pg_bulk_index.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+from collections import defaultdict
+
+from common import timed, write_report
+from langchain_core.documents import Document
+from pg_common import create_benchmark_manager, drop_benchmark_tables
+
+
+def gen_chunks(size: int, chunks_per_file: int, version: str = "") -> list[Document]:
+    return [
+        Document(
+            page_content=f"chunk {index} of file {index // chunks_per_file}{version}",
+            metadata={"source": f"file_{index // chunks_per_file}", "chunk": index},
+        )
+        for index in range(size)
+    ]
+
+
+def benchmark_size(size: int, args) -> dict:
+    result = {"chunks": size}
+    timings = {}
+    manager = create_benchmark_manager(
+        vector_size=args.vector_size, table_prefix="bench_bulk"
+    )
+    try:
+        chunks = gen_chunks(size, args.chunks_per_file)
+        with timed(timings, "initial"):
+            result["initial_result"] = manager.bulk_index_documents(chunks)
+        changed_every = max(int(1 / args.changed_ratio), 1)
+        for index in range(0, size, changed_every):
+            chunks[index] = Document(
+                page_content=chunks[index].page_content + " edited",
+                metadata=chunks[index].metadata,
+            )
+        with timed(timings, "reindex"):
+            result["reindex_result"] = manager.bulk_index_documents(chunks)
+    finally:
+        drop_benchmark_tables(manager)
+
+    if size <= args.legacy_max_chunks:
+        manager = create_benchmark_manager(
+            vector_size=args.vector_size, table_prefix="bench_legacy"
+        )
+        try:
+            chunks_by_file = defaultdict(list)
+            for chunk in gen_chunks(size, args.chunks_per_file):
+                chunks_by_file[chunk.metadata["source"]].append(chunk)
+            with timed(timings, "legacy_initial"):
+                for file_chunks in chunks_by_file.values():
+                    manager.index_documents(file_chunks)
+        finally:
+            drop_benchmark_tables(manager)
+
+    for name, seconds in timings.items():
+        result[f"{name}_seconds"] = seconds
+        result[f"{name}_chunks_per_second"] = size / seconds if seconds else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--chunks-per-file", type=int, default=200)
+    parser.add_argument("--changed-ratio", type=float, default=0.1)
+    parser.add_argument("--vector-size", type=int, default=768)
+    parser.add_argument("--legacy-max-chunks", type=int, default=10_000)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = [benchmark_size(size, args) for size in args.sizes]
+    write_report("pg_bulk_index", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Delete-by-file benchmark on Postgres: id listing + delete by ids versus the
+single transaction delete_documents_by_source_id.
+
+    PG_CONNECTION=postgresql+psycopg://... python benchmarks/pg_delete_by_source.py --rows 100000
+"""
+
+import argparse
+
+from common import timed, write_report
+from pg_common import create_benchmark_manager, drop_benchmark_tables, seed_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    manager = create_benchmark_manager(table_prefix="bench_delete")
+    timings = {}
+    results = {"rows": args.rows}
+    try:
+        seed_rows(manager, args.rows, sources=1)
+        try:
+            with timed(timings, "list_and_delete_by_ids_seconds"):
+                docs_ids = manager.retrieve_documents_by_file_name("file_0")
+                manager.delete_documents_by_ids(docs_ids)
+            results["list_and_delete_by_ids_deleted"] = len(docs_ids)
+        except Exception as e:
+            results["list_and_delete_by_ids_error"] = str(e).splitlines()[0][:200]
+        # start the bulk delete from the same table state
+        manager.delete_documents_by_source_id("file_0")
+        seed_rows(manager, args.rows, sources=1)
+        with timed(timings, "delete_by_source_seconds"):
+            results["delete_by_source_counts"] = manager.delete_documents_by_source_id(
+                "file_0"
+            )
+    finally:
+        drop_benchmark_tables(manager)
+    write_report("pg_delete_by_source", {**results, **timings}, args.output)
+
+
+if __name__ == "__main__":
+    main()
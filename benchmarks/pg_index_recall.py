@@ -0,0 +1,136 @@
+"""
+Vector index recall/latency benchmark on Postgres: HNSW and IVFFlat indexes
+swept over ef_search and probes, measured against exact search results on a
+synthetic clustered dataset.
+
+    PG_CONNECTION=postgresql+psycopg://... python benchmarks/pg_index_recall.py --rows 100000
+"""
+
+import argparse
+import random
+import time
+
+from common import latency_summary, write_report
+from pg_common import (
+    QueryVectors,
+    clustered_batches,
+    create_benchmark_manager,
+    drop_benchmark_tables,
+    pgvector_version,
+    recall,
+    search_ids,
+)
+
+
+def seed_clustered_rows(
+    manager, rows: int, clusters: int, rng: random.Random
+) -> list[list[float]]:
+    """Insert clustered rows, returns one row embedding per batch as query seeds."""
+    sample = []
+    with manager._get_sql_engine().begin() as conn:
+        for docs, embeddings in clustered_batches(
+            rows, manager.vector_size, clusters, rng
+        ):
+            manager._insert_vectors_batch(conn, docs, embeddings)
+            sample.append(embeddings[0])
+    return sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--vector-size", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 40, 100, 200])
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--maintenance-work-mem", default="512MB")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    lists = args.lists or max(args.rows // 1000, 1)
+    manager = create_benchmark_manager(
+        vector_size=args.vector_size, table_prefix="bench_recall"
+    )
+    results = {
+        "rows": args.rows,
+        "vector_size": args.vector_size,
+        "k": args.k,
+        "indexes": [],
+    }
+    try:
+        sample = seed_clustered_rows(manager, args.rows, args.clusters, rng)
+        # queries are noisy copies of indexed rows, like real queries near the data
+        query_vectors = {
+            f"query {query}": [
+                value + rng.gauss(0, 0.1) for value in sample[query % len(sample)]
+            ]
+            for query in range(args.queries)
+        }
+        queries = list(query_vectors)
+        manager.embeddings_model = QueryVectors(query_vectors)
+        # no index yet, searches are exact sequential scans
+        expected, latencies = search_ids(manager, queries, args.k)
+        results["exact"] = latency_summary(latencies)
+
+        index_configs = [
+            ("hnsw", None, {"m": args.m, "ef_construction": args.ef_construction}),
+            ("ivfflat", None, {"lists": lists}),
+        ]
+        if pgvector_version(manager) >= (0, 7):
+            index_configs += [
+                (
+                    "hnsw",
+                    "halfvec",
+                    {"m": args.m, "ef_construction": args.ef_construction},
+                ),
+                (
+                    "hnsw",
+                    "binary",
+                    {"m": args.m, "ef_construction": args.ef_construction},
+                ),
+            ]
+        else:
+            results["skipped"] = "halfvec and binary indexes need pgvector >= 0.7"
+
+        for index_type, quantization, index_params in index_configs:
+            manager.index_quantization = quantization
+            build_start = time.perf_counter()
+            manager.create_index(
+                index_type=index_type,
+                replace=True,
+                maintenance_work_mem=args.maintenance_work_mem,
+                **index_params,
+            )
+            index_result = {
+                "index_type": index_type,
+                "quantization": quantization,
+                **index_params,
+                "build_seconds": time.perf_counter() - build_start,
+                "sweep": [],
+            }
+            search_option = "ef_search" if index_type == "hnsw" else "probes"
+            for value in args.ef_search if index_type == "hnsw" else args.probes:
+                found, latencies = search_ids(
+                    manager, queries, args.k, **{search_option: value}
+                )
+                index_result["sweep"].append(
+                    {
+                        search_option: value,
+                        "recall": recall(found, expected),
+                        **latency_summary(latencies),
+                    }
+                )
+            results["indexes"].append(index_result)
+    finally:
+        drop_benchmark_tables(manager)
+    write_report("pg_index_recall", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Search latency benchmark on Postgres: unfiltered similarity, source filtered
+similarity (pushed down versus post-filtering an unfiltered search) and hybrid
+full text + vector search.
+
+    PG_CONNECTION=postgresql+psycopg://... python benchmarks/pg_search.py --rows 100000
+"""
+
+import argparse
+import random
+import time
+
+from common import latency_summary, write_report
+from pg_common import create_benchmark_manager, drop_benchmark_tables, seed_rows
+
+
+def measure(search, queries: list[str]) -> tuple[dict, list]:
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--sources", type=int, default=1000)
+    parser.add_argument("--filter-sources", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--post-filter-k", type=int, default=200)
+    parser.add_argument("--vector-size", type=int, default=64)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    queries = [f"topic_{rng.randrange(97)} document" for _ in range(args.queries)]
+    filter_sources = [f"file_{source}" for source in range(1, args.filter_sources + 1)]
+    filters = {"source": filter_sources}
+    manager = create_benchmark_manager(
+        vector_size=args.vector_size, table_prefix="bench_search"
+    )
+    results = {"rows": args.rows, "sources": args.sources, "k": args.k}
+    try:
+        seed_rows(manager, args.rows, sources=args.sources, random_vectors=True)
+        manager.create_index()
+
+        def post_filtered_search(query):
+            docs = manager.search_records(query, k=args.post_filter_k)
+            return [doc for doc in docs if doc.metadata["source"] in filter_sources][
+                : args.k
+            ]
+
+        searches = {
+            "similarity": lambda query: manager.search_records(query, k=args.k),
+            "similarity_post_filtered": post_filtered_search,
+            "similarity_filtered": lambda query: manager.search_records(
+                query, k=args.k, filters=filters
+            ),
+            "hybrid": lambda query: manager.search_records(
+                query, k=args.k, search_type="hybrid"
+            ),
+            "hybrid_filtered": lambda query: manager.search_records(
+                query, k=args.k, filters=filters, search_type="hybrid"
+            ),
+        }
+        for name, search in searches.items():
+            latency, found = measure(search, queries)
+            results[name] = {
+                **latency,
+                "mean_results": sum(map(len, found)) / len(found),
+            }
+    finally:
+        drop_benchmark_tables(manager)
+    write_report("pg_search", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Storage mode benchmark on Postgres: float32 vectors, halfvec, binary first pass
+with float re-rank, and Matryoshka truncated dimensions (float32 and halfvec).
+Reports table and vector index size, index build time, recall@k against exact
+full precision search and query latency, on a synthetic corpus whose leading
+dimensions carry most of the signal.
+
+    PG_CONNECTION=postgresql+psycopg://... python benchmarks/pg_storage_modes.py --rows 20000
+"""
+
+import argparse
+import random
+import time
+
+from common import latency_summary, write_report
+from langchain_postgres.v2.indexes import DEFAULT_INDEX_NAME_SUFFIX
+from pg_common import (
+    QueryVectors,
+    clustered_batches,
+    create_benchmark_manager,
+    drop_benchmark_tables,
+    pgvector_version,
+    recall,
+    search_ids,
+)
+from sqlalchemy import text
+
+from wizit_context_ingestor.infra.rag.truncated_embeddings import TruncatedEmbeddings
+
+# mode name -> (storage_mode, truncated)
+MODES = {
+    "vector": ("vector", False),
+    "halfvec": ("halfvec", False),
+    "binary": ("binary", False),
+    "truncated": ("vector", True),
+    "truncated_halfvec": ("halfvec", True),
+}
+
+
+def relation_sizes(manager) -> dict:
+    index_name = manager.embeddings_vectors_table_name + DEFAULT_INDEX_NAME_SUFFIX
+    with manager._get_sql_engine().connect() as conn:
+        table_bytes, index_bytes = conn.execute(
+            text(
+                "SELECT pg_table_size(CAST(:table AS regclass)), "
+                "pg_relation_size(CAST(:index AS regclass))"
+            ),
+            {
+                "table": manager._qualified_vectors_table(),
+                "index": f'"public"."{index_name}"',
+            },
+        ).one()
+    return {"table_mb": table_bytes / 2**20, "vector_index_mb": index_bytes / 2**20}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--vector-size", type=int, default=1024)
+    parser.add_argument("--truncated-size", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--decay", type=float, default=64)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, default=40)
+    parser.add_argument("--maintenance-work-mem", default="512MB")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    managers = {}
+    results = {
+        "rows": args.rows,
+        "vector_size": args.vector_size,
+        "truncated_size": args.truncated_size,
+        "k": args.k,
+        "ef_search": args.ef_search,
+        "modes": {},
+    }
+    try:
+        # the full precision table gives the exact results every mode is measured against
+        reference = create_benchmark_manager(
+            vector_size=args.vector_size, table_prefix="bench_storage"
+        )
+        managers["reference"] = reference
+        modes = list(args.modes)
+        if pgvector_version(reference) < (0, 7):
+            modes = [mode for mode in modes if MODES[mode][0] == "vector"]
+            results["skipped"] = "halfvec and binary storage need pgvector >= 0.7"
+        for mode in modes:
+            storage_mode, truncated = MODES[mode]
+            managers[mode] = create_benchmark_manager(
+                vector_size=args.truncated_size if truncated else args.vector_size,
+                table_prefix="bench_storage",
+                storage_mode=storage_mode,
+            )
+        truncation = TruncatedEmbeddings(QueryVectors({}), args.truncated_size)
+
+        sample = []
+        insert_seconds = {mode: 0.0 for mode in managers}
+        for docs, embeddings in clustered_batches(
+            args.rows, args.vector_size, args.clusters, rng, decay=args.decay
+        ):
+            sample.append(embeddings[0])
+            truncated_embeddings = [
+                truncation._truncate(embedding) for embedding in embeddings
+            ]
+            for mode, manager in managers.items():
+                start = time.perf_counter()
+                with manager._get_sql_engine().begin() as conn:
+                    manager._insert_vectors_batch(
+                        conn,
+                        docs,
+                        truncated_embeddings
+                        if mode != "reference" and MODES[mode][1]
+                        else embeddings,
+                    )
+                insert_seconds[mode] += time.perf_counter() - start
+
+        query_vectors = QueryVectors(
+            {
+                f"query {query}": [
+                    value + rng.gauss(0, 0.05) for value in sample[query % len(sample)]
+                ]
+                for query in range(args.queries)
+            }
+        )
+        queries = list(query_vectors.vectors)
+        reference.embeddings_model = query_vectors
+        expected, latencies = search_ids(reference, queries, args.k)
+        results["exact"] = latency_summary(latencies)
+
+        for mode in modes:
+            manager = managers[mode]
+            manager.embeddings_model = (
+                TruncatedEmbeddings(query_vectors, args.truncated_size)
+                if MODES[mode][1]
+                else query_vectors
+            )
+            build_start = time.perf_counter()
+            manager.create_index(maintenance_work_mem=args.maintenance_work_mem)
+            build_seconds = time.perf_counter() - build_start
+            found, latencies = search_ids(
+                manager, queries, args.k, ef_search=args.ef_search
+            )
+            results["modes"][mode] = {
+                "vector_size": manager.vector_size,
+                "storage_mode": manager.storage_mode,
+                "insert_rows_per_second": args.rows / insert_seconds[mode],
+                "index_build_seconds": build_seconds,
+                **relation_sizes(manager),
+                "recall": recall(found, expected),
+                **latency_summary(latencies),
+            }
+    finally:
+        for manager in managers.values():
+            drop_benchmark_tables(manager)
+    write_report("pg_storage_modes", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+End to end throughput of the ingestion pipeline, offline, stage by stage.
+
+--documents copies of a synthetic PDF of --pages pages are transcribed with
+TranscriptionService, chunked and contextualized with
+ContextChunksInDocumentService, embedded, indexed through KdbService and
+searched, with fake chat models and embeddings answering after their latency
+(see fakes.py). The in memory backend needs no store, --kdb pg runs on a local
+Postgres with pgvector (PG_CONNECTION, see pg_common.py).
+
+Stage seconds are summed over the documents from their DocumentMetrics: render,
+transcribe (the page workflows), chunk (semantic chunking, with its sentence
+embeddings) and contextualize (the context workflows). Embed, index and search
+are timed on the whole corpus: embed computes the chunk vectors, index writes
+them to the store and search runs --queries single searches. Reported: stage
+seconds, wall time per phase, pages and chunks per second, p50/p95 latency of
+documents, page and chunk LLM calls and searches, and peak RSS after every
+phase. The JSON report is meant to be compared across releases.
+
+    python benchmarks/pipeline.py --documents 4 --pages 10 --llm-latency-ms 100
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import discard_stdout, latency_summary, timed, write_report
+from fakes import (
+    FakeContextChatModel,
+    FakeModels,
+    FakeVisionChatModel,
+    LatencyEmbeddings,
+    LocalFile,
+    MemoryMarkdownFiles,
+    PrecomputedEmbeddings,
+    gen_pdf,
+)
+
+from wizit_context_ingestor.application.context_chunk_service import (
+    ContextChunksInDocumentService,
+)
+from wizit_context_ingestor.application.kdb_service import KdbService
+from wizit_context_ingestor.application.transcription_service import (
+    TranscriptionService,
+)
+from wizit_context_ingestor.data.kdb import KdbServices
+from wizit_context_ingestor.infra.rag.kdb_registry import create_embeddings_manager
+from wizit_context_ingestor.infra.rag.semantic_chunks import SemanticChunks
+from wizit_context_ingestor.utils.metrics_utils import MetricsRecorder
+
+STAGES = (
+    "render",
+    "transcribe",
+    "chunk",
+    "contextualize",
+    "embed",
+    "index",
+    "search",
+)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def other_stages_seconds(stage_seconds: dict, total_seconds: float) -> float:
+    return max(total_seconds - sum(stage_seconds.values()), 0.0)
+
+
+async def transcribe(args, pdf_path: str) -> list:
+    vision_model = FakeVisionChatModel(
+        model_id="vision",
+        latency_seconds=args.llm_latency_ms / 1000,
+        jitter=args.jitter,
+    )
+    service = TranscriptionService(
+        FakeModels(vision_model),
+        LocalFile(pdf_path),
+        llm_semaphore=asyncio.Semaphore(args.max_concurrent_calls),
+    )
+
+    async def document(file_key: str):
+        metrics_recorder = MetricsRecorder(file_key, "transcription")
+        _, parsed_document = await service.process_document(file_key, metrics_recorder)
+        return parsed_document, metrics_recorder.finish()
+
+    return await asyncio.gather(
+        *[document(f"doc-{i}.pdf") for i in range(args.documents)]
+    )
+
+
+async def contextualize(args, markdown_files, embeddings_manager) -> list:
+    context_model = FakeContextChatModel(
+        model_id="context",
+        latency_seconds=args.llm_latency_ms / 1000,
+        jitter=args.jitter,
+    )
+    rag_chunker = SemanticChunks(
+        LatencyEmbeddings(
+            args.vector_size,
+            args.embed_latency_ms / 1000,
+            args.embed_per_text_ms / 1000,
+            args.jitter,
+        )
+    )
+    service = ContextChunksInDocumentService(
+        FakeModels(context_model),
+        markdown_files,
+        rag_chunker,
+        embeddings_manager,
+        llm_semaphore=asyncio.Semaphore(args.max_concurrent_calls),
+    )
+
+    async def document(file_key: str):
+        metrics_recorder = MetricsRecorder(file_key, "context_chunks")
+        chunks = await service.get_context_chunks_in_document(
+            file_key, {}, metrics_recorder
+        )
+        return chunks, metrics_recorder.finish()
+
+    return await asyncio.gather(
+        *[document(file_key) for file_key in markdown_files.files]
+    )
+
+
+def create_kdb_service(args, embeddings):
+    if args.kdb == "pg":
+        from pg_common import create_benchmark_manager
+
+        return KdbService(
+            create_benchmark_manager(
+                args.vector_size, "pipeline", embeddings_model=embeddings
+            )
+        )
+    return KdbService(create_embeddings_manager(KdbServices.MEMORY.value, embeddings))
+
+
+def embed(embeddings: PrecomputedEmbeddings, texts: list[str], args):
+    """Compute the chunk vectors in batches, with concurrent embedding calls."""
+    batches = [
+        texts[start : start + args.embed_batch_size]
+        for start in range(0, len(texts), args.embed_batch_size)
+    ]
+    with ThreadPoolExecutor(max_workers=args.max_concurrent_embeddings) as executor:
+        for batch, vectors in zip(
+            batches, executor.map(embeddings.embeddings.embed_documents, batches)
+        ):
+            embeddings.vectors.update(zip(batch, vectors))
+
+
+def search(kdb_service: KdbService, queries: list[str], k: int) -> list[float]:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        kdb_service.search(query, k=k)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run(args, pdf_path: str) -> dict:
+    stage_seconds = dict.fromkeys(STAGES, 0.0)
+    phase_seconds = {}
+    peak_rss = {}
+
+    # keep the errors printed by the workflow nodes out of the report
+    with discard_stdout():
+        with timed(phase_seconds, "transcription"):
+            transcribed = asyncio.run(transcribe(args, pdf_path))
+    peak_rss["transcription"] = peak_rss_mb()
+    markdown_files = MemoryMarkdownFiles()
+    page_latencies = []
+    transcription_latencies = []
+    for parsed_document, metrics in transcribed:
+        markdown_files.save_markdown_file_content(
+            f"{metrics.file_key}.md", parsed_document.document_text
+        )
+        stage_seconds["render"] += metrics.stage_seconds.get("render", 0.0)
+        stage_seconds["transcribe"] += other_stages_seconds(
+            metrics.stage_seconds, metrics.total_seconds
+        )
+        page_latencies += [page.llm.latency_seconds for page in metrics.pages]
+        transcription_latencies.append(metrics.total_seconds)
+    pages = sum(len(metrics.pages) for _, metrics in transcribed)
+
+    embeddings = PrecomputedEmbeddings(
+        LatencyEmbeddings(
+            args.vector_size,
+            args.embed_latency_ms / 1000,
+            args.embed_per_text_ms / 1000,
+            args.jitter,
+        )
+    )
+    kdb_service = create_kdb_service(args, embeddings)
+    try:
+        with discard_stdout():
+            with timed(phase_seconds, "context_chunks"):
+                contextualized = asyncio.run(
+                    contextualize(args, markdown_files, kdb_service.embeddings_manager)
+                )
+        peak_rss["context_chunks"] = peak_rss_mb()
+        chunk_latencies = []
+        context_latencies = []
+        chunks = []
+        for document_chunks, metrics in contextualized:
+            chunks += document_chunks
+            stage_seconds["chunk"] += metrics.stage_seconds.get("chunking", 0.0)
+            stage_seconds["contextualize"] += other_stages_seconds(
+                metrics.stage_seconds, metrics.total_seconds
+            )
+            chunk_latencies += [chunk.llm.latency_seconds for chunk in metrics.chunks]
+            context_latencies.append(metrics.total_seconds)
+
+        with timed(stage_seconds, "embed"):
+            embed(embeddings, [chunk.page_content for chunk in chunks], args)
+        peak_rss["embed"] = peak_rss_mb()
+        with timed(stage_seconds, "index"):
+            index_result = kdb_service.bulk_index_documents_in_vector_store(chunks)
+        peak_rss["index"] = peak_rss_mb()
+
+        rng = random.Random(7)
+        queries = [
+            " ".join(rng.sample(chunk.page_content.split(), 8))
+            for chunk in rng.choices(chunks, k=args.queries)
+        ]
+        with timed(stage_seconds, "search"):
+            search_latencies = search(kdb_service, queries, args.k)
+        peak_rss["search"] = peak_rss_mb()
+    finally:
+        if args.kdb == "pg":
+            from pg_common import drop_benchmark_tables
+
+            drop_benchmark_tables(kdb_service.embeddings_manager)
+
+    context_chunks_seconds = (
+        phase_seconds["context_chunks"]
+        + stage_seconds["embed"]
+        + stage_seconds["index"]
+    )
+    return {
+        "documents": args.documents,
+        "pages": pages,
+        "chunks": len(chunks),
+        "index_result": index_result,
+        "stage_seconds": stage_seconds,
+        "phase_wall_seconds": {
+            **phase_seconds,
+            "embed": stage_seconds["embed"],
+            "index": stage_seconds["index"],
+            "search": stage_seconds["search"],
+        },
+        "pages_per_second": pages / phase_seconds["transcription"],
+        "chunks_per_second": len(chunks) / context_chunks_seconds,
+        "searches_per_second": args.queries / stage_seconds["search"],
+        "latency": {
+            "transcription_document": latency_summary(transcription_latencies),
+            "page_llm": latency_summary(page_latencies),
+            "context_document": latency_summary(context_latencies),
+            "chunk_llm": latency_summary(chunk_latencies),
+            "search": latency_summary(search_latencies),
+        },
+        "peak_rss_mb": peak_rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--simple-share", type=float, default=0.7)
+    parser.add_argument("--llm-latency-ms", type=float, default=100)
+    parser.add_argument("--embed-latency-ms", type=float, default=20)
+    parser.add_argument("--embed-per-text-ms", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.25)
+    parser.add_argument("--max-concurrent-calls", type=int, default=16)
+    parser.add_argument("--embed-batch-size", type=int, default=250)
+    parser.add_argument("--max-concurrent-embeddings", type=int, default=4)
+    parser.add_argument("--vector-size", type=int, default=768)
+    parser.add_argument("--kdb", choices=["memory", "pg"], default="memory")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "synthetic.pdf")
+        kinds = gen_pdf(pdf_path, args.pages, args.simple_share, random.Random(7))
+        results = {"kdb": args.kdb, "page_kinds": kinds, **run(args, pdf_path)}
+    write_report("pipeline", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
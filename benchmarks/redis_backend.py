@@ -0,0 +1,223 @@
+"""
+Indexing, bulk re-index, delete by source and filtered search of the Redis backend.
+
+--chunks chunks spread over files of --chunks-per-file chunks are indexed with
+RedisEmbeddingsManager, then re-indexed in bulk after replacing --changed
+chunks of a file, a file is deleted by source and filtered searches (source tag
+and topic text filters, single and batched) are run. Every step is checked:
+indexed and found key counts, the bulk index counts, the keys left after the
+delete and the metadata of the search results. Source keys are read in pages
+of --batch-size. A source of --large-source-chunks chunks, more than the 10000
+MAXSEARCHRESULTS default, is then found, bulk re-indexed and deleted by source
+to check that key lookups are not capped. Without --redis-url, the backend runs
+against the in-process stand-in of redis_standin.py, give the URL of a
+redis-stack server (e.g. docker run -p 6379:6379 redis/redis-stack-server) to
+run against Redis.
+
+    python benchmarks/redis_backend.py --chunks 2000 --chunks-per-file 500
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from contextlib import nullcontext
+
+from common import latency_summary, timed, write_report
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from redis_standin import RedisStandIn
+
+from wizit_context_ingestor.infra.rag.redis_embeddings import RedisEmbeddingsManager
+
+TOPICS = ("revenue", "costs", "headcount", "audit")
+
+
+def gen_chunk(file_index: int, chunk_index: int, version: str = "") -> Document:
+    source = f"file_{file_index}"
+    return Document(
+        id=str(uuid.uuid5(uuid.NAMESPACE_OID, f"{source}-{chunk_index}{version}")),
+        page_content=f"chunk {chunk_index} of {source} {version}",
+        metadata={
+            "source": source,
+            "topic": TOPICS[chunk_index % len(TOPICS)],
+        },
+    )
+
+
+def gen_chunks(args) -> list[Document]:
+    return [
+        gen_chunk(index // args.chunks_per_file, index % args.chunks_per_file)
+        for index in range(args.chunks)
+    ]
+
+
+def source_keys(manager: RedisEmbeddingsManager, files: int) -> dict[str, int]:
+    return {
+        f"file_{file_index}": len(
+            set(manager.get_documents_keys_by_source_id(f"file_{file_index}"))
+        )
+        for file_index in range(files)
+    }
+
+
+def run(args, redis_url: str) -> dict:
+    files = -(-args.chunks // args.chunks_per_file)
+    manager = RedisEmbeddingsManager(
+        DeterministicFakeEmbedding(size=args.vector_size),
+        redis_url,
+        metadata_tags=["topic"],
+        index_name=f"bench_redis_{uuid.uuid4().hex[:8]}",
+        batch_size=args.batch_size,
+    )
+    timings = {}
+    checks = {}
+    result = {"chunks": args.chunks, "files": files, "checks": checks}
+    try:
+        chunks = gen_chunks(args)
+        with timed(timings, "index"):
+            indexed_ids = manager.index_documents(chunks)
+        expected_keys = {
+            f"file_{file_index}": sum(
+                1
+                for chunk in chunks
+                if chunk.metadata["source"] == f"file_{file_index}"
+            )
+            for file_index in range(files)
+        }
+        checks["index_ids"] = sorted(indexed_ids) == sorted(c.id for c in chunks)
+        with timed(timings, "find_source_keys"):
+            checks["source_keys_paged"] = source_keys(manager, files) == expected_keys
+
+        # replace the last chunks of file_1 by new versions
+        changed = min(args.changed, expected_keys.get("file_1", 0))
+        file_1 = [chunk for chunk in chunks if chunk.metadata["source"] == "file_1"]
+        replaced_ids = {chunk.id for chunk in file_1[len(file_1) - changed :]}
+        new_chunks = [
+            gen_chunk(1, chunk_index, "v2")
+            for chunk_index in range(len(file_1) - changed, len(file_1))
+        ]
+        reindexed = [chunk for chunk in chunks if chunk.id not in replaced_ids]
+        with timed(timings, "bulk_reindex"):
+            result["bulk_index_result"] = manager.bulk_index_documents(
+                reindexed + new_chunks
+            )
+        checks["bulk_index_counts"] = result["bulk_index_result"] == {
+            "num_added": changed,
+            "num_updated": 0,
+            "num_skipped": len(reindexed),
+            "num_deleted": changed,
+        }
+        checks["bulk_index_keys"] = set(
+            manager.get_documents_keys_by_source_id("file_1")
+        ) == {chunk.id for chunk in file_1 if chunk.id not in replaced_ids} | {
+            chunk.id for chunk in new_chunks
+        }
+
+        with timed(timings, "delete_source"):
+            result["delete_result"] = manager.delete_documents_by_source_id("file_0")
+        checks["delete_count"] = (
+            result["delete_result"]["vectors_deleted"] == expected_keys["file_0"]
+        )
+        checks["delete_keys_left"] = not manager.get_documents_keys_by_source_id(
+            "file_0"
+        )
+        checks["delete_other_sources"] = source_keys(manager, files) == {
+            **expected_keys,
+            "file_0": 0,
+        }
+
+        wanted_sources = [f"file_{files - 1}", "file_1"]
+        latencies = []
+        filtered_ok = True
+        for query_index in range(args.queries):
+            filters = (
+                {"source": wanted_sources}
+                if query_index % 2
+                else {"topic": TOPICS[query_index % len(TOPICS)]}
+            )
+            start = time.perf_counter()
+            docs = manager.search_records(f"chunk {query_index}", k=5, filters=filters)
+            latencies.append(time.perf_counter() - start)
+            filtered_ok &= len(docs) == 5 and all(
+                doc.metadata.get(key) in (value if isinstance(value, list) else [value])
+                for doc in docs
+                for key, value in filters.items()
+            )
+        checks["filtered_search"] = filtered_ok
+        result["filtered_search"] = latency_summary(latencies)
+
+        queries = [f"chunk {query_index}" for query_index in range(args.queries)]
+        with timed(timings, "search_many"):
+            results = manager.search_records_many(
+                queries, k=5, filters={"source": wanted_sources}
+            )
+        checks["filtered_search_many"] = len(results) == len(queries) and all(
+            len(docs) == 5
+            and all(doc.metadata.get("source") in wanted_sources for doc in docs)
+            for docs in results
+        )
+        checks["deleted_source_not_found"] = not any(
+            doc.metadata.get("source") == "file_0"
+            for doc in manager.search_records("chunk 1", k=args.chunks)
+        )
+
+        # a single source with more keys than MAXSEARCHRESULTS
+        large_source = f"file_{files}"
+        large_chunks = [
+            gen_chunk(files, chunk_index)
+            for chunk_index in range(args.large_source_chunks)
+        ]
+        manager.index_documents(large_chunks)
+        with timed(timings, "find_large_source_keys"):
+            large_keys = manager.get_documents_keys_by_source_id(large_source)
+        checks["large_source_keys"] = len(large_keys) == len(large_chunks) and set(
+            large_keys
+        ) == {chunk.id for chunk in large_chunks}
+        with timed(timings, "bulk_reindex_large_source"):
+            large_bulk_result = manager.bulk_index_documents(large_chunks)
+        checks["large_source_bulk_index"] = large_bulk_result == {
+            "num_added": 0,
+            "num_updated": 0,
+            "num_skipped": len(large_chunks),
+            "num_deleted": 0,
+        }
+        with timed(timings, "delete_large_source"):
+            large_delete_result = manager.delete_documents_by_source_id(large_source)
+        checks["large_source_delete"] = large_delete_result["vectors_deleted"] == len(
+            large_chunks
+        ) and not manager.get_documents_keys_by_source_id(large_source)
+    finally:
+        manager.vector_store.index.delete(drop=True)
+
+    for name, seconds in timings.items():
+        result[f"{name}_seconds"] = seconds
+    result["index_chunks_per_second"] = args.chunks / timings["index"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunks-per-file", type=int, default=500)
+    parser.add_argument("--changed", type=int, default=10)
+    parser.add_argument("--vector-size", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--large-source-chunks", type=int, default=12000)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    stand_in = RedisStandIn() if args.redis_url is None else nullcontext(args.redis_url)
+    with stand_in as redis_url:
+        result = run(args, redis_url)
+    result["server"] = "stand-in" if args.redis_url is None else args.redis_url
+    write_report("redis_backend", result, args.output)
+    failed = [name for name, passed in result["checks"].items() if not passed]
+    if failed:
+        sys.exit(f"Failed checks: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,675 @@
+"""
+In-process stand-in for a redis-stack server, for the Redis backend benchmark.
+
+A threaded TCP server speaking RESP2 (its URL asks redis-py for protocol 2)
+with the commands used by redis-py, redisvl and langchain-redis: hashes, key
+deletes and the search index commands (FT.CREATE, FT.SEARCH, FT.AGGREGATE,
+FT.CURSOR, FT.INFO, FT.DROPINDEX, FT._LIST). FT.SEARCH understands the queries
+redisvl builds: tag, text and numeric filters joined by AND, OR and negation,
+KNN vector queries over FLOAT32 vectors (cosine, L2 and inner product, exact
+search), RETURN, SORTBY, LIMIT and NOCONTENT. FT.AGGREGATE takes the same
+filters with LOAD and WITHCURSOR, the rows of a cursor are fixed when it is
+created. Documents are matched by a scan, it is meant for correctness checks,
+not for timings comparable to redis-stack. Like RediSearch, FT.SEARCH rejects
+an offset plus limit above MAXSEARCHRESULTS.
+
+    with RedisStandIn() as redis_url:
+        manager = RedisEmbeddingsManager(embeddings, redis_url)
+"""
+
+import math
+import re
+import socketserver
+import threading
+
+import numpy as np
+
+MAX_SEARCH_RESULTS = 10000
+VECTOR_DTYPES = {"FLOAT32": np.float32, "FLOAT64": np.float64}
+TEXT_TOKEN = re.compile(r"\w+")
+
+
+class CommandError(Exception):
+    """Error replied to the client."""
+
+
+class Status(str):
+    """Simple string reply."""
+
+
+def encode(value) -> bytes:
+    if isinstance(value, Status):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, CommandError):
+        return b"-ERR " + str(value).encode() + b"\r\n"
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b":" + str(value).encode() + b"\r\n"
+    if isinstance(value, float):
+        value = repr(value)
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"$" + str(len(value)).encode() + b"\r\n" + value + b"\r\n"
+    return b"*" + str(len(value)).encode() + b"\r\n" + b"".join(map(encode, value))
+
+
+def unescape(value: str) -> str:
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+def split_unescaped(value: str, separator: str) -> list[str]:
+    return re.split(rf"(?<!\\){re.escape(separator)}", value)
+
+
+class Field:
+    def __init__(self, name: str, field_type: str, options: dict):
+        self.name = name
+        self.type = field_type
+        self.options = options
+
+
+class Index:
+    def __init__(self, name: str, prefixes: list[str], fields: dict[str, Field]):
+        self.name = name
+        self.prefixes = prefixes
+        self.fields = fields
+
+    def covers(self, key: bytes) -> bool:
+        return any(key.decode().startswith(prefix) for prefix in self.prefixes)
+
+
+class QueryParser:
+    """Recursive descent parser of the filter part of a search query."""
+
+    def __init__(self, query: str, index: Index):
+        self.query = query
+        self.index = index
+        self.position = 0
+
+    def parse(self):
+        expression = self._or()
+        self._skip()
+        if self.position != len(self.query):
+            raise CommandError(f"Syntax error at offset {self.position}")
+        return expression
+
+    def _skip(self):
+        while self.position < len(self.query) and self.query[self.position].isspace():
+            self.position += 1
+
+    def _peek(self) -> str:
+        self._skip()
+        return self.query[self.position : self.position + 1]
+
+    def _take(self, char: str):
+        if self._peek() != char:
+            raise CommandError(f"Syntax error at offset {self.position}")
+        self.position += 1
+
+    def _until(self, closing: str) -> str:
+        """Text up to the unescaped closing char, consumed with it."""
+        start = self.position
+        while self.position < len(self.query):
+            char = self.query[self.position]
+            if char == "\\":
+                self.position += 2
+                continue
+            if char == closing:
+                self.position += 1
+                return self.query[start : self.position - 1]
+            self.position += 1
+        raise CommandError("Syntax error, unterminated expression")
+
+    def _or(self):
+        terms = [self._and()]
+        while self._peek() == "|":
+            self.position += 1
+            terms.append(self._and())
+        return terms[0] if len(terms) == 1 else lambda doc: any(t(doc) for t in terms)
+
+    def _and(self):
+        terms = []
+        while self._peek() not in ("", ")", "|"):
+            terms.append(self._atom())
+        if not terms:
+            raise CommandError(f"Syntax error at offset {self.position}")
+        return terms[0] if len(terms) == 1 else lambda doc: all(t(doc) for t in terms)
+
+    def _atom(self):
+        char = self._peek()
+        if char == "(":
+            self.position += 1
+            expression = self._or()
+            self._take(")")
+            return expression
+        if char == "-":
+            self.position += 1
+            expression = self._atom()
+            return lambda doc: not expression(doc)
+        if char == "*":
+            self.position += 1
+            return lambda doc: True
+        if char != "@":
+            raise CommandError("Only field queries are supported")
+        self.position += 1
+        name = self._until(":").strip()
+        field = self.index.fields.get(name)
+        if field is None:
+            raise CommandError(f"Unknown field `{name}`")
+        char = self._peek()
+        self.position += 1
+        if char == "{" and field.type == "TAG":
+            return self._tag(field, self._until("}"))
+        if char == "[" and field.type == "NUMERIC":
+            return self._numeric(field, self._until("]"))
+        if field.type == "TEXT":
+            if char == "(":
+                return self._text(field, self._until(")"))
+            if char == '"':
+                return self._text(field, f'"{self._until(chr(34))}"')
+            start = self.position - 1
+            while self.position < len(self.query) and not (
+                self.query[self.position].isspace() or self.query[self.position] in ")|"
+            ):
+                self.position += 1
+            return self._text(field, self.query[start : self.position])
+        raise CommandError(f"Unsupported query on {field.type} field `{name}`")
+
+    @staticmethod
+    def _tag(field: Field, expression: str):
+        separator = field.options.get("SEPARATOR", ",")
+        case_sensitive = "CASESENSITIVE" in field.options
+
+        def normalize(value: str) -> str:
+            return value if case_sensitive else value.lower()
+
+        wanted = {
+            normalize(unescape(value.strip()))
+            for value in split_unescaped(expression, "|")
+        }
+
+        def matches(doc) -> bool:
+            value = doc.get(field.name.encode())
+            if value is None:
+                return False
+            return any(
+                normalize(tag.strip()) in wanted
+                for tag in value.decode().split(separator)
+            )
+
+        return matches
+
+    @staticmethod
+    def _numeric(field: Field, expression: str):
+        bounds = []
+        for bound in expression.split():
+            exclusive = bound.startswith("(")
+            bound = bound.lstrip("(")
+            bounds.append((float(bound.replace("+inf", "inf")), exclusive))
+        if len(bounds) != 2:
+            raise CommandError("Bad numeric range")
+        (low, low_exclusive), (high, high_exclusive) = bounds
+
+        def matches(doc) -> bool:
+            value = doc.get(field.name.encode())
+            if value is None:
+                return False
+            number = float(value)
+            above = number > low if low_exclusive else number >= low
+            below = number < high if high_exclusive else number <= high
+            return above and below
+
+        return matches
+
+    @staticmethod
+    def _text(field: Field, expression: str):
+        phrases = [
+            TEXT_TOKEN.findall(unescape(alternative).strip().strip('"').lower())
+            for alternative in split_unescaped(expression, "|")
+        ]
+
+        def matches(doc) -> bool:
+            value = doc.get(field.name.encode())
+            if value is None:
+                return False
+            words = TEXT_TOKEN.findall(value.decode(errors="ignore").lower())
+            return any(
+                phrase
+                and any(
+                    words[start : start + len(phrase)] == phrase
+                    for start in range(len(words) - len(phrase) + 1)
+                )
+                for phrase in phrases
+            )
+
+        return matches
+
+
+KNN_QUERY = re.compile(
+    r"^(?P<filter>.*?)\s*=>\s*\[KNN\s+(?P<k>\S+)\s+@(?P<field>\w+)\s+\$(?P<vector>\w+)"
+    r"(?P<options>[^\]]*)\]\s*$",
+    re.DOTALL,
+)
+
+
+class Store:
+    """Keys and search indexes of the stand-in, guarded by one lock."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hashes: dict[bytes, dict[bytes, bytes]] = {}
+        self.indexes: dict[str, Index] = {}
+        self.cursors: dict[int, tuple[str, list, int]] = {}
+        self.next_cursor_id = 1
+
+    def execute(self, args: list[bytes]):
+        command = args[0].decode().upper().replace(".", "_")
+        handler = getattr(self, f"cmd_{command}", None)
+        if handler is None:
+            raise CommandError(f"unknown command '{args[0].decode()}'")
+        with self.lock:
+            return handler(*args[1:])
+
+    # connection and server commands
+
+    def cmd_PING(self, *args):
+        return Status("PONG")
+
+    def cmd_CLIENT(self, *args):
+        return Status("OK")
+
+    def cmd_SELECT(self, *args):
+        return Status("OK")
+
+    def cmd_ECHO(self, message):
+        return message
+
+    def cmd_INFO(self, *args):
+        return "# Server\r\nredis_version:7.4.0\r\nredis_mode:standalone\r\n"
+
+    def cmd_MODULE(self, *args):
+        return [
+            [b"name", b"search", b"ver", 21005, b"path", b"", b"args", []],
+            [b"name", b"ReJSON", b"ver", 20806, b"path", b"", b"args", []],
+        ]
+
+    # keys
+
+    def cmd_HSET(self, key, *pairs):
+        fields = self.hashes.setdefault(key, {})
+        added = 0
+        for name, value in zip(pairs[::2], pairs[1::2]):
+            added += name not in fields
+            fields[name] = value
+        return added
+
+    def cmd_HGETALL(self, key):
+        return [item for pair in self.hashes.get(key, {}).items() for item in pair]
+
+    def cmd_HGET(self, key, name):
+        return self.hashes.get(key, {}).get(name)
+
+    def cmd_HMGET(self, key, *names):
+        fields = self.hashes.get(key, {})
+        return [fields.get(name) for name in names]
+
+    def cmd_EXISTS(self, *keys):
+        return sum(key in self.hashes for key in keys)
+
+    def cmd_DEL(self, *keys):
+        return sum(self.hashes.pop(key, None) is not None for key in keys)
+
+    cmd_UNLINK = cmd_DEL
+
+    def cmd_EXPIRE(self, key, *args):
+        return int(key in self.hashes)
+
+    def cmd_TYPE(self, key):
+        return Status("hash" if key in self.hashes else "none")
+
+    # search
+
+    def cmd_FT__LIST(self):
+        return list(self.indexes)
+
+    def cmd_FT_CREATE(self, name, *args):
+        name = name.decode()
+        if name in self.indexes:
+            raise CommandError("Index already exists")
+        args = [arg.decode() for arg in args]
+        prefixes = []
+        position = 0
+        while position < len(args) and args[position].upper() != "SCHEMA":
+            if args[position].upper() == "ON" and args[position + 1].upper() != "HASH":
+                raise CommandError("Only HASH indexes are supported")
+            if args[position].upper() == "PREFIX":
+                count = int(args[position + 1])
+                prefixes = args[position + 2 : position + 2 + count]
+                position += 2 + count
+                continue
+            position += 1
+        position += 1
+        fields = {}
+        while position < len(args):
+            field_name = args[position]
+            position += 1
+            if args[position].upper() == "AS":
+                field_name = args[position + 1]
+                position += 2
+            field_type = args[position].upper()
+            position += 1
+            options = {}
+            if field_type == "VECTOR":
+                options["ALGORITHM"] = args[position].upper()
+                count = int(args[position + 1])
+                attributes = args[position + 2 : position + 2 + count]
+                options.update(
+                    (key.upper(), value.upper())
+                    for key, value in zip(attributes[::2], attributes[1::2])
+                )
+                position += 2 + count
+            while position < len(args) and args[position].upper() in (
+                "SORTABLE",
+                "UNF",
+                "NOSTEM",
+                "NOINDEX",
+                "CASESENSITIVE",
+                "WITHSUFFIXTRIE",
+                "INDEXMISSING",
+                "INDEXEMPTY",
+                "WEIGHT",
+                "SEPARATOR",
+                "PHONETIC",
+            ):
+                option = args[position].upper()
+                if option in ("WEIGHT", "SEPARATOR", "PHONETIC"):
+                    options[option] = args[position + 1]
+                    position += 2
+                else:
+                    options[option] = True
+                    position += 1
+            fields[field_name] = Field(field_name, field_type, options)
+        self.indexes[name] = Index(name, prefixes or [""], fields)
+        return Status("OK")
+
+    def _index(self, name: bytes) -> Index:
+        index = self.indexes.get(name.decode())
+        if index is None:
+            raise CommandError(f"{name.decode()}: no such index")
+        return index
+
+    def cmd_FT_DROPINDEX(self, name, *args):
+        index = self._index(name)
+        if args and args[0].upper() == b"DD":
+            for key in [key for key in self.hashes if index.covers(key)]:
+                del self.hashes[key]
+        del self.indexes[index.name]
+        return Status("OK")
+
+    def cmd_FT_INFO(self, name):
+        index = self._index(name)
+        attributes = []
+        for field in index.fields.values():
+            attribute = [b"identifier", field.name, b"attribute", field.name]
+            attribute += [b"type", field.type]
+            for option, value in field.options.items():
+                attribute += [option, value] if value is not True else [option]
+            attributes.append(attribute)
+        return [
+            b"index_name",
+            index.name,
+            b"index_definition",
+            [b"key_type", b"HASH", b"prefixes", index.prefixes],
+            b"attributes",
+            attributes,
+            b"num_docs",
+            sum(index.covers(key) for key in self.hashes),
+        ]
+
+    def cmd_FT_SEARCH(self, name, query, *args):
+        index = self._index(name)
+        args = list(args)
+        no_content = False
+        return_fields = None
+        sort_by = None
+        offset, limit = 0, 10
+        params = {}
+        position = 0
+        while position < len(args):
+            option = args[position].decode().upper()
+            position += 1
+            if option == "NOCONTENT":
+                no_content = True
+            elif option == "RETURN":
+                count = int(args[position])
+                return_fields = args[position + 1 : position + 1 + count]
+                position += 1 + count
+            elif option == "SORTBY":
+                descending = (
+                    position + 1 < len(args) and args[position + 1].upper() == b"DESC"
+                )
+                sort_by = (args[position], descending)
+                position += (
+                    2
+                    if position + 1 < len(args)
+                    and args[position + 1].upper() in (b"ASC", b"DESC")
+                    else 1
+                )
+            elif option == "LIMIT":
+                offset, limit = int(args[position]), int(args[position + 1])
+                position += 2
+            elif option == "PARAMS":
+                count = int(args[position])
+                pairs = args[position + 1 : position + 1 + count]
+                params = {
+                    key.decode(): value for key, value in zip(pairs[::2], pairs[1::2])
+                }
+                position += 1 + count
+            elif option in ("DIALECT", "TIMEOUT", "SCORER"):
+                position += 1
+            elif option in ("WITHSCORES", "VERBATIM", "NOSTOPWORDS", "INORDER"):
+                continue
+            else:
+                raise CommandError(f"Unsupported FT.SEARCH option {option}")
+        if offset + limit > MAX_SEARCH_RESULTS:
+            raise CommandError(f"OFFSET exceeds maximum of {MAX_SEARCH_RESULTS}")
+
+        query = query.decode()
+        knn = KNN_QUERY.match(query)
+        if knn:
+            query = knn.group("filter") or "*"
+        matches = QueryParser(query, index).parse()
+        docs = [
+            (key, dict(fields))
+            for key, fields in self.hashes.items()
+            if index.covers(key) and matches(fields)
+        ]
+        if knn:
+            docs = self._knn(index, knn, params, docs)
+        if sort_by is not None:
+            sort_field, descending = sort_by
+
+            def sort_key(doc):
+                value = doc[1].get(sort_field)
+                if value is None:
+                    return (1, 0)
+                try:
+                    return (0, float(value))
+                except ValueError:
+                    return (0, value)
+
+            docs.sort(key=sort_key, reverse=descending)
+        reply = [len(docs)]
+        for key, fields in docs[offset : offset + limit]:
+            reply.append(key)
+            if no_content:
+                continue
+            if return_fields is not None:
+                fields = {
+                    name: fields[name] for name in return_fields if name in fields
+                }
+            reply.append([item for pair in fields.items() for item in pair])
+        return reply
+
+    def cmd_FT_AGGREGATE(self, name, query, *args):
+        index = self._index(name)
+        args = list(args)
+        load_fields = []
+        with_cursor = False
+        count = 1000
+        position = 0
+        while position < len(args):
+            option = args[position].decode().upper()
+            position += 1
+            if option == "LOAD":
+                load_count = int(args[position])
+                load_fields = [
+                    field.decode().lstrip("@")
+                    for field in args[position + 1 : position + 1 + load_count]
+                ]
+                position += 1 + load_count
+            elif option == "WITHCURSOR":
+                with_cursor = True
+            elif option == "COUNT":
+                count = int(args[position])
+                position += 1
+            elif option in ("DIALECT", "MAXIDLE", "TIMEOUT", "SCORER"):
+                position += 1
+            elif option in ("VERBATIM", "ADDSCORES"):
+                continue
+            else:
+                raise CommandError(f"Unsupported FT.AGGREGATE option {option}")
+
+        matches = QueryParser(query.decode(), index).parse()
+        rows = []
+        for key, fields in self.hashes.items():
+            if not (index.covers(key) and matches(fields)):
+                continue
+            row = []
+            for field in load_fields:
+                value = key if field == "__key" else fields.get(field.encode())
+                if value is not None:
+                    row += [field.encode(), value]
+            rows.append(row)
+        if not with_cursor:
+            return [len(rows), *rows]
+        cursor_id = self.next_cursor_id
+        self.next_cursor_id += 1
+        self.cursors[cursor_id] = (index.name, rows, count)
+        return self._read_cursor(cursor_id, count)
+
+    def cmd_FT_CURSOR(self, subcommand, name, cursor_id, *args):
+        subcommand = subcommand.decode().upper()
+        cursor_id = int(cursor_id)
+        cursor = self.cursors.get(cursor_id)
+        if cursor is None or cursor[0] != name.decode():
+            raise CommandError("Cursor not found")
+        if subcommand == "DEL":
+            del self.cursors[cursor_id]
+            return Status("OK")
+        if subcommand != "READ":
+            raise CommandError(f"Unsupported FT.CURSOR subcommand {subcommand}")
+        count = cursor[2]
+        if len(args) >= 2 and args[0].upper() == b"COUNT":
+            count = int(args[1])
+        return self._read_cursor(cursor_id, count)
+
+    def _read_cursor(self, cursor_id: int, count: int) -> list:
+        index_name, rows, default_count = self.cursors[cursor_id]
+        page, rows = rows[:count], rows[count:]
+        if rows:
+            self.cursors[cursor_id] = (index_name, rows, default_count)
+        else:
+            del self.cursors[cursor_id]
+            cursor_id = 0
+        return [[len(page), *page], cursor_id]
+
+    @staticmethod
+    def _knn(index: Index, knn, params: dict, docs: list) -> list:
+        field = index.fields.get(knn.group("field"))
+        if field is None or field.type != "VECTOR":
+            raise CommandError(f"Unknown vector field `{knn.group('field')}`")
+        k = knn.group("k")
+        k = int(params[k[1:]] if k.startswith("$") else k)
+        score_name = "__" + field.name + "_score"
+        alias = re.search(r"\bAS\s+(\w+)", knn.group("options"))
+        if alias:
+            score_name = alias.group(1)
+        dtype = VECTOR_DTYPES[field.options.get("TYPE", "FLOAT32")]
+        metric = field.options.get("DISTANCE_METRIC", "L2")
+        query_vector = np.frombuffer(params[knn.group("vector")], dtype=dtype)
+        scored = []
+        for key, fields in docs:
+            vector = fields.get(field.name.encode())
+            if vector is None:
+                continue
+            vector = np.frombuffer(vector, dtype=dtype)
+            if metric == "COSINE":
+                norms = float(np.linalg.norm(vector) * np.linalg.norm(query_vector))
+                distance = 1 - float(vector @ query_vector) / norms if norms else 1.0
+            elif metric == "IP":
+                distance = 1 - float(vector @ query_vector)
+            else:
+                distance = float(np.sum((vector - query_vector) ** 2))
+            if not math.isnan(distance):
+                fields[score_name.encode()] = repr(distance).encode()
+                scored.append((distance, key, fields))
+        scored.sort(key=lambda item: item[0])
+        return [(key, fields) for _, key, fields in scored[:k]]
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def _read_command(self) -> list[bytes] | None:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            if not args:
+                continue
+            try:
+                reply = self.server.store.execute(args)
+            except CommandError as e:
+                reply = e
+            except Exception as e:
+                reply = CommandError(f"{type(e).__name__}: {e}")
+            self.wfile.write(encode(reply))
+
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    """Stand-in server on a free local port, the context manager gives its URL."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), RespHandler)
+        self.store = Store()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}?protocol=2"
+
+    def __enter__(self) -> str:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.url
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,126 @@
+"""
+Latency per stage and result diversity of the KdbService.retrieve pipeline.
+
+Chunks are generated as groups of near duplicates (the same passage indexed from
+several files), queries are drawn near the groups. For every --fetch-k value the
+pipeline (over-fetch, MMR over the stored vectors, optional cross encoder) is
+compared with a plain similarity search: distinct groups in the top k, mean
+cosine similarity to the query, and the p50 / p95 of every stage. The cross
+encoder stage runs when --cross-encoder names a model (needs sentence-transformers).
+
+    python benchmarks/rerank_pipeline.py --groups 2000 --duplicates 10 --fetch-k 20 50 100
+"""
+
+import argparse
+import time
+
+import numpy as np
+from common import QueryVectors, latency_summary, write_report
+from langchain_core.documents import Document
+
+from wizit_context_ingestor.application.kdb_service import KdbService
+from wizit_context_ingestor.data.kdb import KdbServices
+from wizit_context_ingestor.infra.rag.kdb_registry import create_embeddings_manager
+
+
+def gen_corpus(args, rng):
+    centers = rng.normal(size=(args.groups, args.vector_size)).astype(np.float32)
+    group_of_row = np.repeat(np.arange(args.groups), args.duplicates)
+    noise = rng.normal(scale=0.05, size=(len(group_of_row), args.vector_size))
+    vectors = centers[group_of_row] + noise.astype(np.float32)
+    query_groups = rng.integers(0, args.groups, size=args.queries)
+    query_vectors = centers[query_groups] + rng.normal(
+        scale=1.0, size=(args.queries, args.vector_size)
+    ).astype(np.float32)
+    texts = [f"passage {group} copy {row}" for row, group in enumerate(group_of_row)]
+    queries = [f"query {index}" for index in range(args.queries)]
+    embeddings = QueryVectors(
+        {
+            **dict(zip(texts, vectors.tolist())),
+            **dict(zip(queries, query_vectors.tolist())),
+        }
+    )
+    docs = [
+        Document(
+            page_content=text,
+            metadata={"source": f"file_{row % 50}", "group": int(group)},
+        )
+        for row, (text, group) in enumerate(zip(texts, group_of_row))
+    ]
+    return embeddings, docs, queries, query_vectors
+
+
+def quality(results, query_vectors, embeddings) -> dict:
+    distinct = []
+    relevance = []
+    for docs, query_vector in zip(results, query_vectors):
+        distinct.append(len({doc.metadata["group"] for doc in docs}))
+        query = query_vector / np.linalg.norm(query_vector)
+        vectors = np.asarray(embeddings.embed_documents([d.page_content for d in docs]))
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        relevance.append(float(np.mean(vectors @ query)))
+    return {
+        "mean_distinct_groups": float(np.mean(distinct)),
+        "mean_relevance": float(np.mean(relevance)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--groups", type=int, default=2000)
+    parser.add_argument("--duplicates", type=int, default=10)
+    parser.add_argument("--vector-size", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--cross-encoder", default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    embeddings, docs, queries, query_vectors = gen_corpus(args, rng)
+    embeddings_manager = create_embeddings_manager(KdbServices.MEMORY.value, embeddings)
+    embeddings_manager.bulk_index_documents(docs)
+    reranker = None
+    if args.cross_encoder:
+        from wizit_context_ingestor.infra.rag.cross_encoder_reranker import (
+            CrossEncoderReranker,
+        )
+
+        reranker = CrossEncoderReranker(args.cross_encoder)
+
+    latencies = []
+    plain = []
+    for query in queries:
+        start = time.perf_counter()
+        plain.append(embeddings_manager.search_records(query, k=args.k))
+        latencies.append(time.perf_counter() - start)
+    results = {
+        "chunks": len(docs),
+        "similarity": {
+            **quality(plain, query_vectors, embeddings),
+            "latency": latency_summary(latencies),
+        },
+        "retrieve": [],
+    }
+    for fetch_k in args.fetch_k:
+        kdb_service = KdbService(embeddings_manager, reranker=reranker)
+        retrieved = [
+            kdb_service.retrieve(
+                query, k=args.k, fetch_k=fetch_k, lambda_mult=args.lambda_mult
+            )
+            for query in queries
+        ]
+        results["retrieve"].append(
+            {
+                "fetch_k": fetch_k,
+                **quality(retrieved, query_vectors, embeddings),
+                "stages": kdb_service.get_search_stats()["latency"],
+            }
+        )
+    write_report("rerank_pipeline", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Search latency through KdbService with and without the retrieval caches.
+
+A chat like query stream (a few popular questions asked many times, sometimes
+with different spacing, plus a tail of unique questions) searches the in memory
+backend, with embeddings answering after --embed-latency-ms to stand in for the
+remote embedding call. A file is re-indexed every --write-every queries, which
+invalidates the cached results of searches that could find it. Each mode reports
+the p50 / p95 of KdbService.search and the hit rates of the caches.
+
+    python benchmarks/retrieval_cache.py --chunks 20000 --queries 2000
+"""
+
+import argparse
+import time
+
+import numpy as np
+from common import write_report
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from wizit_context_ingestor.application.kdb_service import KdbService
+from wizit_context_ingestor.data.kdb import KdbServices
+from wizit_context_ingestor.infra.cache.memory_search_cache import (
+    InMemorySearchResultCache,
+)
+from wizit_context_ingestor.infra.rag.cached_embeddings import CachedQueryEmbeddings
+from wizit_context_ingestor.infra.rag.kdb_registry import create_embeddings_manager
+
+
+class SlowEmbeddings(Embeddings):
+    """Fake embeddings whose query calls take as long as a remote call."""
+
+    def __init__(self, vector_size: int, latency_seconds: float):
+        self.embeddings = DeterministicFakeEmbedding(size=vector_size)
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        self.calls += 1
+        time.sleep(self.latency_seconds)
+        return self.embeddings.embed_query(text)
+
+
+def gen_chunks(size: int, chunks_per_file: int) -> list[Document]:
+    return [
+        Document(
+            page_content=f"chunk {index} of file {index // chunks_per_file}",
+            metadata={"source": f"file_{index // chunks_per_file}"},
+        )
+        for index in range(size)
+    ]
+
+
+def gen_queries(count: int, popular: int, repeat_ratio: float, rng) -> list[tuple]:
+    """Queries as (text, filters), popular ones drawn with a zipf distribution."""
+    queries = []
+    for index in range(count):
+        if rng.random() < repeat_ratio:
+            rank = min(int(rng.zipf(1.3)), popular) - 1
+            text = f"what does clause {rank} say about payments"
+            if rng.random() < 0.2:
+                text = f"  what does clause {rank}  say about payments "
+            filters = {"source": [f"file_{rank % 5}"]} if rank % 3 == 0 else None
+        else:
+            text = f"unique question {index}"
+            filters = None
+        queries.append((text, filters))
+    return queries
+
+
+def run_mode(mode: str, chunks, queries, args) -> dict:
+    embeddings = SlowEmbeddings(args.vector_size, args.embed_latency_ms / 1000)
+    query_embeddings = embeddings
+    if mode != "no_cache":
+        query_embeddings = CachedQueryEmbeddings(embeddings)
+    search_cache = None
+    if mode == "embedding_and_result_cache":
+        search_cache = InMemorySearchResultCache(ttl_seconds=args.ttl_seconds)
+    embeddings_manager = create_embeddings_manager(
+        KdbServices.MEMORY.value, query_embeddings
+    )
+    kdb_service = KdbService(embeddings_manager, search_cache=search_cache)
+    kdb_service.bulk_index_documents_in_vector_store(chunks)
+    files = len(chunks) // args.chunks_per_file
+
+    start = time.perf_counter()
+    for index, (text, filters) in enumerate(queries):
+        kdb_service.search(text, k=args.k, filters=filters)
+        if args.write_every and (index + 1) % args.write_every == 0:
+            file_index = (index // args.write_every) % files
+            kdb_service.index_documents_in_vector_store(
+                chunks[
+                    file_index * args.chunks_per_file : (file_index + 1)
+                    * args.chunks_per_file
+                ]
+            )
+    elapsed = time.perf_counter() - start
+
+    stats = kdb_service.get_search_stats()
+    result = {
+        "mode": mode,
+        "search": stats["latency"]["search"],
+        "queries_per_second": len(queries) / elapsed,
+        "embedding_calls": embeddings.calls,
+    }
+    if isinstance(query_embeddings, CachedQueryEmbeddings):
+        result["query_embeddings_cache"] = query_embeddings.get_stats()
+    if "search_cache" in stats:
+        result["search_cache"] = stats["search_cache"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--chunks-per-file", type=int, default=200)
+    parser.add_argument("--vector-size", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--popular", type=int, default=50)
+    parser.add_argument("--repeat-ratio", type=float, default=0.7)
+    parser.add_argument("--embed-latency-ms", type=float, default=40)
+    parser.add_argument("--ttl-seconds", type=float, default=30)
+    parser.add_argument("--write-every", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    chunks = gen_chunks(args.chunks, args.chunks_per_file)
+    queries = gen_queries(args.queries, args.popular, args.repeat_ratio, rng)
+    results = [
+        run_mode(mode, chunks, queries, args)
+        for mode in ("no_cache", "embedding_cache", "embedding_and_result_cache")
+    ]
+    write_report("retrieval_cache", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Hot path cost and upload volume of the LangSmith tracing policies.
+
+--documents copies of a synthetic PDF of --pages pages are transcribed with
+fake chat models (see fakes.py) failing --error-rate of their
+calls, under every tracing mode. Traces go to a local HTTP sink standing in for
+LangSmith, which counts the requests and bytes it receives. Reported per mode:
+wall time against tracing disabled, traced calls, bytes uploaded, and the
+time spent redacting payloads. "always_unredacted" is a plain LangSmith Client,
+as the managers used before tracing policies.
+
+    python benchmarks/tracing_overhead.py --documents 4 --pages 10 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import discard_stdout, write_report
+from fakes import FakeModels, FakeVisionChatModel, LocalFile, gen_pdf
+from langsmith import Client, tracing_context
+
+from wizit_context_ingestor.application.transcription_service import (
+    TranscriptionService,
+)
+from wizit_context_ingestor.domain.models import TracingPolicy
+from wizit_context_ingestor.infra.tracing.langsmith_tracing import LangSmithTracing
+
+
+class FailingVisionChatModel(FakeVisionChatModel):
+    """Fake chat model raising on a share of its calls, like a flaky provider."""
+
+    error_rate: float = 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.rng is None:
+            self.rng = random.Random(self.seed)
+        if self.rng.random() < self.error_rate:
+            raise RuntimeError("503 service unavailable")
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    """LangSmith stand-in accepting every request and counting the bytes."""
+
+    received = {"requests": 0, "bytes": 0}
+    lock = threading.Lock()
+
+    def _reply(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def do_GET(self):
+        self._reply()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with self.lock:
+            self.received["requests"] += 1
+            self.received["bytes"] += len(body)
+        self._reply()
+
+    do_PATCH = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+async def transcribe(args, pdf_path: str, trace) -> float:
+    strong = FailingVisionChatModel(
+        model_id="strong",
+        latency_seconds=args.call_latency_ms / 1000,
+        error_rate=args.error_rate,
+    )
+    service = TranscriptionService(
+        FakeModels(strong),
+        LocalFile(pdf_path),
+        max_page_attempts=1,
+        llm_semaphore=asyncio.Semaphore(args.max_concurrent_calls),
+    )
+
+    async def document(i: int):
+        # one trace context per document, as the manager decorators do
+        with trace():
+            try:
+                await service.process_document(f"doc-{i}.pdf")
+            except Exception:
+                pass
+
+    start = time.perf_counter()
+    await asyncio.gather(*[document(i) for i in range(args.documents)])
+    return time.perf_counter() - start
+
+
+def run_mode(args, pdf_path: str, api_url: str, mode: str) -> dict:
+    SinkHandler.received.update(requests=0, bytes=0)
+    tracing = None
+    if mode == "disabled":
+        client = None
+
+        def trace():
+            return tracing_context(enabled=False)
+
+    elif mode == "always_unredacted":
+        client = Client(api_url=api_url, api_key="benchmark")
+
+        def trace():
+            return tracing_context(enabled=True, project_name="bench", client=client)
+
+    else:
+        tracing = LangSmithTracing(
+            "benchmark",
+            "bench",
+            TracingPolicy(mode=mode, sample_rate=args.sample_rate),
+            api_url=api_url,
+        )
+        client = tracing.client
+        trace = tracing.trace
+    # keep the errors printed by the workflow nodes out of the report
+    with discard_stdout():
+        seconds = asyncio.run(transcribe(args, pdf_path, trace))
+    flush_start = time.perf_counter()
+    if client is not None:
+        client.flush()
+    result = {
+        "mode": mode,
+        "seconds": seconds,
+        "flush_seconds": time.perf_counter() - flush_start,
+        "upload_requests": SinkHandler.received["requests"],
+        "upload_bytes": SinkHandler.received["bytes"],
+    }
+    if tracing is not None:
+        result["tracing"] = tracing.get_stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--call-latency-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--sample-rate", type=float, default=0.25)
+    parser.add_argument("--max-concurrent-calls", type=int, default=16)
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=[
+            "disabled",
+            "off",
+            "sampled",
+            "errors_only",
+            "always",
+            "always_unredacted",
+        ],
+    )
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SinkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_address[1]}"
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "synthetic.pdf")
+        gen_pdf(pdf_path, args.pages, 0.7, random.Random(7))
+        for mode in args.modes:
+            random.seed(7)
+            results.append(run_mode(args, pdf_path, api_url, mode))
+    server.shutdown()
+    baseline = results[0]["seconds"]
+    for result in results:
+        result["overhead_pct"] = (result["seconds"] / baseline - 1) * 100
+    write_report("tracing_overhead", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Cost and latency of the transcription cascade against the strong model alone.
+
+A synthetic PDF mixes text pages, ruled tables and scanned (noise image) pages,
+--simple-share of them plain text. Fake chat models answer after their latency
+with token usage in their response metadata: the fast model is --speedup times
+faster and its transcription of a simple page scores below the accuracy threshold
+with --fast-failure-rate, which escalates the page. --documents copies are
+transcribed first by TranscriptionService alone, then in cascade mode. Reported:
+pages per second, the per tier page share, latency and tokens, escalations and
+the cost at the given per million token prices.
+
+    python benchmarks/transcription_cascade.py --documents 4 --pages 20 --simple-share 0.7
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from common import discard_stdout, timed, write_report
+from fakes import FakeModels, FakeVisionChatModel, LocalFile, gen_pdf
+
+from wizit_context_ingestor.application.transcription_service import (
+    TranscriptionService,
+)
+from wizit_context_ingestor.domain.services import ParseDocModelService
+from wizit_context_ingestor.utils.cascade_utils import CascadeStats
+
+
+async def run_mode(args, pdf_path: str, cascade: bool) -> dict:
+    strong = FakeVisionChatModel(
+        model_id="strong", latency_seconds=args.strong_latency_ms / 1000
+    )
+    fast = FakeVisionChatModel(
+        model_id="fast",
+        latency_seconds=args.strong_latency_ms / args.speedup / 1000,
+        failure_rate=args.fast_failure_rate,
+    )
+    cascade_stats = CascadeStats()
+    llm_semaphore = asyncio.Semaphore(args.max_concurrent_calls)
+    service = TranscriptionService(
+        FakeModels(strong),
+        LocalFile(pdf_path),
+        llm_semaphore=llm_semaphore,
+        fast_chat_model=fast if cascade else None,
+        cascade_stats=cascade_stats,
+    )
+    start = time.perf_counter()
+    documents = await asyncio.gather(
+        *[service.process_document(f"doc-{i}.pdf") for i in range(args.documents)]
+    )
+    elapsed = time.perf_counter() - start
+    pages = sum(len(parsed_pages) for parsed_pages, _ in documents)
+    stats = cascade_stats.summary()
+    prices = {
+        "fast": (args.fast_price_in, args.fast_price_out),
+        "strong": (args.strong_price_in, args.strong_price_out),
+    }
+    cost = 0.0
+    for tier in stats["tiers"].values():
+        for model_name, usage in tier["usage_by_model"].items():
+            price_in, price_out = prices[model_name]
+            cost += (
+                usage["input_tokens"] * price_in + usage["output_tokens"] * price_out
+            ) / 1e6
+    return {
+        "mode": "cascade" if cascade else "strong_only",
+        "pages": pages,
+        "seconds": elapsed,
+        "pages_per_second": pages / elapsed,
+        "cost": cost,
+        "cascade": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--simple-share", type=float, default=0.7)
+    parser.add_argument("--strong-latency-ms", type=float, default=200)
+    parser.add_argument("--speedup", type=float, default=4)
+    parser.add_argument("--fast-failure-rate", type=float, default=0.1)
+    parser.add_argument("--max-concurrent-calls", type=int, default=16)
+    parser.add_argument("--fast-price-in", type=float, default=0.3)
+    parser.add_argument("--fast-price-out", type=float, default=2.5)
+    parser.add_argument("--strong-price-in", type=float, default=3.0)
+    parser.add_argument("--strong-price-out", type=float, default=15.0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "synthetic.pdf")
+        kinds = gen_pdf(pdf_path, args.pages, args.simple_share, rng)
+        timings = {}
+        with timed(timings, "render_seconds"):
+            ParseDocModelService(pdf_path).parse_pages_to_base64(
+                list(range(1, args.pages + 1))
+            )
+        with timed(timings, "render_with_complexity_seconds"):
+            classified = ParseDocModelService(pdf_path).parse_pages_to_base64(
+                list(range(1, args.pages + 1)), with_complexity=True
+            )
+        results = {"page_kinds": kinds, **timings, "modes": []}
+        results["complexity"] = [page.complexity for page in classified[:6]]
+        for cascade in (False, True):
+            # keep the errors printed by the workflow nodes out of the report
+            with discard_stdout():
+                mode = asyncio.run(run_mode(args, pdf_path, cascade))
+            results["modes"].append(mode)
+    write_report("transcription_cascade", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
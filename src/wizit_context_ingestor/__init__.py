@@ -1,4 +1,21 @@
-from .main import TranscriptionManager
-from .main_chunks import ChunksManager, PgKdbProvisioningManager
+from importlib import import_module
+
+# managers are imported on first access, so importing the package does not load
+# the LLM, vector store and cloud SDKs a caller never uses
+_LAZY_EXPORTS = {
+    "TranscriptionManager": ".main",
+    "ChunksManager": ".main_chunks",
+    "PgKdbProvisioningManager": ".main_chunks",
+}
 
 __all__ = ["ChunksManager", "TranscriptionManager", "PgKdbProvisioningManager"]
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        return getattr(import_module(_LAZY_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
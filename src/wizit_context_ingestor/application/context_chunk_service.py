@@ -1,5 +1,7 @@
 import asyncio
+import hashlib
 import logging
+from contextlib import nullcontext
 from typing import Any, Dict, List, Optional
 
 from langchain_core.documents import Document
@@ -7,10 +9,18 @@ from langchain_core.messages.human import HumanMessage
 from langchain_core.output_parsers.pydantic import PydanticOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 
-from ..data.prompts import CONTEXT_CHUNKS_IN_DOCUMENT_SYSTEM_PROMPT, ContextChunk
+from ..data.prompts import (
+    CONTEXT_CHUNKS_IN_DOCUMENT_SYSTEM_PROMPT,
+    WORKFLOW_CONTEXT_CHUNKS_IN_DOCUMENT_SYSTEM_PROMPT,
+    ContextChunk,
+)
+from ..domain.models import TaskFailure
+from ..utils.concurrency_utils import RetryBudget, gather_with_retries
+from ..utils.metrics_utils import MetricsRecorder
 from ..workflows.context_workflow import ContextWorkflow
 from .interfaces import (
     AiApplicationService,
+    ContextCache,
     EmbeddingsManager,
     PersistenceService,
     RagChunker,
@@ -31,9 +41,32 @@ class ContextChunksInDocumentService:
         rag_chunker: RagChunker,
         embeddings_manager: EmbeddingsManager,
         target_language: str = "es",
+        context_cache: ContextCache | None = None,
+        llm_semaphore: asyncio.Semaphore | None = None,
+        max_chunk_attempts: int = 3,
+        retry_budget: RetryBudget | None = None,
+        retry_base_delay_seconds: float = 1.0,
+        retry_max_delay_seconds: float = 30.0,
+        max_full_context_chars: int | None = None,
     ):
         """
         Initialize the ChunkerService.
+
+        Args:
+            context_cache: Optional cache of generated contexts, chunks found in it
+                skip the context workflow
+            llm_semaphore: Optional semaphore bounding concurrent context workflow
+                calls, shared between documents processed at the same time
+            max_chunk_attempts: Attempts of a chunk context workflow before the
+                chunk is left out of the results
+            retry_budget: Optional budget of chunk retries, shared between
+                documents processed at the same time
+            retry_base_delay_seconds: Backoff before the first retry of a chunk
+            retry_max_delay_seconds: Maximum backoff before a retry of a chunk
+            max_full_context_chars: Optional bound of the document sent whole with
+                every chunk. Bigger documents send the window of this size around
+                the chunk, so concurrent context workflows do not each format a
+                prompt holding the whole document
         """
         self.ai_application_service = ai_application_service
         self.persistence_service = persistence_service
@@ -45,6 +78,64 @@ class ContextChunksInDocumentService:
         # TODO
         self.context_additional_instructions = ""
         self.metadata_source = "source"
+        self.context_cache = context_cache
+        self.llm_semaphore = llm_semaphore
+        self.max_chunk_attempts = max_chunk_attempts
+        self.retry_budget = retry_budget
+        self.retry_base_delay_seconds = retry_base_delay_seconds
+        self.retry_max_delay_seconds = retry_max_delay_seconds
+        if max_full_context_chars is not None and max_full_context_chars <= 0:
+            raise ValueError("max_full_context_chars must be positive")
+        self.max_full_context_chars = max_full_context_chars
+        # chunks of the last run whose context could not be generated
+        self.chunk_failures: list[TaskFailure] = []
+        self.context_model_id = getattr(ai_application_service, "llm_model_id", "")
+        self.context_prompt_version = self._digest(
+            WORKFLOW_CONTEXT_CHUNKS_IN_DOCUMENT_SYSTEM_PROMPT
+            + self.context_additional_instructions
+        )
+
+    @staticmethod
+    def _digest(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _gen_context_cache_key(self, markdown_content: str, chunk: Document) -> str:
+        """Cache key from chunk content, the document sent with it, model and prompt."""
+        return self._digest(
+            ":".join(
+                [
+                    self._digest(chunk.page_content),
+                    self._digest(self._gen_document_context(markdown_content, chunk)),
+                    self.context_model_id,
+                    self.context_prompt_version,
+                ]
+            )
+        )
+
+    def _exceeds_full_context(self, markdown_content: str) -> bool:
+        return (
+            self.max_full_context_chars is not None
+            and len(markdown_content) > self.max_full_context_chars
+        )
+
+    def _gen_document_context(self, markdown_content: str, chunk: Document) -> str:
+        """Document sent with a chunk, the window around it for long documents."""
+        if not self._exceeds_full_context(markdown_content):
+            return markdown_content
+        start_index = chunk.metadata.get("start_index")
+        if start_index is None:
+            start_index = max(markdown_content.find(chunk.page_content), 0)
+        margin = max((self.max_full_context_chars - len(chunk.page_content)) // 2, 0)
+        window_start = max(
+            min(
+                start_index - margin,
+                len(markdown_content) - self.max_full_context_chars,
+            ),
+            0,
+        )
+        return markdown_content[
+            window_start : window_start + self.max_full_context_chars
+        ]
 
     async def _retrieve_context_chunk_in_document_with_workflow(
         self,
@@ -52,9 +143,53 @@ class ContextChunksInDocumentService:
         markdown_content: str,
         chunk: Document,
         chunk_metadata: dict[str, Any] | None = None,
+        chunk_index: int = 0,
+        metrics_recorder: MetricsRecorder | None = None,
     ) -> Document:
         """Retrieve context chunks in document."""
         try:
+            chunk_metrics = None
+            if metrics_recorder is not None:
+                chunk_metrics = metrics_recorder.chunk(chunk_index)
+                chunk_metrics.attempts += 1
+            context = None
+            context_cache_key = None
+            if self.context_cache is not None:
+                context_cache_key = self._gen_context_cache_key(markdown_content, chunk)
+                context = self.context_cache.get(context_cache_key)
+                if context is not None and chunk_metrics is not None:
+                    chunk_metrics.cached = True
+            if context is None:
+                context = await self._gen_chunk_context(
+                    workflow,
+                    markdown_content,
+                    chunk,
+                    [metrics_recorder.llm_callback(chunk_metrics)]
+                    if chunk_metrics is not None
+                    else [],
+                )
+                if context_cache_key is not None:
+                    self.context_cache.set(context_cache_key, context)
+            chunk.page_content = f"<context>\n{context}\n</context>\n <content>\n{chunk.page_content}\n</content>"
+            # INFO: prevent context in metadata because it's already included in the chunk content, also generates issues when text is long
+            # chunk.metadata["context"] = result["context"]
+            if chunk_metadata is not None:
+                for key, value in chunk_metadata.items():
+                    chunk.metadata[key] = value
+            return chunk
+        except Exception as e:
+            logger.error(f"Failed to retrieve context chunks in document: {str(e)}")
+            raise
+
+    async def _gen_chunk_context(
+        self,
+        workflow,
+        markdown_content: str,
+        chunk: Document,
+        callbacks: list | None = None,
+    ) -> str:
+        """Run the context workflow for a chunk."""
+        async with self.llm_semaphore or nullcontext():
             result = await workflow.ainvoke(
                 {
                     "messages": [
@@ -67,79 +202,195 @@ class ContextChunksInDocumentService:
                             ]
                         )
                     ],
-                    "document_content": markdown_content,
+                    "document_content": self._gen_document_context(
+                        markdown_content, chunk
+                    ),
                 },
                 {
                     "configurable": {
                         "transcription_accuracy_threshold": 0.95,
                         "max_transcription_retries": 2,
-                    }
+                    },
+                    "callbacks": callbacks or [],
                 },
             )
-            chunk.page_content = f"<context>\n{result['context']}\n</context>\n <content>\n{chunk.page_content}\n</content>"
-            # INFO: prevent context in metadata because it's already included in the chunk content, also generates issues when text is long
-            # chunk.metadata["context"] = result["context"]
-            if chunk_metadata is not None:
-                for key, value in chunk_metadata.items():
-                    chunk.metadata[key] = value
-            return chunk
-        except Exception as e:
-            logger.error(f"Failed to retrieve context chunks in document: {str(e)}")
-            raise
+        return result["context"]
 
     async def retrieve_context_chunks_in_document_with_workflow(
         self,
         markdown_content: str,
         chunks: list[Document],
         chunks_metadata: dict[str, Any] | None = None,
+        metrics_recorder: MetricsRecorder | None = None,
     ) -> list[Document]:
-        """Retrieve context chunks in document."""
+        """
+        Retrieve context chunks in document.
+
+        Failing chunks are retried with backoff, chunks still failing are left out
+        of the result and recorded in chunk_failures. With a metrics recorder,
+        chunks are recorded by their position in chunks.
+
+        Raises:
+            Exception: The error of the first chunk when no chunk got its context
+        """
         try:
             context_workflow = ContextWorkflow(
                 self.chat_model, self.context_additional_instructions
             )
             compiled_context_workflow = context_workflow.gen_workflow()
             compiled_context_workflow = compiled_context_workflow.compile()
-            context_chunks_workflow_invocations = list(
-                map(
-                    lambda chunk: self._retrieve_context_chunk_in_document_with_workflow(
+            gather_result = await gather_with_retries(
+                list(enumerate(chunks)),
+                lambda indexed_chunk: (
+                    self._retrieve_context_chunk_in_document_with_workflow(
                         compiled_context_workflow,
                         markdown_content,
-                        chunk,
+                        indexed_chunk[1],
                         chunks_metadata,
-                    ),
-                    chunks,
-                )
+                        indexed_chunk[0],
+                        metrics_recorder,
+                    )
+                ),
+                max_attempts=self.max_chunk_attempts,
+                base_delay_seconds=self.retry_base_delay_seconds,
+                max_delay_seconds=self.retry_max_delay_seconds,
+                retry_budget=self.retry_budget,
             )
-            context_chunks = await asyncio.gather(*context_chunks_workflow_invocations)
+            self.chunk_failures = gather_result.failures
+            if metrics_recorder is not None:
+                metrics_recorder.add_retries(gather_result.retries)
+            for failure in gather_result.failures:
+                if metrics_recorder is not None:
+                    metrics_recorder.chunk(failure.index).failed = True
+                logger.error(
+                    f"Failed to retrieve context of chunk {failure.index} after {failure.attempts} attempts: {failure.error}"
+                )
+            if chunks and not gather_result.succeeded:
+                raise gather_result.failures[0].error
+            context_chunks = [
+                chunk for chunk in gather_result.results if chunk is not None
+            ]
+            if self.context_cache is not None and hasattr(
+                self.context_cache, "get_stats"
+            ):
+                logger.info(f"Context cache stats: {self.context_cache.get_stats()}")
             return context_chunks
         except Exception as e:
             logger.error(f"Failed to retrieve context chunks in document: {str(e)}")
             raise
 
+    def _retrieve_indexed_chunks(self, chunks: list[Document]) -> dict[str, Document]:
+        """Retrieve chunks already contextualized and indexed, keyed by chunk id."""
+        chunks_ids = [chunk.id for chunk in chunks if chunk.id]
+        if not chunks_ids:
+            return {}
+        try:
+            indexed_chunks = self.embeddings_manager.retrieve_documents_by_ids(
+                chunks_ids
+            )
+            return {chunk.id: chunk for chunk in indexed_chunks if chunk.id}
+        except Exception as e:
+            # a missing vector store only means every chunk must be contextualized
+            logger.warning(f"Could not retrieve indexed chunks: {str(e)}")
+            return {}
+
+    def _apply_file_tags(
+        self, indexed_chunks: dict[str, Document], file_tags: dict | None
+    ) -> list[str]:
+        """
+        Set the current file tags on indexed chunks, returns the ids of the
+        chunks whose tags changed.
+        """
+        stale_ids = []
+        for chunk_id, chunk in indexed_chunks.items():
+            if any(
+                chunk.metadata.get(key) != value
+                for key, value in (file_tags or {}).items()
+            ):
+                stale_ids.append(chunk_id)
+                chunk.metadata.update(file_tags)
+        return stale_ids
+
     async def get_context_chunks_in_document(
-        self, file_key: str, file_tags: dict | None = None
+        self,
+        file_key: str,
+        file_tags: dict | None = None,
+        metrics_recorder: MetricsRecorder | None = None,
     ):
         """
         Get the context chunks in a document.
+
+        Chunks already indexed are returned as stored, without calling the
+        context workflow. When the file tags changed since they were indexed,
+        they get the current tags and their stale version is deleted from the
+        vector store, so indexing the returned chunks writes them again.
+
+        Args:
+            file_key: Key of the markdown document
+            file_tags: Metadata added to every chunk
+            metrics_recorder: Optional recorder of the storage, chunking, db and
+                per chunk LLM metrics of the document
         """
         try:
-            markdown_content = self.persistence_service.load_markdown_file_content(
-                file_key
-            )
+            if metrics_recorder is None:
+                metrics_recorder = MetricsRecorder(file_key, "context_chunks")
+            with metrics_recorder.measure("storage"):
+                markdown_content = await asyncio.to_thread(
+                    self.persistence_service.load_markdown_file_content, file_key
+                )
+            if self._exceeds_full_context(markdown_content):
+                logger.warning(
+                    f"Document {file_key} has {len(markdown_content)} characters, "
+                    f"chunks get a context window of {self.max_full_context_chars} characters"
+                )
+                metrics_recorder.add_guardrail("max_full_context_chars")
             langchain_rag_document = Document(
                 id=file_key,
                 page_content=markdown_content,
                 metadata={self.metadata_source: file_key},
             )
             logger.info(f"Document loaded:{file_key}")
-            chunks = self.rag_chunker.gen_chunks_for_document(langchain_rag_document)
+            with metrics_recorder.measure("chunking"):
+                chunks = await asyncio.to_thread(
+                    self.rag_chunker.gen_chunks_for_document, langchain_rag_document
+                )
             logger.info(f"Chunks generated:{len(chunks)}")
-            context_chunks = (
-                await self.retrieve_context_chunks_in_document_with_workflow(
-                    markdown_content, chunks, file_tags
+            with metrics_recorder.measure("db"):
+                indexed_chunks = await asyncio.to_thread(
+                    self._retrieve_indexed_chunks, chunks
                 )
+            stale_ids = self._apply_file_tags(indexed_chunks, file_tags)
+            if stale_ids:
+                logger.info(f"Chunks with changed file tags:{len(stale_ids)}")
+                with metrics_recorder.measure("db"):
+                    await asyncio.to_thread(
+                        self.embeddings_manager.delete_documents_by_ids, stale_ids
+                    )
+            pending_chunks = [
+                chunk for chunk in chunks if chunk.id not in indexed_chunks
+            ]
+            logger.info(
+                f"Chunks already indexed:{len(chunks) - len(pending_chunks)}, "
+                f"chunks to contextualize:{len(pending_chunks)}"
             )
+            # pending chunks are contextualized in place, keep the document order
+            with metrics_recorder.track_memory("contextualize"):
+                await self.retrieve_context_chunks_in_document_with_workflow(
+                    markdown_content, pending_chunks, file_tags, metrics_recorder
+                )
+            # failed chunks are not indexed, so the next run contextualizes them
+            failed_chunks = {
+                id(pending_chunks[failure.index]) for failure in self.chunk_failures
+            }
+            if failed_chunks:
+                logger.warning(
+                    f"Chunks left out after failing their context:{len(failed_chunks)}"
+                )
+            context_chunks = [
+                indexed_chunks.get(chunk.id, chunk)
+                for chunk in chunks
+                if id(chunk) not in failed_chunks
+            ]
             logger.info(f"Context chunks generated:{len(context_chunks)}")
             return context_chunks
         except Exception as e:
@@ -2,17 +2,29 @@
 Application interfaces defining application layer contracts.
 """
 
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
-from typing import List, Optional, Union
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Union
 
-from langchain.indexes import IndexingResult, SQLRecordManager
-from langchain_aws import ChatBedrockConverse
 from langchain_core.documents import Document
-from langchain_google_vertexai import ChatVertexAI
-from langchain_google_vertexai.model_garden import ChatAnthropicVertex
-from langchain_postgres import PGVectorStore
 
-from ..domain.models import ParsedDoc, ParsedDocPage
+from ..domain.models import (
+    DocumentMetrics,
+    ParsedDoc,
+    ParsedDocPage,
+    TranscriptionJob,
+)
+
+if TYPE_CHECKING:
+    # provider types are only needed for annotations, importing them eagerly
+    # would load every LLM and vector store SDK with the interfaces
+    import numpy as np
+    from langchain.indexes import IndexingResult, SQLRecordManager
+    from langchain_aws import ChatBedrockConverse
+    from langchain_google_vertexai import ChatVertexAI
+    from langchain_google_vertexai.model_garden import ChatAnthropicVertex
+    from langchain_postgres import PGVectorStore
 
 
 class TranscriptionService(ABC):
@@ -66,6 +78,35 @@ class PersistenceService(ABC):
         pass
 
 
+class TranscriptionCheckpointStore(ABC):
+    """Interface for durable checkpoints of page transcriptions."""
+
+    @abstractmethod
+    def load_job(self, job_id: str) -> Optional[TranscriptionJob]:
+        """Load a transcription job record, None when missing."""
+        pass
+
+    @abstractmethod
+    def save_job(self, job: TranscriptionJob):
+        """Save a transcription job record."""
+        pass
+
+    @abstractmethod
+    def load_pages(self, job_id: str) -> Dict[int, str]:
+        """Load the checkpointed page transcriptions of a job by page number."""
+        pass
+
+    @abstractmethod
+    def save_page(self, job_id: str, page_number: int, page_text: str):
+        """Checkpoint a page transcription, once saved it survives a crash."""
+        pass
+
+    @abstractmethod
+    def delete_job(self, job_id: str):
+        """Delete the job record and all its page checkpoints."""
+        pass
+
+
 class RagChunker(ABC):
     """Interface for RAG chunkers."""
 
@@ -75,6 +116,84 @@ class RagChunker(ABC):
         pass
 
 
+class ContextCache(ABC):
+    """Interface for chunk context caches."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached chunk context, None when missing or expired."""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, context: str):
+        """Cache a chunk context."""
+        pass
+
+
+class SearchResultCache(ABC):
+    """Interface for short lived caches of search results."""
+
+    @property
+    @abstractmethod
+    def generation(self) -> int:
+        """Counter increased by every invalidation."""
+        pass
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[List[Document]]:
+        """Get cached search results, None when missing or expired."""
+        pass
+
+    @abstractmethod
+    def set(
+        self,
+        key: str,
+        records: List[Document],
+        sources: Optional[frozenset[str]],
+        generation: int,
+    ):
+        """
+        Cache search results.
+
+        Args:
+            key: Key of the search
+            records: Documents found
+            sources: Sources the search was filtered to, None when any source
+                could be found
+            generation: Generation read before searching, results are dropped
+                when the cache was invalidated meanwhile
+        """
+        pass
+
+    @abstractmethod
+    def invalidate_sources(self, sources: Optional[Iterable[str]]):
+        """Drop results that documents of the sources could change, all when None."""
+        pass
+
+    @abstractmethod
+    def invalidate_ids(self, ids: Iterable[str]):
+        """Drop results holding any of the document ids."""
+        pass
+
+
+class Reranker(ABC):
+    """Interface for re-rankers scoring retrieved documents against a query."""
+
+    @abstractmethod
+    def rerank(self, query: str, documents: List[Document], k: int) -> List[Document]:
+        """Order documents by relevance to the query, keeping the k best."""
+        pass
+
+
+class MetricsSink(ABC):
+    """Interface for destinations of the pipeline metrics of documents."""
+
+    @abstractmethod
+    def emit(self, metrics: DocumentMetrics):
+        """Publish the metrics of a document that went through a pipeline."""
+        pass
+
+
 class EmbeddingsManager(ABC):
     """Interface for embeddings managers."""
 
@@ -111,14 +230,53 @@ class EmbeddingsManager(ABC):
         """Index documents."""
         pass
 
+    def bulk_index_documents(
+        self,
+        docs: list[Document],
+    ) -> Union[dict[str, int], IndexingResult]:
+        """Re-index documents of many sources in one pass, index_documents by default."""
+        return self.index_documents(docs)
+
     @abstractmethod
     def search_records(
         self,
         query: str,
+        k: int = 5,
+        filters: Optional[dict] = None,
     ) -> list[Document]:
-        """Search documents."""
+        """Search documents, filters match metadata values."""
         pass
 
+    def search_records_many(
+        self,
+        queries: list[str],
+        k: int = 5,
+        filters: Optional[dict] = None,
+        **search_kwargs,
+    ) -> list[list[Document]]:
+        """Search documents for every query, one search_records call each by default."""
+        return [
+            self.search_records(query, k=k, filters=filters, **search_kwargs)
+            for query in queries
+        ]
+
+    def search_candidates(
+        self,
+        query: str,
+        k: int = 20,
+        filters: Optional[dict] = None,
+    ) -> tuple[np.ndarray, list[Document], np.ndarray]:
+        """
+        Search documents and return them with their vectors, for re-ranking.
+
+        Returns:
+            The query vector, the documents best first and their vectors
+
+        Raises:
+            TypeError: If the store can not return candidate vectors
+        """
+        raise TypeError(f"{type(self).__name__} can not return candidate vectors")
+
     @abstractmethod
     def create_index(
         self,
@@ -130,6 +288,11 @@ class EmbeddingsManager(ABC):
         "Find files by file_name in vector store"
         pass
 
+    @abstractmethod
+    def retrieve_documents_by_ids(self, docs_ids: list[str]) -> list[Document]:
+        "Find indexed documents by ids in vector store"
+        pass
+
     @abstractmethod
     def delete_documents_by_ids(self, docs_ids: list[str]) -> list[str]:
         "Delete files by ids in vector store"
@@ -140,7 +303,7 @@ class EmbeddingsManager(ABC):
     #     """Get documents keys by source ID."""
     #     pass
 
-    # @abstractmethod
-    # def delete_documents_by_source_id(self, source_id: str):
-    #     """Delete documents by source ID."""
-    #     pass
+    @abstractmethod
+    def delete_documents_by_source_id(self, source_id: str) -> dict[str, int]:
+        """Delete documents by source ID, returns the deleted rows counts."""
+        pass
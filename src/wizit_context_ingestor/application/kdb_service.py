@@ -1,12 +1,18 @@
+import json
 import logging
+from typing import Optional
 
 from langchain.indexes import SQLRecordManager
 from langchain_core.documents import Document
 from langchain_postgres import PGVectorStore
 
+from ..utils.latency_utils import LatencyRecorder
+from ..utils.mmr_utils import maximal_marginal_relevance
 from .interfaces import (
     EmbeddingsManager,
     RagChunker,
+    Reranker,
+    SearchResultCache,
 )
 
 logger = logging.getLogger(__name__)
@@ -20,11 +26,27 @@ class KdbService:
     def __init__(
         self,
         embeddings_manager: EmbeddingsManager,
+        search_cache: SearchResultCache | None = None,
+        latency_recorder: LatencyRecorder | None = None,
+        reranker: Reranker | None = None,
     ):
         """
         Initialize the ChunkerService.
+
+        Args:
+            embeddings_manager: The embeddings manager of the vector store
+            search_cache: Optional cache of search results, invalidated by the
+                writes made through this service
+            latency_recorder: Recorder of the search and write latencies, a new
+                one when not given
+            reranker: Optional re-ranker of the retrieve pipeline (e.g. a cross
+                encoder), run on the candidates selected by MMR
         """
         self.embeddings_manager = embeddings_manager
+        self.search_cache = search_cache
+        self.latency_recorder = latency_recorder or LatencyRecorder()
+        self.reranker = reranker
+        self.source_id_key = getattr(embeddings_manager, "source_id_key", "source")
         self._vector_store = None
         self._records_manager = None
 
@@ -34,25 +56,253 @@ class KdbService:
         except Exception as e:
             raise Exception(f"Error configuring KDB: {e}")
 
-    def create_vector_store_hsnw_index(self):
+    def create_vector_store_hsnw_index(self, **index_params):
         try:
-            self.embeddings_manager.create_index()
+            self.embeddings_manager.create_index(**index_params)
         except Exception as e:
             logger.warning(f"Error creating vector store index: {e}")
 
-    def search(self, query: str) -> list[Document]:
+    def _search_cache_key(
+        self, query: str, k: int, filters: dict | None, search_kwargs: dict
+    ) -> str:
+        return json.dumps(
+            [" ".join(query.split()), k, filters, search_kwargs],
+            sort_keys=True,
+            default=str,
+        )
+
+    def _filtered_sources(self, filters: dict | None) -> Optional[frozenset[str]]:
+        """Sources a search is narrowed to, None when it can find any source."""
+        if not filters or self.source_id_key not in filters:
+            return None
+        sources = filters[self.source_id_key]
+        if isinstance(sources, (list, tuple, set, frozenset)):
+            return frozenset(str(source) for source in sources)
+        return frozenset([str(sources)])
+
+    def _invalidate_sources(self, documents: list[Document]):
+        if self.search_cache is None:
+            return
+        sources = {doc.metadata.get(self.source_id_key) for doc in documents}
+        if None in sources:
+            # a document without source could show up in any search
+            self.search_cache.invalidate_sources(None)
+        else:
+            self.search_cache.invalidate_sources({str(source) for source in sources})
+
+    def search(
+        self, query: str, k: int = 5, filters: dict | None = None, **search_kwargs
+    ) -> list[Document]:
+        """
+        Search documents, answering repeated searches from the search cache.
+
+        Args:
+            query: The text searched
+            k: Number of documents returned
+            filters: Metadata equality filters, a list value matches any of its items
+            **search_kwargs: Search options of the embeddings manager
+
+        Returns:
+            list[Document]: Documents found, best first
+        """
         try:
-            records = []
-            records = self.embeddings_manager.search_records(query)
-            print(records)
-            return records
+            with self.latency_recorder.measure("search"):
+                if self.search_cache is None:
+                    with self.latency_recorder.measure("search_backend"):
+                        return self.embeddings_manager.search_records(
+                            query, k=k, filters=filters, **search_kwargs
+                        )
+                cache_key = self._search_cache_key(query, k, filters, search_kwargs)
+                records = self.search_cache.get(cache_key)
+                if records is not None:
+                    return records
+                generation = self.search_cache.generation
+                with self.latency_recorder.measure("search_backend"):
+                    records = self.embeddings_manager.search_records(
+                        query, k=k, filters=filters, **search_kwargs
+                    )
+                self.search_cache.set(
+                    cache_key, records, self._filtered_sources(filters), generation
+                )
+                return list(records)
+        except Exception as e:
+            logger.error(f"Error searching documents: {e}")
+            raise Exception(f"Error searching documents: {e}")
+
+    def search_many(
+        self,
+        queries: list[str],
+        k: int = 5,
+        filters: dict | None = None,
+        **search_kwargs,
+    ) -> list[list[Document]]:
+        """
+        Search documents for many queries in one call.
+
+        Cached searches are answered from the search cache, the other distinct
+        queries are searched together with search_records_many of the store.
+
+        Args:
+            queries: The texts searched
+            k: Number of documents returned per query
+            filters: Metadata equality filters shared by every query
+            **search_kwargs: Search options of the embeddings manager
+
+        Returns:
+            list[list[Document]]: Documents found for each query, in the order of
+                queries
+        """
+        try:
+            with self.latency_recorder.measure("search_many"):
+                cache_keys = [
+                    self._search_cache_key(query, k, filters, search_kwargs)
+                    for query in queries
+                ]
+                results = {}
+                if self.search_cache is not None:
+                    for cache_key in dict.fromkeys(cache_keys):
+                        records = self.search_cache.get(cache_key)
+                        if records is not None:
+                            results[cache_key] = records
+                pending = {
+                    cache_key: query
+                    for cache_key, query in zip(cache_keys, queries)
+                    if cache_key not in results
+                }
+                if pending:
+                    generation = (
+                        self.search_cache.generation if self.search_cache else None
+                    )
+                    with self.latency_recorder.measure("search_many_backend"):
+                        found = self.embeddings_manager.search_records_many(
+                            list(pending.values()),
+                            k=k,
+                            filters=filters,
+                            **search_kwargs,
+                        )
+                    sources = self._filtered_sources(filters)
+                    for cache_key, records in zip(pending, found):
+                        results[cache_key] = records
+                        if self.search_cache is not None:
+                            self.search_cache.set(
+                                cache_key, records, sources, generation
+                            )
+                return [list(results[cache_key]) for cache_key in cache_keys]
+        except Exception as e:
+            logger.error(f"Error searching documents: {e}")
+            raise Exception(f"Error searching documents: {e}")
+
+    def retrieve(
+        self,
+        query: str,
+        k: int = 5,
+        filters: dict | None = None,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        use_mmr: bool = True,
+        rerank_k: int | None = None,
+    ) -> list[Document]:
+        """
+        Retrieve documents in stages: over-fetch, MMR, then the optional re-ranker.
+
+        fetch_k candidates are fetched with their stored vectors, MMR selects
+        diverse ones from those vectors without embedding them again, and the
+        re-ranker orders the selection. Each stage records its latency
+        (retrieve_candidates, retrieve_mmr, retrieve_rerank).
+
+        Args:
+            query: The text searched
+            k: Number of documents returned
+            filters: Metadata equality filters, a list value matches any of its items
+            fetch_k: Candidates fetched from the vector store
+            lambda_mult: MMR trade-off, 1 ranks by relevance only, 0 by diversity only
+            use_mmr: Whether MMR selects the candidates, otherwise the most similar
+                ones are kept
+            rerank_k: Candidates selected for the re-ranker, 2 * k by default
+
+        Returns:
+            list[Document]: Documents retrieved, best first
+
+        Raises:
+            TypeError: If the store can not return candidate vectors
+        """
+        if (
+            type(self.embeddings_manager).search_candidates
+            is EmbeddingsManager.search_candidates
+        ):
+            raise TypeError(
+                f"{type(self.embeddings_manager).__name__} can not return candidate vectors"
+            )
+        try:
+            cache_key = None
+            if self.search_cache is not None:
+                cache_key = self._search_cache_key(
+                    query,
+                    k,
+                    filters,
+                    {
+                        "retrieve": [fetch_k, lambda_mult, use_mmr, rerank_k],
+                        "reranker": type(self.reranker).__name__,
+                    },
+                )
+                records = self.search_cache.get(cache_key)
+                if records is not None:
+                    return records
+                generation = self.search_cache.generation
+            with self.latency_recorder.measure("retrieve"):
+                selected_count = k
+                if self.reranker is not None:
+                    selected_count = max(rerank_k or 2 * k, k)
+                with self.latency_recorder.measure("retrieve_candidates"):
+                    query_vector, candidates, vectors = (
+                        self.embeddings_manager.search_candidates(
+                            query, k=max(fetch_k, selected_count), filters=filters
+                        )
+                    )
+                if use_mmr:
+                    with self.latency_recorder.measure("retrieve_mmr"):
+                        selection = maximal_marginal_relevance(
+                            query_vector, vectors, selected_count, lambda_mult
+                        )
+                    records = [candidates[index] for index in selection]
+                else:
+                    records = candidates[:selected_count]
+                if self.reranker is not None:
+                    with self.latency_recorder.measure("retrieve_rerank"):
+                        records = self.reranker.rerank(query, records, k)
+                records = records[:k]
+            if cache_key is not None:
+                self.search_cache.set(
+                    cache_key, records, self._filtered_sources(filters), generation
+                )
+            return list(records)
+        except Exception as e:
+            logger.error(f"Error retrieving documents: {e}")
+            raise Exception(f"Error retrieving documents: {e}")
+
+    def get_search_stats(self) -> dict:
+        """Latency percentiles of the service operations and search cache metrics."""
+        stats = {"latency": self.latency_recorder.summary()}
+        if self.search_cache is not None and hasattr(self.search_cache, "get_stats"):
+            stats["search_cache"] = self.search_cache.get_stats()
+        return stats
+
+    def index_documents_in_vector_store(self, documents: list[Document]) -> None:
+        try:
+            with self.latency_recorder.measure("index_documents"):
+                self.embeddings_manager.index_documents(documents)
+            self._invalidate_sources(documents)
         except Exception as e:
             logger.error(f"Error indexing documents: {e}")
             raise Exception(f"Error indexing documents: {e}")
 
-    def index_documents_in_vector_store(self, documents: list[Document]) -> None:
+    def bulk_index_documents_in_vector_store(self, documents: list[Document]) -> dict:
+        """Re-index documents of many files in one pass."""
         try:
-            self.embeddings_manager.index_documents(documents)
+            with self.latency_recorder.measure("bulk_index_documents"):
+                result = self.embeddings_manager.bulk_index_documents(documents)
+            self._invalidate_sources(documents)
+            return result
         except Exception as e:
             logger.error(f"Error indexing documents: {e}")
             raise Exception(f"Error indexing documents: {e}")
@@ -65,13 +315,26 @@ class KdbService:
             logger.error(f"Error retrieving documents: {e}")
             raise Exception(f"Error retrieving documents: {e}")
 
-    def delete_documents_by_file_name(self, file_name: str) -> list[str]:
+    def delete_documents_by_file_name(self, file_name: str) -> dict[str, int]:
         try:
-            docs_ids = self.embeddings_manager.retrieve_documents_by_file_name(
-                file_name
-            )
-            self.embeddings_manager.delete_documents_by_ids(docs_ids)
-            return docs_ids
+            with self.latency_recorder.measure("delete_documents"):
+                result = self.embeddings_manager.delete_documents_by_source_id(
+                    file_name
+                )
+            if self.search_cache is not None:
+                self.search_cache.invalidate_sources({file_name})
+            return result
+        except Exception as e:
+            logger.error(f"Error deleting documents: {e}")
+            raise Exception(f"Error deleting documents: {e}")
+
+    def delete_documents_by_ids(self, docs_ids: list[str]) -> list[str]:
+        try:
+            with self.latency_recorder.measure("delete_documents"):
+                result = self.embeddings_manager.delete_documents_by_ids(docs_ids)
+            if self.search_cache is not None:
+                self.search_cache.invalidate_ids(set(docs_ids))
+            return result
         except Exception as e:
             logger.error(f"Error deleting documents: {e}")
             raise Exception(f"Error deleting documents: {e}")
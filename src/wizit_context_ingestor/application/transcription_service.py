@@ -1,13 +1,29 @@
 import asyncio
+import hashlib
+import time
+from contextlib import nullcontext
 from typing import Tuple, List, Dict, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers.pydantic import PydanticOutputParser
 from langchain_core.messages import HumanMessage
 from logging import getLogger
 from ..data.prompts import IMAGE_TRANSCRIPTION_SYSTEM_PROMPT, Transcription
-from ..domain.models import ParsedDoc, ParsedDocPage
+from ..domain.models import (
+    CascadePolicy,
+    ParsedDoc,
+    ParsedDocPage,
+    TaskFailure,
+    TranscriptionJob,
+)
 from ..domain.services import ParseDocModelService
-from .interfaces import AiApplicationService, PersistenceService
+from ..utils.cascade_utils import FAST_TIER, STRONG_TIER, CascadeStats
+from ..utils.concurrency_utils import ByteBudget, RetryBudget, gather_with_retries
+from ..utils.metrics_utils import MetricsRecorder
+from .interfaces import (
+    AiApplicationService,
+    PersistenceService,
+    TranscriptionCheckpointStore,
+)
 from ..workflows.transcription_workflow import TranscriptionWorkflow
 
 logger = getLogger(__name__)
@@ -26,7 +42,53 @@ class TranscriptionService:
         transcription_additional_instructions: str = "",
         transcription_accuracy_threshold: float = 0.90,
         max_transcription_retries: int = 2,
+        llm_semaphore: Optional[asyncio.Semaphore] = None,
+        checkpoint_store: Optional[TranscriptionCheckpointStore] = None,
+        max_page_attempts: int = 3,
+        retry_budget: Optional[RetryBudget] = None,
+        retry_base_delay_seconds: float = 1.0,
+        retry_max_delay_seconds: float = 30.0,
+        fast_chat_model=None,
+        cascade_policy: Optional[CascadePolicy] = None,
+        fast_max_transcription_retries: int = 0,
+        verify_with_strong_model: bool = True,
+        cascade_stats: Optional[CascadeStats] = None,
+        max_inflight_page_bytes: Optional[int] = None,
+        page_bytes_budget: Optional[ByteBudget] = None,
     ):
+        """
+        Initialize the TranscriptionService.
+
+        Args:
+            llm_semaphore: Optional semaphore bounding concurrent page workflows,
+                shared between documents transcribed at the same time
+            checkpoint_store: Optional store of page checkpoints, every transcribed
+                page is saved as soon as it finishes and a later run of the same
+                document only transcribes the pages missing from it
+            max_page_attempts: Attempts of a page workflow before the page is
+                marked as failed in the markdown
+            retry_budget: Optional budget of page retries, shared between documents
+                transcribed at the same time
+            retry_base_delay_seconds: Backoff before the first retry of a page
+            retry_max_delay_seconds: Maximum backoff before a retry of a page
+            fast_chat_model: Optional cheap chat model enabling the cascade, simple
+                pages are transcribed by it first and escalate to the main model
+                when their transcription scores below the accuracy threshold
+            cascade_policy: Thresholds telling simple pages apart, defaults to
+                CascadePolicy()
+            fast_max_transcription_retries: Transcription retries of the fast
+                model before the page escalates
+            verify_with_strong_model: Score the transcriptions of the fast model
+                with the main model instead of the fast model itself
+            cascade_stats: Optional per tier pages, latency and token usage,
+                shared between documents transcribed at the same time
+            max_inflight_page_bytes: Optional bound of the rendered page images
+                held at once. Documents whose images would exceed it render each
+                page right before its transcription and drop it afterwards
+            page_bytes_budget: Optional budget of rendered page bytes, shared
+                between documents transcribed at the same time, a budget of
+                max_inflight_page_bytes per document is used when None
+        """
         self.ai_application_service = ai_application_service
         self.persistence_service = persistence_service
         self.target_language = target_language
@@ -46,6 +108,16 @@ class TranscriptionService:
         self.transcription_additional_instructions = (
             transcription_additional_instructions
         )
+        # bounds concurrent page workflows, may be shared between documents
+        self.llm_semaphore = llm_semaphore
+        self.checkpoint_store = checkpoint_store
+        self.max_page_attempts = max_page_attempts
+        self.retry_budget = retry_budget
+        self.retry_base_delay_seconds = retry_base_delay_seconds
+        self.retry_max_delay_seconds = retry_max_delay_seconds
+        self.transcription_model_id = getattr(
+            ai_application_service, "llm_model_id", ""
+        )
         self.chat_model = self.ai_application_service.load_chat_model()
         self.transcription_workflow = TranscriptionWorkflow(
             self.chat_model, self.transcription_additional_instructions
@@ -56,6 +128,27 @@ class TranscriptionService:
         self.compiled_transcription_workflow = (
             self.compiled_transcription_workflow.compile()
         )
+        if fast_max_transcription_retries < 0 or fast_max_transcription_retries > 3:
+            raise ValueError("fast_max_transcription_retries must be between 0 and 3")
+        self.fast_chat_model = fast_chat_model
+        self.cascade_policy = cascade_policy or CascadePolicy()
+        self.fast_max_transcription_retries = fast_max_transcription_retries
+        self.cascade_stats = cascade_stats or CascadeStats()
+        if max_inflight_page_bytes is not None and max_inflight_page_bytes <= 0:
+            raise ValueError("max_inflight_page_bytes must be positive")
+        self.max_inflight_page_bytes = max_inflight_page_bytes
+        self.page_bytes_budget = page_bytes_budget
+        self.compiled_fast_transcription_workflow = None
+        if self.fast_chat_model is not None:
+            self.compiled_fast_transcription_workflow = (
+                TranscriptionWorkflow(
+                    self.fast_chat_model,
+                    self.transcription_additional_instructions,
+                    self.chat_model if verify_with_strong_model else None,
+                )
+                .gen_workflow()
+                .compile()
+            )
 
     # def parse_doc_page(self, document: ParsedDocPage) -> ParsedDocPage:
     #     """Transcribe an image to text.
@@ -111,54 +204,112 @@ class TranscriptionService:
     #         logger.error(f"Failed to parse document page: {str(e)}")
     #         raise
 
+    @property
+    def cascade_enabled(self) -> bool:
+        return self.compiled_fast_transcription_workflow is not None
+
+    async def _run_transcription_workflow(
+        self,
+        document: ParsedDocPage,
+        tier: str,
+        metrics_recorder: Optional[MetricsRecorder] = None,
+    ) -> dict:
+        """Run the transcription workflow of a tier on a page, timing it and counting its tokens."""
+        callbacks = [self.cascade_stats.usage_handlers[tier]]
+        if metrics_recorder is not None:
+            callbacks.append(
+                metrics_recorder.llm_callback(
+                    metrics_recorder.page(document.page_number)
+                )
+            )
+        if tier == FAST_TIER:
+            compiled_workflow = self.compiled_fast_transcription_workflow
+            max_transcription_retries = self.fast_max_transcription_retries
+        else:
+            compiled_workflow = self.compiled_transcription_workflow
+            max_transcription_retries = self.max_transcription_retries
+        with self.cascade_stats.latency_recorder.measure(tier):
+            return await compiled_workflow.ainvoke(
+                {
+                    "messages": [
+                        HumanMessage(
+                            content=[
+                                {
+                                    "type": "text",
+                                    "text": "Transcribe the document, ensure all content transcribed accurately. transcription must be in the same language of source document.",
+                                },
+                            ]
+                        ),
+                        HumanMessage(
+                            content=[
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": f"data:image/png;base64,{document.page_base64}"
+                                    },
+                                }
+                            ]
+                        ),
+                    ]
+                },
+                {
+                    "configurable": {
+                        "transcription_accuracy_threshold": self.transcription_accuracy_threshold,
+                        "max_transcription_retries": max_transcription_retries,
+                    },
+                    "callbacks": callbacks,
+                },
+            )
+
     async def parse_doc_page_with_workflow(
-        self, document: ParsedDocPage, retries: int = 0
+        self,
+        document: ParsedDocPage,
+        metrics_recorder: Optional[MetricsRecorder] = None,
     ) -> ParsedDocPage:
         """Transcribe an image to text using an agent.
+
+        In cascade mode, simple pages are transcribed by the fast model first and
+        escalate to the main model unless their transcription completes above the
+        accuracy threshold.
         Args:
             document: The document with the image to transcribe
+            metrics_recorder: Optional recorder of the tokens and latency of the page
         Returns:
             Processed text
+        Raises:
+            ValueError: If the workflow ends without a transcription
         """
-        if retries > 1:
-            logger.info("Max retries exceeded")
-            return document
-        result = await self.compiled_transcription_workflow.ainvoke(
-            {
-                "messages": [
-                    HumanMessage(
-                        content=[
-                            {
-                                "type": "text",
-                                "text": "Transcribe the document, ensure all content transcribed accurately. transcription must be in the same language of source document.",
-                            },
-                        ]
-                    ),
-                    HumanMessage(
-                        content=[
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{document.page_base64}"
-                                },
-                            }
-                        ]
-                    ),
-                ]
-            },
-            {
-                "configurable": {
-                    "transcription_accuracy_threshold": self.transcription_accuracy_threshold,
-                    "max_transcription_retries": self.max_transcription_retries,
-                }
-            },
-        )
-        if "transcription" in result:
-            document.page_text = result["transcription"]
-        else:
-            return await self.parse_doc_page_with_workflow(
-                document, retries=retries + 1
+        async with self.llm_semaphore or nullcontext():
+            if (
+                self.cascade_enabled
+                and document.complexity is not None
+                and self.cascade_policy.is_simple(document.complexity)
+            ):
+                result = await self._run_transcription_workflow(
+                    document, FAST_TIER, metrics_recorder
+                )
+                if (
+                    result.get("transcription")
+                    and result.get("transcription_status") == "completed"
+                ):
+                    document.page_text = result["transcription"]
+                    document.transcription_tier = FAST_TIER
+                    self.cascade_stats.record_page(FAST_TIER)
+                    return document
+                logger.info(
+                    f"Page {document.page_number} scored {result.get('transcription_accuracy', 0.0)} "
+                    "with the fast model, escalating"
+                )
+                self.cascade_stats.record_escalation()
+            result = await self._run_transcription_workflow(
+                document, STRONG_TIER, metrics_recorder
             )
+        if "transcription" not in result:
+            # retried with backoff by process_document
+            raise ValueError(f"No transcription found for page {document.page_number}")
+        document.page_text = result["transcription"]
+        document.transcription_tier = STRONG_TIER
+        self.cascade_stats.record_page(STRONG_TIER)
         return document
 
     # def process_document(self, file_key: str) -> Tuple[List[ParsedDocPage], ParsedDoc]:
@@ -176,25 +327,360 @@ class TranscriptionService:
     #     parsed_document = parse_doc_model_service.create_md_content(parsed_pages)
     #     return parsed_pages, parsed_document
 
+    @staticmethod
+    def _digest(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _file_digest(file_path: str) -> str:
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+    def _gen_job_id(self, file_key: str) -> str:
+        """Job key from the file key and the settings shaping its transcription."""
+        return self._digest(
+            ":".join(
+                [
+                    file_key,
+                    self.transcription_model_id,
+                    self.target_language,
+                    self._digest(self.transcription_additional_instructions),
+                    str(self.transcription_accuracy_threshold),
+                ]
+                # pages of a cascade run may come from the fast model
+                + (
+                    [getattr(self.fast_chat_model, "model_name", "fast")]
+                    if self.cascade_enabled
+                    else []
+                )
+            )
+        )
+
+    def _save_checkpoint(
+        self, metrics_recorder: MetricsRecorder, description: str, save, *args
+    ):
+        """
+        Write to the checkpoint store without failing the transcription.
+
+        A write that fails only loses the resume of what it would have recorded,
+        so it logs a warning and counts a checkpoint error instead of raising:
+        transcribed pages are neither transcribed again nor marked failed.
+        """
+        try:
+            save(*args)
+        except Exception as e:
+            logger.warning(f"Failed to save {description}: {str(e)}")
+            metrics_recorder.add_checkpoint_error()
+
+    def _open_job(
+        self,
+        file_key: str,
+        raw_file_path: str,
+        page_count: int,
+        metrics_recorder: MetricsRecorder,
+    ) -> Tuple[TranscriptionJob, Dict[int, str]]:
+        """
+        Load or create the job of a document, with its checkpointed pages.
+
+        Checkpoints of a previous version of the file are discarded.
+        """
+        job_id = self._gen_job_id(file_key)
+        file_digest = self._file_digest(raw_file_path)
+        now = time.time()
+        job = self.checkpoint_store.load_job(job_id)
+        if job is not None and (
+            job.file_digest != file_digest or job.page_count != page_count
+        ):
+            logger.info(f"File {file_key} changed, discarding its checkpoints")
+            self.checkpoint_store.delete_job(job_id)
+            job = None
+        checkpointed_pages = {}
+        if job is None:
+            job = TranscriptionJob(
+                job_id=job_id,
+                file_key=file_key,
+                file_digest=file_digest,
+                page_count=page_count,
+                created_at=now,
+            )
+        else:
+            checkpointed_pages = self.checkpoint_store.load_pages(job_id)
+        job.status = "running"
+        job.attempts += 1
+        job.completed_pages = len(checkpointed_pages)
+        job.updated_at = now
+        self._save_checkpoint(
+            metrics_recorder, f"job {job_id}", self.checkpoint_store.save_job, job
+        )
+        return job, checkpointed_pages
+
+    def _close_job(
+        self,
+        job: TranscriptionJob,
+        parsed_pages: List[ParsedDocPage],
+        metrics_recorder: MetricsRecorder,
+    ):
+        """Record the outcome of a run in the job record."""
+        # pages left without transcription are retried by the next run
+        failed_pages = [page for page in parsed_pages if page.page_text is None]
+        job.status = "failed" if failed_pages else "completed"
+        job.completed_pages = len(parsed_pages) - len(failed_pages)
+        job.failed_pages = sorted(page.page_number for page in failed_pages)
+        job.last_error = failed_pages[0].transcription_error if failed_pages else None
+        job.updated_at = time.time()
+        self._save_checkpoint(
+            metrics_recorder, f"job {job.job_id}", self.checkpoint_store.save_job, job
+        )
+
+    async def _parse_and_checkpoint_page(
+        self,
+        document: ParsedDocPage,
+        job_id: Optional[str],
+        metrics_recorder: MetricsRecorder,
+    ) -> ParsedDocPage:
+        metrics_recorder.page(document.page_number).attempts += 1
+        document = await self.parse_doc_page_with_workflow(document, metrics_recorder)
+        if job_id is not None and document.page_text is not None:
+            with metrics_recorder.measure("checkpoint"):
+                await asyncio.to_thread(
+                    self._save_checkpoint,
+                    metrics_recorder,
+                    f"page {document.page_number} of job {job_id}",
+                    self.checkpoint_store.save_page,
+                    job_id,
+                    document.page_number,
+                    document.page_text,
+                )
+        return document
+
+    @staticmethod
+    def _render_pages(
+        parse_doc_model_service: ParseDocModelService,
+        page_numbers: List[int],
+        with_complexity: bool,
+        metrics_recorder: MetricsRecorder,
+    ) -> List[ParsedDocPage]:
+        """Render the pages to base64 images, timing every page."""
+        document_pages = []
+        with metrics_recorder.track_memory("render"):
+            for page_number in page_numbers:
+                start = time.perf_counter()
+                document_pages.append(
+                    parse_doc_model_service.pdf_page_to_base64(
+                        page_number, with_complexity
+                    )
+                )
+                render_seconds = time.perf_counter() - start
+                metrics_recorder.page(page_number).render_seconds = render_seconds
+                metrics_recorder.add_stage_seconds("render", render_seconds)
+        return document_pages
+
+    async def _render_parse_and_checkpoint_page(
+        self,
+        document: ParsedDocPage,
+        parse_doc_model_service: ParseDocModelService,
+        page_bytes_budget: ByteBudget,
+        rendered_page_bytes: List[int],
+        render_lock: asyncio.Lock,
+        job_id: Optional[str],
+        metrics_recorder: MetricsRecorder,
+    ) -> ParsedDocPage:
+        """
+        Render a page within the page bytes budget, transcribe it and drop its image.
+
+        The budget is taken on the largest page of the document rendered so far,
+        then adjusted to the actual size of the page. Pages of a document are
+        rendered one at a time, the PDF document is not thread safe.
+        """
+        held_bytes = max(rendered_page_bytes)
+        await page_bytes_budget.acquire(held_bytes)
+        try:
+            if not document.page_base64:
+                async with render_lock:
+                    (rendered_page,) = await asyncio.to_thread(
+                        self._render_pages,
+                        parse_doc_model_service,
+                        [document.page_number],
+                        self.cascade_enabled,
+                        metrics_recorder,
+                    )
+                document.page_base64 = rendered_page.page_base64
+                document.complexity = rendered_page.complexity
+                rendered_page_bytes.append(len(document.page_base64))
+                await page_bytes_budget.resize(held_bytes, len(document.page_base64))
+                held_bytes = len(document.page_base64)
+            return await self._parse_and_checkpoint_page(
+                document, job_id, metrics_recorder
+            )
+        finally:
+            # a retry renders the page again
+            document.page_base64 = ""
+            await page_bytes_budget.release(held_bytes)
+
+    @staticmethod
+    def _mark_failed_page(page: ParsedDocPage, failure: TaskFailure):
+        page.page_text = None
+        page.transcription_error = f"{failure.error_type}: {failure.error}"
+        logger.error(
+            f"Failed to parse page {page.page_number} after {failure.attempts} attempts: {failure.error}"
+        )
+
     async def process_document(
-        self, file_key: str
+        self, file_key: str, metrics_recorder: Optional[MetricsRecorder] = None
     ) -> Tuple[List[ParsedDocPage], ParsedDoc]:
         """
         Process a document by parsing it and returning the parsed content.
+
+        With a checkpoint store, pages checkpointed by a previous run are neither
+        rendered nor transcribed again, they are returned without page_base64.
+        Failing pages are retried with backoff, pages still failing are marked in
+        the markdown (and left out of the checkpoints, so a later run retries
+        them) instead of failing the document. Checkpoint and job record writes
+        that fail are logged and counted in checkpoint_errors of the metrics. With max_inflight_page_bytes, the
+        first page is rendered to estimate the size of the page images: when
+        they would exceed it, pages are rendered right before their
+        transcription within the page bytes budget and returned without
+        page_base64.
+
+        Args:
+            file_key: Key of the PDF file
+            metrics_recorder: Optional recorder of the storage, render, checkpoint
+                and per page LLM metrics of the document
+
+        Raises:
+            Exception: The error of the first page when no page was transcribed
         """
-        raw_file_path = self.persistence_service.retrieve_raw_file(file_key)
+        if metrics_recorder is None:
+            metrics_recorder = MetricsRecorder(file_key, "transcription")
+        with metrics_recorder.measure("storage"):
+            raw_file_path = await asyncio.to_thread(
+                self.persistence_service.retrieve_raw_file, file_key
+            )
         parse_doc_model_service = ParseDocModelService(raw_file_path)
-        document_pages = parse_doc_model_service.parse_document_to_base64()
-        parse_pages_workflow_tasks = []
-        parsed_pages = []
-        for page in document_pages:
-            parse_pages_workflow_tasks.append(self.parse_doc_page_with_workflow(page))
-        # here
-        parsed_pages = await asyncio.gather(*parse_pages_workflow_tasks)
-        logger.info(f"Parsed {len(parsed_pages)} pages")
+        page_count = parse_doc_model_service.page_count
+        job = None
+        checkpointed_pages = {}
+        if self.checkpoint_store is not None:
+            with metrics_recorder.measure("checkpoint"):
+                job, checkpointed_pages = await asyncio.to_thread(
+                    self._open_job,
+                    file_key,
+                    raw_file_path,
+                    page_count,
+                    metrics_recorder,
+                )
+            if checkpointed_pages:
+                logger.info(
+                    f"Resuming {file_key}, {len(checkpointed_pages)} of {page_count} pages checkpointed"
+                )
+        pending_page_numbers = [
+            page_number
+            for page_number in range(1, page_count + 1)
+            if page_number not in checkpointed_pages
+        ]
+        job_id = job.job_id if job is not None else None
+        document_pages = []
+        stream_pages = False
+        if self.max_inflight_page_bytes is not None and pending_page_numbers:
+            # the first page gives the size of the page images
+            document_pages = await asyncio.to_thread(
+                self._render_pages,
+                parse_doc_model_service,
+                pending_page_numbers[:1],
+                self.cascade_enabled,
+                metrics_recorder,
+            )
+            estimated_page_bytes = len(document_pages[0].page_base64)
+            stream_pages = (
+                estimated_page_bytes * len(pending_page_numbers)
+                > self.max_inflight_page_bytes
+            )
+        if stream_pages:
+            logger.warning(
+                f"Page images of {file_key} would take about {estimated_page_bytes * len(pending_page_numbers)} bytes, "
+                f"rendering them page by page within {self.max_inflight_page_bytes} bytes"
+            )
+            metrics_recorder.add_guardrail("max_inflight_page_bytes")
+            page_bytes_budget = self.page_bytes_budget or ByteBudget(
+                self.max_inflight_page_bytes
+            )
+            document_pages += [
+                ParsedDocPage(page_number=page_number, page_base64="")
+                for page_number in pending_page_numbers[1:]
+            ]
+            rendered_page_bytes = [estimated_page_bytes]
+            render_lock = asyncio.Lock()
+
+            def transcribe_page(page: ParsedDocPage):
+                return self._render_parse_and_checkpoint_page(
+                    page,
+                    parse_doc_model_service,
+                    page_bytes_budget,
+                    rendered_page_bytes,
+                    render_lock,
+                    job_id,
+                    metrics_recorder,
+                )
+
+        else:
+            document_pages += await asyncio.to_thread(
+                self._render_pages,
+                parse_doc_model_service,
+                pending_page_numbers[len(document_pages) :],
+                self.cascade_enabled,
+                metrics_recorder,
+            )
+
+            def transcribe_page(page: ParsedDocPage):
+                return self._parse_and_checkpoint_page(page, job_id, metrics_recorder)
+
+        with metrics_recorder.track_memory("transcribe"):
+            gather_result = await gather_with_retries(
+                document_pages,
+                transcribe_page,
+                max_attempts=self.max_page_attempts,
+                base_delay_seconds=self.retry_base_delay_seconds,
+                max_delay_seconds=self.retry_max_delay_seconds,
+                retry_budget=self.retry_budget,
+            )
+        metrics_recorder.add_retries(gather_result.retries)
+        for failure in gather_result.failures:
+            self._mark_failed_page(document_pages[failure.index], failure)
+            metrics_recorder.page(
+                document_pages[failure.index].page_number
+            ).failed = True
+        for page_number in checkpointed_pages:
+            metrics_recorder.page(page_number).cached = True
+        parsed_pages = [
+            ParsedDocPage(page_number=page_number, page_base64="", page_text=page_text)
+            for page_number, page_text in checkpointed_pages.items()
+        ] + document_pages
+        if job is not None:
+            with metrics_recorder.measure("checkpoint"):
+                await asyncio.to_thread(
+                    self._close_job, job, parsed_pages, metrics_recorder
+                )
+        if document_pages and not checkpointed_pages and not gather_result.succeeded:
+            raise gather_result.failures[0].error
+        logger.info(
+            f"Parsed {len(parsed_pages) - len(gather_result.failures)} of {len(parsed_pages)} pages, "
+            f"{gather_result.retries} page retries"
+        )
         parsed_document = parse_doc_model_service.create_md_content(parsed_pages)
         return parsed_pages, parsed_document
 
+    def get_cascade_stats(self) -> dict:
+        """Per tier page share, latency and token usage of the transcriptions."""
+        return self.cascade_stats.summary()
+
+    def discard_checkpoints(self, file_key: str):
+        """Delete the job record and page checkpoints of a document."""
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.delete_job(self._gen_job_id(file_key))
+
     def save_parsed_document(
         self,
         file_key: str,
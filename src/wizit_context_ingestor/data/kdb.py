@@ -6,8 +6,14 @@ class KdbServices(str, Enum):
     REDIS = "redis"
     CHROMA = "chroma"
     PG = "pg"
+    MEMORY = "memory"
+    LOCAL = "local"
 
 
 kdb_services = Literal[
-    KdbServices.REDIS.value, KdbServices.CHROMA.value, KdbServices.PG.value
+    KdbServices.REDIS.value,
+    KdbServices.CHROMA.value,
+    KdbServices.PG.value,
+    KdbServices.MEMORY.value,
+    KdbServices.LOCAL.value,
 ]
@@ -2,8 +2,58 @@
 Domain models for app
 """
 
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class PageComplexity:
+    """Represents the layout signals telling how hard a page is to transcribe."""
+    text_chars: int
+    text_density: float
+    table_count: int
+    image_coverage: float
+    image_entropy: float
+
+
+@dataclass
+class CascadePolicy:
+    """Represents the thresholds under which a page goes to the fast model first."""
+    min_text_chars: int = 100
+    min_text_density: float = 0.2
+    max_tables: int = 0
+    max_image_coverage: float = 0.25
+    max_image_entropy: float = 4.0
+
+    def is_simple(self, complexity: "PageComplexity") -> bool:
+        return (
+            complexity.text_chars >= self.min_text_chars
+            and complexity.text_density >= self.min_text_density
+            and complexity.table_count <= self.max_tables
+            and complexity.image_coverage <= self.max_image_coverage
+            and complexity.image_entropy <= self.max_image_entropy
+        )
+
+
+@dataclass
+class TracingPolicy:
+    """Represents which calls are traced and how much of their payloads is kept."""
+    mode: str = "always"
+    sample_rate: float = 0.1
+    max_payload_chars: int = 4000
+    redacted_keys: List[str] = field(
+        default_factory=lambda: ["page_base64", "document_content"]
+    )
+    max_buffered_traces: int = 1000
+
+
+@dataclass
+class MemoryPolicy:
+    """Represents the memory profiling and the low memory guardrails of the pipelines."""
+    profile_memory: bool = False
+    memray_output_dir: Optional[str] = None
+    max_inflight_page_bytes: Optional[int] = None
+    max_full_context_chars: Optional[int] = None
 
 
 @dataclass
@@ -12,9 +62,116 @@ class ParsedDocPage:
     page_number: int
     page_base64: str
     page_text: Optional[str] = None  
+    transcription_error: Optional[str] = None
+    complexity: Optional[PageComplexity] = None
+    transcription_tier: Optional[str] = None
 
 @dataclass
 class ParsedDoc:
     """Represents a parsed document."""
     pages: List[ParsedDocPage]
     document_text: str
+
+
+@dataclass
+class DocumentBatchResult:
+    """Represents the outcome of a document processed in a batch."""
+    file_key: str
+    result: Optional[Any] = None
+    error: Optional[Exception] = None
+    metrics: Optional["DocumentMetrics"] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class TaskFailure:
+    """Represents an item that failed after its retries."""
+    index: int
+    error: Exception
+    attempts: int
+    retryable: bool = True
+
+    @property
+    def error_type(self) -> str:
+        return type(self.error).__name__
+
+
+@dataclass
+class GatherResult:
+    """Represents the outcome of running many items, successes and failures."""
+    results: List[Any]
+    failures: List[TaskFailure] = field(default_factory=list)
+    retries: int = 0
+
+    @property
+    def succeeded(self) -> int:
+        return len(self.results) - len(self.failures)
+
+
+@dataclass
+class TranscriptionJob:
+    """Represents the resumable state of a document transcription."""
+    job_id: str
+    file_key: str
+    file_digest: str
+    page_count: int
+    status: str = "running"
+    attempts: int = 0
+    completed_pages: int = 0
+    failed_pages: List[int] = field(default_factory=list)
+    last_error: Optional[str] = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+
+@dataclass
+class LlmCallMetrics:
+    """Represents the token usage and latency of LLM calls."""
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    latency_seconds: float = 0.0
+
+    def add(self, other: "LlmCallMetrics"):
+        self.calls += other.calls
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cached_tokens += other.cached_tokens
+        self.latency_seconds += other.latency_seconds
+
+
+@dataclass
+class TaskMetrics:
+    """Represents the metrics of a page or chunk of a document."""
+    index: int
+    attempts: int = 0
+    failed: bool = False
+    cached: bool = False
+    render_seconds: float = 0.0
+    llm: LlmCallMetrics = field(default_factory=LlmCallMetrics)
+
+
+@dataclass
+class DocumentMetrics:
+    """Represents the metrics of a document run through a pipeline."""
+    file_key: str
+    pipeline: str
+    pages: List[TaskMetrics] = field(default_factory=list)
+    chunks: List[TaskMetrics] = field(default_factory=list)
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    stage_peak_memory_bytes: Dict[str, int] = field(default_factory=dict)
+    guardrails: List[str] = field(default_factory=list)
+    retries: int = 0
+    checkpoint_errors: int = 0
+    total_seconds: float = 0.0
+
+    @property
+    def llm(self) -> LlmCallMetrics:
+        totals = LlmCallMetrics()
+        for task in self.pages + self.chunks:
+            totals.add(task.llm)
+        return totals
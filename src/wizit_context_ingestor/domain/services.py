@@ -1,10 +1,11 @@
 import base64
 import logging
 import io
+import numpy as np
 import pymupdf
 from PIL import Image
 from typing import List
-from ..domain.models import ParsedDocPage, ParsedDoc
+from ..domain.models import PageComplexity, ParsedDocPage, ParsedDoc
 
 logger = logging.getLogger(__name__)
 
@@ -26,12 +27,56 @@ class ParseDocModelService:
         self.pdf_document = pymupdf.open(file_path)
         self.page_count = self.pdf_document.page_count
 
-    def pdf_page_to_base64(self, page_number: int) -> ParsedDocPage:
+    @staticmethod
+    def _pixmap_entropy(pix) -> float:
+        """Shannon entropy (bits) of the grey levels of a rendered page."""
+        samples = np.frombuffer(pix.samples, dtype=np.uint8)
+        if pix.n >= 3:
+            pixels = samples.reshape(-1, pix.n)[:, :3].astype(np.uint16)
+            samples = (
+                (pixels[:, 0] * 77 + pixels[:, 1] * 150 + pixels[:, 2] * 29) >> 8
+            ).astype(np.uint8)
+        if samples.size == 0:
+            return 0.0
+        histogram = np.bincount(samples, minlength=256) / samples.size
+        histogram = histogram[histogram > 0]
+        return float(-(histogram * np.log2(histogram)).sum())
+
+    def page_complexity(self, page, pix) -> PageComplexity:
+        """
+        Layout signals of a page: its text layer, tables, images and the entropy
+        of its render, scanned and image heavy pages have little text and a high
+        entropy.
+
+        Args:
+            page: The loaded page
+            pix: The rendered pixmap of the page
+        """
+        page_area = max(page.rect.width * page.rect.height, 1.0)
+        text_chars = len(page.get_text().strip())
+        image_area = 0.0
+        for image_info in page.get_image_info():
+            bbox = pymupdf.Rect(image_info["bbox"]) & page.rect
+            image_area += bbox.width * bbox.height
+        return PageComplexity(
+            text_chars=text_chars,
+            # characters per 1000 square points, a full page of text is about 6
+            text_density=text_chars * 1000 / page_area,
+            # tables are found from ruled lines, pages without drawings have none
+            table_count=len(page.find_tables().tables) if page.get_drawings() else 0,
+            image_coverage=min(image_area / page_area, 1.0),
+            image_entropy=self._pixmap_entropy(pix),
+        )
+
+    def pdf_page_to_base64(
+        self, page_number: int, with_complexity: bool = False
+    ) -> ParsedDocPage:
         """
         Convert a PDF page to a base64-encoded PNG image.
 
         Args:
             page_number: One-indexed page number to convert
+            with_complexity: Also measure the page complexity from the same render
 
         Returns:
             Base64 encoded string of the page image
@@ -48,7 +93,11 @@ class ParseDocModelService:
             img.save(buffer, format="PNG")
             b64_encoded_image = base64.b64encode(buffer.getvalue()).decode("utf-8")
             logger.info(f"Page {page_number} encoded successfully")
-            return ParsedDocPage(page_number=page_number, page_base64=b64_encoded_image)
+            return ParsedDocPage(
+                page_number=page_number,
+                page_base64=b64_encoded_image,
+                complexity=self.page_complexity(page, pix) if with_complexity else None,
+            )
         except Exception as e:
             logger.error(f"Failed to parse b64 image: {str(e)}")
             raise
@@ -79,6 +128,27 @@ class ParseDocModelService:
             logger.error(f"Failed to parse b64 image: {str(e)}")
             raise
 
+    def parse_pages_to_base64(
+        self, page_numbers: List[int], with_complexity: bool = False
+    ) -> List[ParsedDocPage]:
+        """
+        Convert some pages of the PDF document to base64-encoded images.
+
+        Args:
+            page_numbers: One-indexed numbers of the pages to convert
+            with_complexity: Also measure the complexity of every page
+
+        Returns:
+            The converted pages, in the order of page_numbers
+
+        Raises:
+            Exception: If there's an error during conversion
+        """
+        return [
+            self.pdf_page_to_base64(page_number, with_complexity)
+            for page_number in page_numbers
+        ]
+
     def create_md_content(self, parsed_pages: List[ParsedDocPage]) -> ParsedDoc:
         """
         Create a markdown content from a list of parsed pages.
@@ -87,7 +157,11 @@ class ParseDocModelService:
         sorted_pages = sorted(parsed_pages, key=lambda page: page.page_number)
         for page in sorted_pages:
             md_content += f"## Page {page.page_number}\n\n"
-            md_content += f"{page.page_text}\n\n"
+            if page.page_text is None:
+                # keep the page visible, a later run can transcribe it
+                md_content += "<!-- page not transcribed -->\n\n"
+            else:
+                md_content += f"{page.page_text}\n\n"
         return ParsedDoc(pages=parsed_pages, document_text=md_content)
 
     # def
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+from ...application.interfaces import SearchResultCache
+from .sqlite_context_cache import ContextCacheStats
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CachedSearch:
+    records: List[Document]
+    ids: frozenset[str]
+    sources: Optional[frozenset[str]]
+    created_at: float
+
+
+class InMemorySearchResultCache(SearchResultCache):
+    """
+    Process local search result cache with a short time to live.
+
+    Entries expire after ttl_seconds and the least recently used entries are
+    evicted once the cache holds more than max_entries. Writes to a source drop
+    the results of searches that could find it (unfiltered searches and searches
+    filtered to that source), deletes of documents drop the results holding them.
+    """
+
+    __slots__ = ("ttl_seconds", "max_entries")
+
+    def __init__(self, ttl_seconds: float = 30, max_entries: int = 1024):
+        """
+        Initialize the InMemorySearchResultCache.
+
+        Args:
+            ttl_seconds: Seconds cached results stay valid
+            max_entries: Maximum number of cached searches
+
+        Raises:
+            ValueError: If ttl_seconds or max_entries is not positive
+        """
+        if ttl_seconds <= 0 or max_entries <= 0:
+            raise ValueError("ttl_seconds and max_entries must be positive")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = ContextCacheStats()
+        self._entries: OrderedDict[str, _CachedSearch] = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        """Counter increased by every invalidation."""
+        return self._generation
+
+    def get(self, key: str) -> Optional[List[Document]]:
+        """Get cached search results, None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            if time.monotonic() - entry.created_at > self.ttl_seconds:
+                del self._entries[key]
+                self.stats.misses += 1
+                self.stats.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return list(entry.records)
+
+    def set(
+        self,
+        key: str,
+        records: List[Document],
+        sources: Optional[frozenset[str]],
+        generation: int,
+    ):
+        """Cache search results, unless the cache was invalidated since generation."""
+        with self._lock:
+            if generation != self._generation:
+                # the search may have read documents written or deleted meanwhile
+                return
+            self._entries[key] = _CachedSearch(
+                records=list(records),
+                ids=frozenset(record.id for record in records if record.id),
+                sources=sources,
+                created_at=time.monotonic(),
+            )
+            self._entries.move_to_end(key)
+            self.stats.writes += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate_sources(self, sources: Optional[Iterable[str]]):
+        """Drop results that documents of the sources could change, all when None."""
+        with self._lock:
+            self._generation += 1
+            if sources is None:
+                stale = list(self._entries)
+            else:
+                sources = set(sources)
+                stale = [
+                    key
+                    for key, entry in self._entries.items()
+                    if entry.sources is None or not entry.sources.isdisjoint(sources)
+                ]
+            self._drop(stale)
+
+    def invalidate_ids(self, ids: Iterable[str]):
+        """Drop results holding any of the document ids."""
+        ids = set(ids)
+        with self._lock:
+            self._generation += 1
+            self._drop(
+                [
+                    key
+                    for key, entry in self._entries.items()
+                    if not entry.ids.isdisjoint(ids)
+                ]
+            )
+
+    def _drop(self, keys: list[str]):
+        for key in keys:
+            del self._entries[key]
+        self.stats.evictions += len(keys)
+        if keys:
+            logger.debug(f"Invalidated {len(keys)} cached searches")
+
+    def clear(self):
+        self.invalidate_sources(None)
+
+    def get_stats(self) -> dict:
+        """Cache hit metrics, including the hit rate."""
+        return {**asdict(self.stats), "hit_rate": self.stats.hit_rate}
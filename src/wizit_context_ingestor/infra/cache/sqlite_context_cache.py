@@ -0,0 +1,143 @@
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from ...application.interfaces import ContextCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ContextCacheStats:
+    """Counters of a context cache since it was opened."""
+
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class SqliteContextCache(ContextCache):
+    """
+    Persistent chunk context cache stored in a local SQLite file.
+
+    Entries expire after ttl_seconds and the least recently used entries are
+    evicted once the cache holds more than max_entries.
+    """
+
+    __slots__ = ("cache_path", "ttl_seconds", "max_entries")
+
+    def __init__(
+        self,
+        cache_path: str,
+        ttl_seconds: int = 30 * 24 * 60 * 60,
+        max_entries: int = 100_000,
+    ):
+        """
+        Initialize the SqliteContextCache.
+
+        Args:
+            cache_path: Path of the SQLite file, created when it does not exist
+            ttl_seconds: Seconds a cached context stays valid
+            max_entries: Maximum number of cached contexts
+
+        Raises:
+            Exception: If the cache file can not be opened
+        """
+        if ttl_seconds <= 0 or max_entries <= 0:
+            raise ValueError("ttl_seconds and max_entries must be positive")
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = ContextCacheStats()
+        try:
+            cache_dir = os.path.dirname(cache_path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS context_cache (
+                    key TEXT PRIMARY KEY,
+                    context TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS context_cache_accessed_at "
+                "ON context_cache (accessed_at)"
+            )
+            self.connection.commit()
+            logger.info(f"Context cache opened at {cache_path}")
+        except Exception as e:
+            logger.error(f"Failed to open context cache {cache_path}: {str(e)}")
+            raise
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached chunk context, None when missing or expired."""
+        now = time.time()
+        row = self.connection.execute(
+            "SELECT context, created_at FROM context_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+        context, created_at = row
+        if now - created_at > self.ttl_seconds:
+            self.connection.execute("DELETE FROM context_cache WHERE key = ?", (key,))
+            self.connection.commit()
+            self.stats.misses += 1
+            self.stats.evictions += 1
+            return None
+        self.connection.execute(
+            "UPDATE context_cache SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        self.connection.commit()
+        self.stats.hits += 1
+        return context
+
+    def set(self, key: str, context: str):
+        """Cache a chunk context, evicting expired and least recently used entries."""
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO context_cache (key, context, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?)",
+            (key, context, now, now),
+        )
+        self.stats.writes += 1
+        self._evict(now)
+        self.connection.commit()
+
+    def _evict(self, now: float):
+        expired = self.connection.execute(
+            "DELETE FROM context_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        (entries,) = self.connection.execute(
+            "SELECT COUNT(*) FROM context_cache"
+        ).fetchone()
+        overflow = max(entries - self.max_entries, 0)
+        if overflow:
+            self.connection.execute(
+                "DELETE FROM context_cache WHERE key IN ("
+                "SELECT key FROM context_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+        self.stats.evictions += expired + overflow
+
+    def get_stats(self) -> dict:
+        """Cache hit metrics, including the hit rate."""
+        return {**asdict(self.stats), "hit_rate": self.stats.hit_rate}
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,26 @@
+import json
+import logging
+
+from ...application.interfaces import MetricsSink
+from ...domain.models import DocumentMetrics
+from ...utils.metrics_utils import summarize_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoggingMetricsSink(MetricsSink):
+    """Metrics sink writing the totals of every document as a JSON log line."""
+
+    __slots__ = ("level",)
+
+    def __init__(self, level: int = logging.INFO):
+        """
+        Initialize the LoggingMetricsSink.
+
+        Args:
+            level: Logging level of the metrics lines
+        """
+        self.level = level
+
+    def emit(self, metrics: DocumentMetrics):
+        logger.log(self.level, json.dumps(summarize_metrics(metrics)))
@@ -0,0 +1,128 @@
+import logging
+
+from ...application.interfaces import MetricsSink
+from ...domain.models import DocumentMetrics
+
+try:
+    from opentelemetry import metrics as otel_metrics
+except ImportError as e:  # pragma: no cover - depends on the deployment
+    raise ImportError(
+        "The OpenTelemetry metrics sink needs opentelemetry-api, install it with: "
+        "pip install 'wizit_context_ingestor[otel]'"
+    ) from e
+
+logger = logging.getLogger(__name__)
+
+
+class OpenTelemetryMetricsSink(MetricsSink):
+    """
+    Metrics sink recording document metrics on OpenTelemetry instruments.
+
+    Token usage and LLM call durations follow the gen_ai semantic conventions,
+    one measurement per page or chunk. Instruments come from the global meter
+    provider unless one is given, the exporters are configured by the
+    application, as usual with OpenTelemetry.
+    """
+
+    __slots__ = ("meter",)
+
+    def __init__(self, meter_provider=None, meter_name: str = "wizit_context_ingestor"):
+        """
+        Initialize the OpenTelemetryMetricsSink.
+
+        Args:
+            meter_provider: Optional meter provider, the global one when None
+            meter_name: Name of the meter creating the instruments
+        """
+        self.meter = otel_metrics.get_meter(meter_name, meter_provider=meter_provider)
+        self.token_usage = self.meter.create_histogram(
+            "gen_ai.client.token.usage",
+            unit="{token}",
+            description="Tokens used by the LLM calls of a page or chunk",
+        )
+        self.operation_duration = self.meter.create_histogram(
+            "gen_ai.client.operation.duration",
+            unit="s",
+            description="Time spent in the LLM calls of a page or chunk",
+        )
+        self.stage_duration = self.meter.create_histogram(
+            "ingestion.stage.duration",
+            unit="s",
+            description="Time spent by a document in a pipeline stage",
+        )
+        self.stage_memory = self.meter.create_histogram(
+            "ingestion.stage.memory.peak",
+            unit="By",
+            description="Peak traced memory while a document was in a pipeline stage",
+        )
+        self.guardrails = self.meter.create_counter(
+            "ingestion.guardrails",
+            unit="{document}",
+            description="Documents switched to low memory behaviour, by guardrail",
+        )
+        self.document_duration = self.meter.create_histogram(
+            "ingestion.document.duration",
+            unit="s",
+            description="Time spent by a document in a pipeline",
+        )
+        self.tasks = self.meter.create_counter(
+            "ingestion.tasks",
+            unit="{task}",
+            description="Pages and chunks processed, by status",
+        )
+        self.retries = self.meter.create_counter(
+            "ingestion.retries",
+            unit="{retry}",
+            description="Retries of failing pages and chunks",
+        )
+        self.checkpoint_errors = self.meter.create_counter(
+            "ingestion.checkpoint.errors",
+            unit="{error}",
+            description="Failed writes of page checkpoints and job records",
+        )
+
+    def emit(self, metrics: DocumentMetrics):
+        attributes = {"ingestion.pipeline": metrics.pipeline}
+        try:
+            for task_kind, tasks in (
+                ("page", metrics.pages),
+                ("chunk", metrics.chunks),
+            ):
+                for task in tasks:
+                    task_attributes = {**attributes, "ingestion.task": task_kind}
+                    if task.cached:
+                        status = "cached"
+                    else:
+                        status = "failed" if task.failed else "ok"
+                    self.tasks.add(1, {**task_attributes, "ingestion.status": status})
+                    if not task.llm.calls:
+                        continue
+                    for token_type, tokens in (
+                        ("input", task.llm.input_tokens),
+                        ("output", task.llm.output_tokens),
+                        ("cached", task.llm.cached_tokens),
+                    ):
+                        self.token_usage.record(
+                            tokens, {**task_attributes, "gen_ai.token.type": token_type}
+                        )
+                    self.operation_duration.record(
+                        task.llm.latency_seconds, task_attributes
+                    )
+            for stage, seconds in metrics.stage_seconds.items():
+                self.stage_duration.record(
+                    seconds, {**attributes, "ingestion.stage": stage}
+                )
+            for stage, peak_bytes in metrics.stage_peak_memory_bytes.items():
+                self.stage_memory.record(
+                    peak_bytes, {**attributes, "ingestion.stage": stage}
+                )
+            for guardrail in metrics.guardrails:
+                self.guardrails.add(1, {**attributes, "ingestion.guardrail": guardrail})
+            self.document_duration.record(metrics.total_seconds, attributes)
+            if metrics.retries:
+                self.retries.add(metrics.retries, attributes)
+            if metrics.checkpoint_errors:
+                self.checkpoint_errors.add(metrics.checkpoint_errors, attributes)
+        except Exception as e:
+            # metrics never fail the ingestion
+            logger.warning(f"Could not record metrics of {metrics.file_key}: {str(e)}")
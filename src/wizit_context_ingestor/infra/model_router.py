@@ -0,0 +1,434 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from ..application.interfaces import AiApplicationService
+
+logger = logging.getLogger(__name__)
+
+# consecutive throttling errors of a route before it is cooled down
+THROTTLES_BEFORE_COOLDOWN = 3
+
+THROTTLING_MARKERS = (
+    "429",
+    "resource exhausted",
+    "resourceexhausted",
+    "throttl",
+    "rate limit",
+    "ratelimit",
+    "too many requests",
+    "quota",
+    "overloaded",
+)
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """Tell whether a provider error means the route is throttling requests."""
+    description = f"{type(error).__name__} {error}".lower()
+    return any(marker in description for marker in THROTTLING_MARKERS)
+
+
+@dataclass
+class ModelRoute:
+    """
+    A provider, region and model the router can send requests to.
+
+    model is a chat model, or a callable building one from the parameters given
+    to load_chat_model (e.g. VertexModels(...).load_chat_model).
+    """
+
+    name: str
+    model: Union[BaseChatModel, Callable[..., BaseChatModel]]
+    weight: float = 1.0
+    max_concurrency: int = 16
+
+
+@dataclass
+class RouteStats:
+    """Counters and moving averages of a route since the router was created."""
+
+    calls: int = 0
+    errors: int = 0
+    throttles: int = 0
+    in_flight: int = 0
+    latency_ewma_seconds: float = 0.0
+    failure_ewma: float = 0.0
+    consecutive_throttles: int = 0
+    cooldown_until: float = 0.0
+    concurrency_limit: float = 0.0
+
+
+class _RouteBalancer:
+    """
+    Picks routes for requests and keeps their statistics, shared by every model
+    bound from the same router so tools and structured output variants draw on
+    the same concurrency and throttling state. Thread safe, the workflow nodes
+    call models from worker threads.
+    """
+
+    def __init__(
+        self,
+        routes: List[ModelRoute],
+        latency_alpha: float,
+        base_cooldown_seconds: float,
+        max_cooldown_seconds: float,
+        throttle_backoff: float,
+    ):
+        self.routes = {route.name: route for route in routes}
+        self.stats = {
+            route.name: RouteStats(concurrency_limit=route.max_concurrency)
+            for route in routes
+        }
+        self.latency_alpha = latency_alpha
+        self.base_cooldown_seconds = base_cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self.throttle_backoff = throttle_backoff
+        self.condition = threading.Condition()
+        self.random = random.Random()
+
+    def _score(self, name: str) -> float:
+        stats = self.stats[name]
+        # routes without samples yet are assumed as fast as the fastest route
+        latencies = [s.latency_ewma_seconds for s in self.stats.values() if s.calls > 0]
+        latency = stats.latency_ewma_seconds or (min(latencies) if latencies else 1.0)
+        return (
+            self.routes[name].weight
+            * (1.0 - stats.failure_ewma) ** 2
+            / max(latency, 1e-3)
+        )
+
+    def _try_acquire(self, excluded: set) -> tuple[Optional[str], float]:
+        """
+        Take a slot on the best available route.
+
+        Returns:
+            The route name, or None with the seconds worth waiting for a slot
+        """
+        now = time.monotonic()
+        candidates = [name for name in self.routes if name not in excluded]
+        if not candidates:
+            raise ValueError("No route left to try")
+        ready = [name for name in candidates if self.stats[name].cooldown_until <= now]
+        if not ready:
+            # every route is cooling down, wait for the first one back
+            first_back = min(self.stats[name].cooldown_until for name in candidates)
+            return None, min(first_back - now, 1.0)
+        available = [
+            name
+            for name in ready
+            if self.stats[name].in_flight < int(self.stats[name].concurrency_limit)
+        ]
+        if not available:
+            return None, 0.05
+        name = self.random.choices(
+            available, weights=[self._score(name) for name in available]
+        )[0]
+        self.stats[name].in_flight += 1
+        return name, 0.0
+
+    def acquire(self, excluded: set) -> str:
+        with self.condition:
+            while True:
+                name, wait_seconds = self._try_acquire(excluded)
+                if name is not None:
+                    return name
+                self.condition.wait(wait_seconds)
+
+    async def aacquire(self, excluded: set) -> str:
+        while True:
+            with self.condition:
+                name, wait_seconds = self._try_acquire(excluded)
+            if name is not None:
+                return name
+            await asyncio.sleep(wait_seconds)
+
+    def release(self, name: str, latency_seconds: float, error: Optional[Exception]):
+        with self.condition:
+            stats = self.stats[name]
+            alpha = self.latency_alpha
+            stats.in_flight -= 1
+            stats.calls += 1
+            failed = error is not None
+            stats.failure_ewma = (1 - alpha) * stats.failure_ewma + alpha * failed
+            if not failed:
+                stats.latency_ewma_seconds = (
+                    latency_seconds
+                    if not stats.latency_ewma_seconds
+                    else (1 - alpha) * stats.latency_ewma_seconds
+                    + alpha * latency_seconds
+                )
+                stats.consecutive_throttles = 0
+                # additive increase, about one slot per limit calls answered
+                stats.concurrency_limit = min(
+                    stats.concurrency_limit + 1 / stats.concurrency_limit,
+                    self.routes[name].max_concurrency,
+                )
+            elif is_throttling_error(error):
+                stats.throttles += 1
+                stats.consecutive_throttles += 1
+                # multiplicative decrease, converges under the provider quota
+                stats.concurrency_limit = max(
+                    stats.concurrency_limit * self.throttle_backoff, 1.0
+                )
+                # a single 429 is left to the limit, throttling that goes on
+                # (rate quotas, outages) takes the route out for a while
+                if stats.consecutive_throttles >= THROTTLES_BEFORE_COOLDOWN:
+                    cooldown = min(
+                        self.max_cooldown_seconds,
+                        self.base_cooldown_seconds
+                        * 2
+                        ** (stats.consecutive_throttles - THROTTLES_BEFORE_COOLDOWN),
+                    )
+                    stats.cooldown_until = time.monotonic() + cooldown
+                    logger.warning(
+                        f"Route {name} throttled, cooling down for {cooldown:.1f}s"
+                    )
+            else:
+                stats.errors += 1
+            self.condition.notify_all()
+
+
+class RoutedRunnable(Runnable):
+    """Runnable sending every call to one route picked by the balancer."""
+
+    def __init__(
+        self,
+        balancer: _RouteBalancer,
+        runnables: Dict[str, Runnable],
+        max_failover_attempts: int,
+    ):
+        self.balancer = balancer
+        self.runnables = runnables
+        self.max_failover_attempts = max_failover_attempts
+
+    def invoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs
+    ) -> Any:
+        tried = set()
+        last_error = None
+        for _ in range(self.max_failover_attempts):
+            name = self.balancer.acquire(tried)
+            start = time.perf_counter()
+            try:
+                result = self.runnables[name].invoke(input, config, **kwargs)
+            except Exception as e:
+                self.balancer.release(name, time.perf_counter() - start, e)
+                logger.warning(f"Route {name} failed, failing over: {str(e)}")
+                tried.add(name)
+                last_error = e
+                continue
+            self.balancer.release(name, time.perf_counter() - start, None)
+            return result
+        raise last_error
+
+    async def ainvoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs
+    ) -> Any:
+        tried = set()
+        last_error = None
+        for _ in range(self.max_failover_attempts):
+            name = await self.balancer.aacquire(tried)
+            start = time.perf_counter()
+            try:
+                result = await self.runnables[name].ainvoke(input, config, **kwargs)
+            except Exception as e:
+                self.balancer.release(name, time.perf_counter() - start, e)
+                logger.warning(f"Route {name} failed, failing over: {str(e)}")
+                tried.add(name)
+                last_error = e
+                continue
+            self.balancer.release(name, time.perf_counter() - start, None)
+            return result
+        raise last_error
+
+
+class RoutedChatModel(RoutedRunnable):
+    """
+    Chat model spreading requests over the routes of a ModelRouter.
+
+    bind_tools and with_structured_output are applied to the model of every
+    route, the bound runnables keep sharing the router statistics.
+    """
+
+    def _bound(self, bind: Callable[[BaseChatModel], Runnable]) -> RoutedRunnable:
+        return RoutedRunnable(
+            self.balancer,
+            {name: bind(model) for name, model in self.runnables.items()},
+            self.max_failover_attempts,
+        )
+
+    def bind_tools(self, tools, **kwargs) -> RoutedRunnable:
+        return self._bound(lambda model: model.bind_tools(tools, **kwargs))
+
+    def with_structured_output(self, schema, **kwargs) -> RoutedRunnable:
+        return self._bound(lambda model: model.with_structured_output(schema, **kwargs))
+
+
+class ModelRouter(AiApplicationService):
+    """
+    AI application service spreading chat requests over several providers,
+    regions and models.
+
+    Each request goes to a route drawn at random with a probability following
+    its weight, its observed latency and its recent failure rate. Every route
+    has a concurrency limit, routes at their limit are skipped. A throttling
+    error (429, quota, resource exhausted) shrinks the limit of the route
+    (AIMD, so it settles under the provider quota), and a route throttling
+    again and again is cooled down for an exponentially growing time. A failed request fails over to the next
+    best route.
+    """
+
+    __slots__ = ("routes", "max_failover_attempts", "llm_model_id", "balancer")
+
+    def __init__(
+        self,
+        routes: List[ModelRoute],
+        max_failover_attempts: Optional[int] = None,
+        latency_alpha: float = 0.2,
+        base_cooldown_seconds: float = 2.0,
+        max_cooldown_seconds: float = 60.0,
+        throttle_backoff: float = 0.7,
+    ):
+        """
+        Initialize the ModelRouter.
+
+        Args:
+            routes: Routes requests are spread over, with unique names
+            max_failover_attempts: Routes tried by a request before its last error
+                is raised, all routes when None
+            latency_alpha: Weight of the last call in the latency and failure
+                moving averages
+            base_cooldown_seconds: Cooldown of a route throttling repeatedly,
+                doubled by every further consecutive throttling error
+            max_cooldown_seconds: Maximum cooldown of a route
+            throttle_backoff: Factor applied to the concurrency limit of a route
+                by a throttling error, the limit grows back by one slot per
+                limit calls answered, up to the max_concurrency of the route
+
+        Raises:
+            ValueError: If no route is given or route names are repeated
+        """
+        if not routes:
+            raise ValueError("At least one route is required")
+        if len({route.name for route in routes}) != len(routes):
+            raise ValueError("Route names must be unique")
+        self.routes = routes
+        self.max_failover_attempts = min(
+            max_failover_attempts or len(routes), len(routes)
+        )
+        # identifies the models behind the router in cache and job keys
+        self.llm_model_id = ",".join(route.name for route in routes)
+        self.balancer = _RouteBalancer(
+            routes,
+            latency_alpha,
+            base_cooldown_seconds,
+            max_cooldown_seconds,
+            throttle_backoff,
+        )
+        logger.info(f"ModelRouter initialized with routes {self.llm_model_id}")
+
+    def load_chat_model(self, **chat_model_params) -> RoutedChatModel:
+        """
+        Load the chat model of every route behind a single routed chat model.
+
+        Args:
+            **chat_model_params: Parameters given to the routes building their
+                chat model (temperature, max_tokens, ...)
+
+        Returns:
+            A RoutedChatModel sharing the statistics of this router
+        """
+        try:
+            models = {}
+            for route in self.routes:
+                if isinstance(route.model, Runnable):
+                    models[route.name] = route.model
+                else:
+                    models[route.name] = route.model(**chat_model_params)
+            return RoutedChatModel(self.balancer, models, self.max_failover_attempts)
+        except Exception as e:
+            logger.error(f"Failed to load routed chat models: {str(e)}")
+            raise
+
+    def get_stats(self) -> dict:
+        """Calls, errors, throttles, in flight requests and latency by route."""
+        with self.balancer.condition:
+            now = time.monotonic()
+            return {
+                name: {
+                    **{
+                        key: value
+                        for key, value in asdict(stats).items()
+                        if key != "cooldown_until"
+                    },
+                    "cooldown_seconds_left": max(stats.cooldown_until - now, 0.0),
+                }
+                for name, stats in self.balancer.stats.items()
+            }
+
+
+def create_model_router(
+    route_specs: List[Dict[str, Any]],
+    gcp_project_id: Optional[str] = None,
+    gcp_sa_dict: Optional[Dict[str, Any]] = None,
+    **router_params,
+) -> ModelRouter:
+    """
+    Create a ModelRouter from plain route settings.
+
+    Every spec has a provider ("vertex" or "bedrock"), a model_id, a location
+    (vertex region) or region_name (bedrock region), and optionally a name,
+    weight and max_concurrency. Vertex routes serve Claude and Gemini models,
+    bedrock routes go through AWSModels with the default AWS credentials.
+
+    Args:
+        route_specs: Settings of the routes
+        gcp_project_id: Google Cloud project of the vertex routes
+        gcp_sa_dict: Service account of the vertex routes
+        **router_params: Parameters of ModelRouter
+
+    Returns:
+        The ModelRouter over the routes
+
+    Raises:
+        ValueError: If a provider is not supported
+    """
+    routes = []
+    for spec in route_specs:
+        provider = spec.get("provider", "vertex")
+        if provider == "vertex":
+            from .vertex_model import VertexModels
+
+            load_chat_model = VertexModels.shared(
+                gcp_project_id,
+                spec["location"],
+                gcp_sa_dict,
+                llm_model_id=spec["model_id"],
+            ).load_chat_model
+            region = spec["location"]
+        elif provider == "bedrock":
+            from .aws_model import AWSModels
+
+            region = spec.get("region_name", "us-east-1")
+            load_chat_model = partial(
+                AWSModels(spec["model_id"]).load_chat_model, region_name=region
+            )
+        else:
+            raise ValueError(f"Unsupported model provider: {provider}")
+        routes.append(
+            ModelRoute(
+                name=spec.get("name", f"{provider}:{region}:{spec['model_id']}"),
+                model=load_chat_model,
+                weight=spec.get("weight", 1.0),
+                max_concurrency=spec.get("max_concurrency", 16),
+            )
+        )
+    return ModelRouter(routes, **router_params)
@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import asdict
+from typing import Dict, Optional
+
+from ...application.interfaces import TranscriptionCheckpointStore
+from ...domain.models import TranscriptionJob
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCheckpointStore(TranscriptionCheckpointStore):
+    """
+    Transcription checkpoints stored as JSON files in a local directory.
+
+    Every job has its own folder holding job.json and one file per transcribed
+    page. Files are written to a temporary file and renamed, so a worker killed
+    mid-write never leaves a torn checkpoint behind.
+    """
+
+    __slots__ = ("checkpoint_route",)
+
+    def __init__(self, checkpoint_route: str):
+        """
+        Initialize the LocalCheckpointStore.
+
+        Args:
+            checkpoint_route: Directory holding the checkpoints, created when missing
+        """
+        self.checkpoint_route = checkpoint_route
+        os.makedirs(checkpoint_route, exist_ok=True)
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.checkpoint_route, job_id)
+
+    def _pages_dir(self, job_id: str) -> str:
+        return os.path.join(self._job_dir(job_id), "pages")
+
+    @staticmethod
+    def _write_json(path: str, content: dict):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as f:
+                json.dump(content, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def load_job(self, job_id: str) -> Optional[TranscriptionJob]:
+        """Load a transcription job record, None when missing."""
+        job_path = os.path.join(self._job_dir(job_id), "job.json")
+        try:
+            with open(job_path, "r", encoding="utf-8") as f:
+                return TranscriptionJob(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error loading transcription job {job_id}: {str(e)}")
+            raise
+
+    def save_job(self, job: TranscriptionJob):
+        """Save a transcription job record."""
+        try:
+            self._write_json(
+                os.path.join(self._job_dir(job.job_id), "job.json"), asdict(job)
+            )
+        except Exception as e:
+            logger.error(f"Error saving transcription job {job.job_id}: {str(e)}")
+            raise
+
+    def load_pages(self, job_id: str) -> Dict[int, str]:
+        """Load the checkpointed page transcriptions of a job by page number."""
+        pages_dir = self._pages_dir(job_id)
+        if not os.path.isdir(pages_dir):
+            return {}
+        pages = {}
+        try:
+            for file_name in os.listdir(pages_dir):
+                if not file_name.endswith(".json"):
+                    continue
+                with open(
+                    os.path.join(pages_dir, file_name), "r", encoding="utf-8"
+                ) as f:
+                    page = json.load(f)
+                pages[page["page_number"]] = page["page_text"]
+            return pages
+        except Exception as e:
+            logger.error(f"Error loading page checkpoints of job {job_id}: {str(e)}")
+            raise
+
+    def save_page(self, job_id: str, page_number: int, page_text: str):
+        """Checkpoint a page transcription, once saved it survives a crash."""
+        try:
+            self._write_json(
+                os.path.join(self._pages_dir(job_id), f"{page_number:05d}.json"),
+                {"page_number": page_number, "page_text": page_text},
+            )
+        except Exception as e:
+            logger.error(
+                f"Error saving checkpoint of page {page_number} of job {job_id}: {str(e)}"
+            )
+            raise
+
+    def delete_job(self, job_id: str):
+        """Delete the job record and all its page checkpoints."""
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
@@ -0,0 +1,145 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Dict, Optional
+
+from boto3 import client as boto3_client
+from botocore.exceptions import ClientError
+
+from ...application.interfaces import TranscriptionCheckpointStore
+from ...domain.models import TranscriptionJob
+
+logger = logging.getLogger(__name__)
+
+# S3 DeleteObjects accepts at most 1000 keys per request
+S3_DELETE_BATCH_SIZE = 1000
+
+
+class S3CheckpointStore(TranscriptionCheckpointStore):
+    """
+    Transcription checkpoints stored as JSON objects in an S3 bucket.
+
+    Every job lives under {prefix}/{job_id}/, with job.json and one object per
+    transcribed page. A single PUT is atomic in S3, so a page is either fully
+    checkpointed or missing. Pages are loaded with parallel GETs on resume.
+    """
+
+    __slots__ = ("bucket_name", "prefix", "max_workers")
+
+    def __init__(
+        self,
+        bucket_name: str,
+        prefix: str = "transcription_checkpoints",
+        region_name: str = "us-east-1",
+        max_workers: int = 16,
+    ):
+        """
+        Initialize the S3CheckpointStore.
+
+        Args:
+            bucket_name: Bucket holding the checkpoints
+            prefix: Key prefix of the checkpoints in the bucket
+            region_name: AWS region of the bucket
+            max_workers: Parallel GETs when loading the pages of a job
+        """
+        self.s3 = boto3_client("s3", region_name=region_name)
+        self.bucket_name = bucket_name
+        self.prefix = prefix.strip("/")
+        self.max_workers = max_workers
+
+    def _job_prefix(self, job_id: str) -> str:
+        return f"{self.prefix}/{job_id}/"
+
+    def _put_json(self, key: str, content: dict):
+        self.s3.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=json.dumps(content, ensure_ascii=False).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+    def _get_json(self, key: str) -> dict:
+        response = self.s3.get_object(Bucket=self.bucket_name, Key=key)
+        return json.loads(response["Body"].read())
+
+    def _list_keys(self, prefix: str) -> list[str]:
+        keys = []
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            keys.extend(item["Key"] for item in page.get("Contents", []))
+        return keys
+
+    def load_job(self, job_id: str) -> Optional[TranscriptionJob]:
+        """Load a transcription job record, None when missing."""
+        try:
+            return TranscriptionJob(
+                **self._get_json(f"{self._job_prefix(job_id)}job.json")
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            logger.error(f"Error loading transcription job {job_id} from S3: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(
+                f"Unexpected error loading transcription job {job_id} from S3: {str(e)}"
+            )
+            raise
+
+    def save_job(self, job: TranscriptionJob):
+        """Save a transcription job record."""
+        try:
+            self._put_json(f"{self._job_prefix(job.job_id)}job.json", asdict(job))
+        except Exception as e:
+            logger.error(f"Error saving transcription job {job.job_id} to S3: {str(e)}")
+            raise
+
+    def load_pages(self, job_id: str) -> Dict[int, str]:
+        """Load the checkpointed page transcriptions of a job by page number."""
+        try:
+            page_keys = self._list_keys(f"{self._job_prefix(job_id)}pages/")
+            if not page_keys:
+                return {}
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(page_keys))
+            ) as executor:
+                pages = list(executor.map(self._get_json, page_keys))
+            return {page["page_number"]: page["page_text"] for page in pages}
+        except Exception as e:
+            logger.error(
+                f"Error loading page checkpoints of job {job_id} from S3: {str(e)}"
+            )
+            raise
+
+    def save_page(self, job_id: str, page_number: int, page_text: str):
+        """Checkpoint a page transcription, once saved it survives a crash."""
+        try:
+            self._put_json(
+                f"{self._job_prefix(job_id)}pages/{page_number:05d}.json",
+                {"page_number": page_number, "page_text": page_text},
+            )
+        except Exception as e:
+            logger.error(
+                f"Error saving checkpoint of page {page_number} of job {job_id} to S3: {str(e)}"
+            )
+            raise
+
+    def delete_job(self, job_id: str):
+        """Delete the job record and all its page checkpoints."""
+        try:
+            keys = self._list_keys(self._job_prefix(job_id))
+            for start in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+                self.s3.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={
+                        "Objects": [
+                            {"Key": key}
+                            for key in keys[start : start + S3_DELETE_BATCH_SIZE]
+                        ],
+                        "Quiet": True,
+                    },
+                )
+        except Exception as e:
+            logger.error(f"Error deleting transcription job {job_id} from S3: {str(e)}")
+            raise
@@ -0,0 +1,117 @@
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from ..cache.sqlite_context_cache import ContextCacheStats
+from .query_embeddings import embed_queries
+
+logger = logging.getLogger(__name__)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Embeddings whose query vectors are kept in a least recently used cache.
+
+    Repeated queries skip the remote embedding call. Queries differing only in
+    surrounding or repeated whitespace share an entry. Document embeddings are
+    not cached, they are computed once per chunk by the indexing.
+    """
+
+    __slots__ = ("embeddings", "max_entries")
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = 1024):
+        """
+        Initialize the CachedQueryEmbeddings.
+
+        Args:
+            embeddings: The embeddings model computing the vectors
+            max_entries: Maximum number of cached query vectors
+
+        Raises:
+            ValueError: If max_entries is not positive
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.stats = ContextCacheStats()
+        self._vectors: OrderedDict[str, List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        return " ".join(text.split())
+
+    def _get(self, key: str) -> List[float] | None:
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is None:
+                self.stats.misses += 1
+                return None
+            self._vectors.move_to_end(key)
+            self.stats.hits += 1
+            return vector
+
+    def _set(self, key: str, vector: List[float]):
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            self.stats.writes += 1
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+                self.stats.evictions += 1
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._cache_key(text)
+        vector = self._get(key)
+        if vector is None:
+            # concurrent misses of one query may both embed it, the last one is kept
+            vector = self.embeddings.embed_query(text)
+            self._set(key, vector)
+        return list(vector)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._cache_key(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self._set(key, vector)
+        return list(vector)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries, the uncached ones in batched requests."""
+        keys = [self._cache_key(text) for text in texts]
+        vectors = {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self._get(key)
+            if vector is None:
+                missing[key] = text
+            else:
+                vectors[key] = vector
+        if missing:
+            embedded = embed_queries(self.embeddings, list(missing.values()))
+            for key, vector in zip(missing, embedded):
+                self._set(key, vector)
+                vectors[key] = vector
+        return [list(vectors[key]) for key in keys]
+
+    def clear(self):
+        with self._lock:
+            self._vectors.clear()
+
+    def get_stats(self) -> dict:
+        """Cache hit metrics, including the hit rate."""
+        return {**asdict(self.stats), "hit_rate": self.stats.hit_rate}
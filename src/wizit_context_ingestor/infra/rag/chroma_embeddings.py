@@ -1,9 +1,14 @@
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 
 from ...application.interfaces import EmbeddingsManager
+from .document_keys import document_key_encoder
+from .query_embeddings import embed_queries
 
 # load_dotenv()
 
@@ -17,6 +22,9 @@ class ChromaEmbeddingsManager(EmbeddingsManager):
         self,
         embeddings_model,
         chroma_host=None,
+        batch_size: int | None = None,
+        max_concurrent_batches: int = 4,
+        source_id_key: str = "source",
         **chroma_conn_kwargs,
     ):
         """
@@ -24,13 +32,24 @@ class ChromaEmbeddingsManager(EmbeddingsManager):
         Args:
             embeddings_model: The embeddings model to use for generating vector embeddings
                               (typically a LangChain embeddings model instance)
-            chroma_host: The Chroma host URL
+            chroma_host: The Chroma host URL, without it Chroma runs in process
+                         (persistent when persist_directory is given)
+            batch_size: Documents embedded and written per batch, capped by the
+                        max batch size of the Chroma client (the default)
+            max_concurrent_batches: Batches embedded and written at the same time
+            source_id_key: Metadata key holding the document source
+            **chroma_conn_kwargs: Arguments of langchain_chroma.Chroma
+                                  (collection_name, persist_directory, client, ...)
 
         Raises:
-            Exception: If there's an error initializing the RedisEmbeddingsManager
+            Exception: If there's an error initializing the ChromaEmbeddingsManager
         """
+        if max_concurrent_batches <= 0:
+            raise ValueError("max_concurrent_batches must be positive")
         self.embeddings_model = embeddings_model
         self.chroma_host = chroma_host
+        self.max_concurrent_batches = max_concurrent_batches
+        self.source_id_key = source_id_key
         try:
             if chroma_host:
                 self.chroma = Chroma(
@@ -38,63 +57,322 @@ class ChromaEmbeddingsManager(EmbeddingsManager):
                     host=chroma_host,
                     **chroma_conn_kwargs,
                 )
-                logger.info("ChromaEmbeddingsManager initialized")
             else:
                 self.chroma = Chroma(
                     embedding_function=self.embeddings_model, **chroma_conn_kwargs
                 )
-                logger.info("ChromaEmbeddingsManager initialized")
+            # larger writes are rejected by chroma
+            max_batch_size = self.chroma._client.get_max_batch_size()
+            self.batch_size = min(batch_size or max_batch_size, max_batch_size)
+            logger.info("ChromaEmbeddingsManager initialized")
         except Exception as e:
             logger.error(f"Failed to initialize ChromaEmbeddingsManager: {str(e)}")
             raise
 
-    async def configure_vector_store(
-        self,
-        table_name: str = "",
-        vector_size: int = 768,
-        content_column: str = "document",
-        id_column: str = "id",
-        metadata_json_column: str = "metadata",
-        pg_record_manager: str = "postgres/langchain_pg_collection",
-    ):
-        """Configure the vector store."""
+    def configure_vector_store(self):
+        """Configure the vector store, the collection is created on initialization."""
         pass
 
-    async def init_vector_store(
-        self,
-        table_name: str = "",
-        content_column: str = "document",
-        metadata_json_column: str = "metadata",
-        id_column: str = "id",
-    ):
+    def init_vector_store(self):
         """Initialize the vector store."""
         pass
 
-    async def index_documents(self, documents: list[Document]):
+    def create_index(self, **index_params):
+        """Chroma maintains the HNSW index of the collection itself."""
+        if index_params:
+            logger.warning(f"Chroma index parameters ignored: {list(index_params)}")
+
+    def retrieve_vector_store(self) -> tuple[Chroma, None]:
+        """Retrieve the vector store, chroma does not use a record manager."""
+        return self.chroma, None
+
+    def _batches(self, documents: list[Document]) -> list[list[Document]]:
+        """Documents keyed by their id, split in batches chroma accepts."""
+        keyed_docs = [
+            Document(
+                id=document_key_encoder(doc),
+                page_content=doc.page_content,
+                metadata=doc.metadata,
+            )
+            for doc in documents
+        ]
+        return [
+            keyed_docs[batch_start : batch_start + self.batch_size]
+            for batch_start in range(0, len(keyed_docs), self.batch_size)
+        ]
+
+    def index_documents(self, documents: list[Document]) -> list[str]:
         """
         Add documents to the vector store with their embeddings.
 
         This method takes a list of Document objects, generates embeddings for them
         using the embeddings model, and stores both the documents and their
-        embeddings in the PostgreSQL database.
+        embeddings in Chroma. Documents are written in batches of batch_size,
+        max_concurrent_batches at a time, and keyed by their id, so indexing a
+        document again overwrites it.
 
         Args:
-          docs: A list of LangChain Document objects to add to the vector store
+          documents: A list of LangChain Document objects to add to the vector store
                 Each Document should have page_content and metadata attributes
                 from langchain_core.documents import Document
         Returns:
-          None
+          The ids of the indexed documents
 
         Raises:
           Exception: If there's an error adding documents to the vector store
         """
         try:
             logger.info(f"Indexing {len(documents)} documents in vector store")
-            await self.chroma.aadd_documents(documents)
+            batches = self._batches(documents)
+            if not batches:
+                return []
+            with ThreadPoolExecutor(
+                max_workers=self.max_concurrent_batches
+            ) as executor:
+                written_batches = executor.map(self.chroma.add_documents, batches)
+                return [doc_id for batch in written_batches for doc_id in batch]
+        except Exception as e:
+            logger.error(f"Error indexing documents: {str(e)}")
+            raise
+
+    async def aindex_documents(self, documents: list[Document]) -> list[str]:
+        """
+        Add documents to the vector store, see index_documents.
+
+        Batches are written with aadd_documents, max_concurrent_batches at a time.
+        """
+        try:
+            logger.info(f"Indexing {len(documents)} documents in vector store")
+            semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+
+            async def add_batch(batch: list[Document]) -> list[str]:
+                async with semaphore:
+                    return await self.chroma.aadd_documents(batch)
+
+            written_batches = await asyncio.gather(
+                *(add_batch(batch) for batch in self._batches(documents))
+            )
+            return [doc_id for batch in written_batches for doc_id in batch]
         except Exception as e:
             logger.error(f"Error indexing documents: {str(e)}")
             raise
 
+    def bulk_index_documents(
+        self,
+        docs: list[Document],
+        cleanup: bool = True,
+        force_update: bool = False,
+    ) -> dict[str, int]:
+        """
+        Re-index documents of many sources in a single pass.
+
+        Only documents whose key is not indexed yet are embedded and written, then
+        the documents of the touched sources missing from docs are deleted.
+
+        Args:
+            docs: Documents of one or many sources, every document must have the
+                  source_id_key metadata.
+            cleanup: Delete indexed documents of the touched sources not in docs
+            force_update: Embed and write documents already indexed
+
+        Returns:
+            Counts of added, updated, skipped and deleted documents
+        """
+        try:
+            keyed_docs = {}
+            for doc in docs:
+                if not doc.metadata.get(self.source_id_key):
+                    raise ValueError(
+                        f"Document without '{self.source_id_key}' metadata"
+                    )
+                keyed_docs[document_key_encoder(doc)] = doc
+            sources = sorted(
+                {doc.metadata[self.source_id_key] for doc in keyed_docs.values()}
+            )
+            logger.info(
+                f"Bulk indexing {len(keyed_docs)} documents of {len(sources)} sources"
+            )
+            indexed_keys = set()
+            if sources:
+                indexed_keys = set(
+                    self._find_ids({self.source_id_key: {"$in": sources}})
+                )
+            pending_docs = [
+                doc
+                for key, doc in keyed_docs.items()
+                if force_update or key not in indexed_keys
+            ]
+            self.index_documents(pending_docs)
+            num_deleted = 0
+            if cleanup:
+                num_deleted = self._delete_ids(
+                    [key for key in indexed_keys if key not in keyed_docs]
+                )
+            num_updated = sum(
+                1 for doc in pending_docs if document_key_encoder(doc) in indexed_keys
+            )
+            return {
+                "num_added": len(pending_docs) - num_updated,
+                "num_updated": num_updated,
+                "num_skipped": len(keyed_docs) - len(pending_docs),
+                "num_deleted": num_deleted,
+            }
+        except Exception as e:
+            logger.error(f"Error bulk indexing documents: {str(e)}")
+            raise
+
+    def _build_where(self, filters: dict | None) -> dict | None:
+        """Chroma where clause of metadata equality filters."""
+        conditions = [
+            {
+                metadata_key: {"$in": list(value)}
+                if isinstance(value, (list, tuple, set))
+                else value
+            }
+            for metadata_key, value in (filters or {}).items()
+        ]
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
+
+    def _find_ids(self, where: dict) -> list[str]:
+        """Ids of the documents matching a where clause, fetched without content."""
+        return self.chroma.get(where=where, include=[])["ids"]
+
+    def _delete_ids(self, ids: list[str]) -> int:
+        """Delete documents in batches chroma accepts, returns the deleted count."""
+        for batch_start in range(0, len(ids), self.batch_size):
+            self.chroma.delete(ids[batch_start : batch_start + self.batch_size])
+        return len(ids)
+
+    def search_records(
+        self,
+        query: str,
+        k: int = 5,
+        filters: dict | None = None,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+    ) -> list[Document]:
+        """
+        Search documents by vector similarity.
+
+        Args:
+            query: The text searched
+            k: Number of documents returned
+            filters: Metadata equality filters, a list value matches any of its items
+            search_type: Only "similarity" is supported by chroma
+            fetch_k: Unused, candidates of the hybrid search
+
+        Returns:
+            The documents closest to the query
+
+        Raises:
+            ValueError: If search_type is not "similarity"
+        """
+        if search_type != "similarity":
+            raise ValueError(f"{search_type} search is not supported by chroma")
+        try:
+            return self.chroma.similarity_search(
+                query, k=k, filter=self._build_where(filters)
+            )
+        except Exception as e:
+            logger.error(f"Error searching records: {str(e)}")
+            raise
+
+    def search_records_many(
+        self,
+        queries: list[str],
+        k: int = 5,
+        filters: dict | None = None,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+    ) -> list[list[Document]]:
+        """
+        Search documents for many queries with one collection query.
+
+        The queries are embedded in batched requests, then chroma ranks every
+        query embedding in a single call.
+
+        Args:
+            queries: The texts searched
+            k: Number of documents returned per query
+            filters: Metadata equality filters shared by every query
+            search_type: Only "similarity" is supported by chroma
+            fetch_k: Unused, candidates of the hybrid search
+
+        Returns:
+            The documents closest to each query, in the order of queries
+
+        Raises:
+            ValueError: If search_type is not "similarity"
+        """
+        if search_type != "similarity":
+            raise ValueError(f"{search_type} search is not supported by chroma")
+        try:
+            if not queries:
+                return []
+            results = self.chroma._collection.query(
+                query_embeddings=embed_queries(self.embeddings_model, queries),
+                n_results=k,
+                where=self._build_where(filters),
+                include=["documents", "metadatas"],
+            )
+            return [
+                [
+                    Document(id=doc_id, page_content=content, metadata=metadata or {})
+                    for doc_id, content, metadata in zip(ids, contents, metadatas)
+                ]
+                for ids, contents, metadatas in zip(
+                    results["ids"], results["documents"], results["metadatas"]
+                )
+            ]
+        except Exception as e:
+            logger.error(f"Error searching records: {str(e)}")
+            raise
+
+    def search_candidates(
+        self, query: str, k: int = 20, filters: dict | None = None
+    ) -> tuple[np.ndarray, list[Document], np.ndarray]:
+        """
+        Search documents and return them with their stored vectors, for re-ranking.
+
+        Args:
+            query: The text searched
+            k: Number of candidates returned
+            filters: Metadata equality filters, a list value matches any of its items
+
+        Returns:
+            The query vector, the candidates best first and their vectors, one
+            row per candidate
+        """
+        try:
+            query_vector = np.asarray(
+                self.embeddings_model.embed_query(query), dtype=np.float32
+            )
+            results = self.chroma._collection.query(
+                query_embeddings=[query_vector.tolist()],
+                n_results=k,
+                where=self._build_where(filters),
+                include=["documents", "metadatas", "embeddings"],
+            )
+            documents = [
+                Document(id=doc_id, page_content=content, metadata=metadata or {})
+                for doc_id, content, metadata in zip(
+                    results["ids"][0], results["documents"][0], results["metadatas"][0]
+                )
+            ]
+            vectors = np.asarray(results["embeddings"][0], dtype=np.float32)
+            return (
+                query_vector,
+                documents,
+                vectors.reshape(len(documents), len(query_vector)),
+            )
+        except Exception as e:
+            logger.error(f"Error searching candidates: {str(e)}")
+            raise
+
     def get_documents_by_id(self, ids: list[str]):
         """
         Get document by ID from the vector store.
@@ -105,34 +383,67 @@ class ChromaEmbeddingsManager(EmbeddingsManager):
             logger.error(f"Error getting documents by ID: {str(e)}")
             raise
 
+    def retrieve_documents_by_ids(self, docs_ids: list[str]) -> list[Document]:
+        """
+        Find indexed documents by ids in the vector store.
+        """
+        if not docs_ids:
+            return []
+        return self.get_documents_by_id(docs_ids)
+
+    def retrieve_documents_by_file_name(self, file_name: str) -> list[str]:
+        """Find the ids of the documents of a file."""
+        return self.get_documents_keys_by_source_id(file_name)
+
     def delete_documents_by_id(self, ids: list[str]):
         """
         Delete documents by ID from the vector store.
         """
         try:
-            self.chroma.delete(ids)
+            self._delete_ids(ids)
         except Exception as e:
             logger.error(f"Error deleting documents by ID: {str(e)}")
             raise
 
-    async def delete_documents_by_metadata_key(
-        self, metadata_key: str, metadata_value: str
-    ):
+    def delete_documents_by_ids(self, docs_ids: list[str]) -> list[str]:
+        """Delete documents by ids from the vector store."""
+        self.delete_documents_by_id(docs_ids)
+        return docs_ids
+
+    def delete_documents_by_metadata_key(self, metadata_key: str, metadata_value: str):
         """
         Delete documents by filter from the vector store.
         """
         try:
-            await self.chroma.adelete(where={metadata_key: metadata_value})
+            self.chroma.delete(where={metadata_key: metadata_value})
         except Exception as error:
             logger.error(
-                f"Error deleting documents by filter: {str(filter)}, error: {error} "
+                f"Error deleting documents by filter: {metadata_key}={metadata_value}, "
+                f"error: {error} "
             )
             raise
 
-    def get_documents_keys_by_source_id(self, source_id: str):
+    def get_documents_keys_by_source_id(self, source_id: str) -> list[str]:
         """Get documents keys by source ID."""
-        pass
+        try:
+            return self._find_ids({self.source_id_key: source_id})
+        except Exception as e:
+            logger.error(f"Error getting documents keys by source: {str(e)}")
+            raise
 
-    def delete_documents_by_source_id(self, source_id: str):
-        """Delete documents by source ID."""
-        pass
+    def delete_documents_by_source_id(self, source_id: str) -> dict[str, int]:
+        """
+        Delete documents by source ID.
+
+        The ids of the source are read from the metadata index, then deleted in
+        batches.
+        """
+        try:
+            vectors_deleted = self._delete_ids(
+                self.get_documents_keys_by_source_id(source_id)
+            )
+            logger.info(f"Deleted {vectors_deleted} vectors of {source_id}")
+            return {"vectors_deleted": vectors_deleted, "records_deleted": 0}
+        except Exception as e:
+            logger.error(f"Error deleting documents by source: {str(e)}")
+            raise
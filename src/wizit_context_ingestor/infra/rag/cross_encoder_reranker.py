@@ -0,0 +1,89 @@
+import logging
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ...application.interfaces import Reranker
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError as e:  # pragma: no cover - depends on the deployment
+    raise ImportError(
+        "The cross encoder re-ranker needs sentence-transformers, install it with: "
+        "pip install 'wizit_context_ingestor[rerank]'"
+    ) from e
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    Re-ranker scoring (query, chunk) pairs with a local cross encoder.
+
+    The model reads the query and each chunk together, which ranks better than
+    the vector similarity but costs a forward pass per pair, so it is meant for
+    a few dozen candidates. Pairs are scored in batches, on CPU by default.
+    """
+
+    __slots__ = ("model_name", "batch_size", "max_length")
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_CROSS_ENCODER_MODEL,
+        batch_size: int = 32,
+        device: str = "cpu",
+        max_length: int = 512,
+    ):
+        """
+        Initialize the CrossEncoderReranker.
+
+        Args:
+            model_name: Hugging Face name or local path of the cross encoder
+            batch_size: Pairs scored per forward pass
+            device: Torch device running the model
+            max_length: Tokens of a pair read by the model, longer pairs are truncated
+
+        Raises:
+            ValueError: If batch_size is not positive
+        """
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        try:
+            self.model = CrossEncoder(model_name, device=device, max_length=max_length)
+            logger.info(f"Cross encoder {model_name} loaded on {device}")
+        except Exception as e:
+            logger.error(f"Failed to load cross encoder {model_name}: {str(e)}")
+            raise
+
+    def rerank(self, query: str, documents: List[Document], k: int) -> List[Document]:
+        """
+        Order documents by cross encoder score, keeping the k best.
+
+        Args:
+            query: The text searched
+            documents: Retrieved candidates
+            k: Number of documents returned
+
+        Returns:
+            The k documents scored best, best first
+        """
+        if not documents or k <= 0:
+            return []
+        try:
+            scores = self.model.predict(
+                [(query, doc.page_content) for doc in documents],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+            )
+            order = np.argsort(-np.asarray(scores), kind="stable")[:k]
+            return [documents[index] for index in order]
+        except Exception as e:
+            logger.error(f"Error re-ranking documents: {str(e)}")
+            raise
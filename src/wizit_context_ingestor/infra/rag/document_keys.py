@@ -0,0 +1,21 @@
+import hashlib
+import json
+import uuid
+
+from langchain_core.documents import Document
+
+
+def document_key_encoder(doc: Document) -> str:
+    """
+    Record manager key for a document.
+
+    Documents carrying an id (content derived chunk ids) keep it, so the record
+    manager can recognize unchanged chunks between ingestions. Documents without
+    id fall back to a hash of their content and metadata.
+    """
+    if doc.id:
+        return doc.id
+    doc_hash = hashlib.sha256(
+        (doc.page_content + json.dumps(doc.metadata, sort_keys=True)).encode("utf-8")
+    ).hexdigest()
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, doc_hash))
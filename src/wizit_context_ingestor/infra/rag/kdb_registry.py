@@ -0,0 +1,63 @@
+import logging
+from importlib import import_module
+from typing import Any, Callable
+
+from ...application.interfaces import EmbeddingsManager
+from ...data.kdb import KdbServices
+
+logger = logging.getLogger(__name__)
+
+# backends are imported on first use, so a caller only loads the store it uses
+_KDB_BACKENDS: dict[str, str | Callable[..., EmbeddingsManager]] = {
+    KdbServices.PG.value: ".pg_embeddings:PgEmbeddingsManager",
+    KdbServices.REDIS.value: ".redis_embeddings:RedisEmbeddingsManager",
+    KdbServices.CHROMA.value: ".chroma_embeddings:ChromaEmbeddingsManager",
+    KdbServices.MEMORY.value: ".memory_embeddings:InMemoryEmbeddingsManager",
+    KdbServices.LOCAL.value: ".local_embeddings:LocalHnswEmbeddingsManager",
+}
+
+
+def register_kdb_backend(
+    kdb_service: str, factory: str | Callable[..., EmbeddingsManager]
+):
+    """
+    Register an embeddings manager for a kdb service name.
+
+    Args:
+        kdb_service: Name used as kdb_service_name / kdb_service by the managers
+        factory: Callable building the embeddings manager from the embeddings model
+                 and the kdb params, or its "module:attribute" import path
+    """
+    _KDB_BACKENDS[kdb_service] = factory
+
+
+def available_kdb_backends() -> list[str]:
+    """Names of the registered kdb services."""
+    return sorted(_KDB_BACKENDS)
+
+
+def create_embeddings_manager(
+    kdb_service: str, embeddings_model, **kdb_params: Any
+) -> EmbeddingsManager:
+    """
+    Build the embeddings manager of a kdb service.
+
+    Args:
+        kdb_service: Registered kdb service name (see KdbServices)
+        embeddings_model: The embeddings model of the vector store
+        **kdb_params: Arguments of the embeddings manager
+
+    Returns:
+        The embeddings manager of the kdb service
+
+    Raises:
+        ValueError: If the kdb service is not registered
+    """
+    factory = _KDB_BACKENDS.get(kdb_service)
+    if factory is None:
+        raise ValueError(f"Unsupported kdb provider: {kdb_service}")
+    if isinstance(factory, str):
+        module_name, attribute = factory.split(":")
+        factory = getattr(import_module(module_name, __package__), attribute)
+    logger.info(f"Creating {kdb_service} embeddings manager")
+    return factory(embeddings_model, **kdb_params)
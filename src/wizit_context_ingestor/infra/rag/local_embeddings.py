@@ -0,0 +1,776 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ...application.interfaces import EmbeddingsManager
+from .document_keys import document_key_encoder
+from .query_embeddings import embed_queries
+
+try:
+    import hnswlib
+except ImportError as e:  # pragma: no cover - depends on the deployment
+    raise ImportError(
+        "The local kdb backend needs hnswlib, install it with: "
+        "pip install 'wizit_context_ingestor[local]'"
+    ) from e
+
+logger = logging.getLogger(__name__)
+
+# files of a local store, inside its index_path directory
+VECTORS_FILE = "vectors.f32"
+GRAPH_FILE = "graph.hnsw"
+SIDECAR_FILE = "documents.sqlite"
+# metadata keys are interpolated in json paths, only plain identifiers are accepted
+METADATA_KEY_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# sqlite limits the number of bound parameters of a statement
+SQLITE_MAX_PARAMS = 500
+# queries ranked exactly by one matrix product, bounds the scores matrix
+SEARCH_QUERIES_BLOCK = 64
+
+
+class _ReadWriteLock:
+    """Many concurrent readers or a single writer."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._readers)
+            yield
+
+
+def _chunked(items: list, size: int = SQLITE_MAX_PARAMS):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _placeholders(values: list) -> str:
+    return ",".join("?" * len(values))
+
+
+class LocalHnswEmbeddingsManager(EmbeddingsManager):
+    """
+    Embeddings manager storing vectors on local disk, searched with an HNSW graph.
+
+    A store is a directory holding a memory mapped file of normalized float32
+    vectors (row = label), a SQLite sidecar with the documents, their source and
+    metadata, and a snapshot of the hnswlib graph. The vectors file and the
+    sidecar are written on every change, the graph is saved by snapshot(): on
+    load the graph snapshot is caught up with the changes written after it, or
+    rebuilt from the vectors file when there is no snapshot.
+
+    Deleted labels are reused by later documents, so re-indexing sources does
+    not grow the store. Searches run concurrently, hnswlib releases the GIL, and
+    writes wait for running searches.
+    """
+
+    __slots__ = ("embeddings_model", "index_path", "source_id_key")
+
+    def __init__(
+        self,
+        embeddings_model,
+        index_path: str,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        num_threads: int = 4,
+        batch_size: int = 250,
+        source_id_key: str = "source",
+        initial_capacity: int = 1024,
+        exact_search_max_candidates: int = 20_000,
+    ):
+        """
+        Initialize the LocalHnswEmbeddingsManager, loading the store when it exists.
+
+        Args:
+            embeddings_model: The embeddings model to use for generating vector embeddings
+                              (typically a LangChain embeddings model instance)
+            index_path: Directory of the store, created when it does not exist
+            m: HNSW max connections per layer, used when the graph is created
+            ef_construction: HNSW candidate list size while building the graph
+            ef_search: HNSW candidate list size of searches, higher is slower and
+                       more accurate (at least k is always used)
+            num_threads: Threads embedding batches and adding them to the graph
+            batch_size: Texts sent to the embeddings model per call
+            source_id_key: Metadata key holding the document source
+            initial_capacity: Vectors allocated before the store first grows
+            exact_search_max_candidates: Filtered searches matching at most this
+                       many documents rank them exactly from the vectors file,
+                       larger ones search the graph with the filter
+
+        Raises:
+            Exception: If the store can not be opened
+        """
+        if min(m, ef_construction, ef_search, num_threads, batch_size) <= 0:
+            raise ValueError("HNSW, thread and batch parameters must be positive")
+        self.embeddings_model = embeddings_model
+        self.index_path = index_path
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.num_threads = num_threads
+        self.batch_size = batch_size
+        self.source_id_key = source_id_key
+        self.initial_capacity = max(initial_capacity, 1)
+        self.exact_search_max_candidates = exact_search_max_candidates
+        self._lock = _ReadWriteLock()
+        self._vectors: np.memmap | None = None
+        self._graph = None
+        try:
+            os.makedirs(index_path, exist_ok=True)
+            self.connection = sqlite3.connect(
+                os.path.join(index_path, SIDECAR_FILE), check_same_thread=False
+            )
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    label INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL UNIQUE,
+                    source TEXT,
+                    content TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    seq INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS documents_source ON documents (source);
+                CREATE INDEX IF NOT EXISTS documents_seq ON documents (seq);
+                CREATE TABLE IF NOT EXISTS free_labels (label INTEGER PRIMARY KEY);
+                CREATE TABLE IF NOT EXISTS settings (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                """
+            )
+            self.connection.commit()
+            if self._setting("dimensions") is not None:
+                self._open_store()
+            logger.info(f"LocalHnswEmbeddingsManager opened at {index_path}")
+        except Exception as e:
+            logger.error(f"Failed to initialize LocalHnswEmbeddingsManager: {str(e)}")
+            raise
+
+    def _setting(self, key: str) -> int | None:
+        row = self.connection.execute(
+            "SELECT value FROM settings WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_setting(self, key: str, value: int):
+        self.connection.execute(
+            "INSERT INTO settings (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def _map_vectors(self, capacity: int, dimensions: int):
+        vectors_path = os.path.join(self.index_path, VECTORS_FILE)
+        size = capacity * dimensions * np.dtype(np.float32).itemsize
+        with open(vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._vectors = np.memmap(
+            vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dimensions)
+        )
+
+    def _open_store(self):
+        """Map the vectors file and load the graph, caught up with the sidecar."""
+        dimensions = self._setting("dimensions")
+        capacity = self._setting("capacity")
+        self._map_vectors(capacity, dimensions)
+        self._graph = hnswlib.Index(space="cosine", dim=dimensions)
+        graph_path = os.path.join(self.index_path, GRAPH_FILE)
+        snapshot_seq = self._setting("snapshot_seq")
+        if os.path.exists(graph_path) and snapshot_seq is not None:
+            self._graph.load_index(graph_path, max_elements=capacity)
+        else:
+            self._graph.init_index(
+                max_elements=capacity, ef_construction=self.ef_construction, M=self.m
+            )
+            snapshot_seq = -1
+        self._graph.set_ef(self.ef_search)
+        self._graph.set_num_threads(self.num_threads)
+        live_labels = {
+            label for (label,) in self.connection.execute("SELECT label FROM documents")
+        }
+        for label in set(self._graph.get_ids_list()) - live_labels:
+            self._mark_deleted(label)
+        stale_labels = np.fromiter(
+            (
+                label
+                for (label,) in self.connection.execute(
+                    "SELECT label FROM documents WHERE seq > ?", (snapshot_seq,)
+                )
+            ),
+            dtype=np.int64,
+        )
+        if len(stale_labels):
+            self._graph.add_items(self._vectors[stale_labels], stale_labels)
+        logger.info(
+            f"Loaded {len(live_labels)} vectors, {len(stale_labels)} added to the graph"
+        )
+
+    def _create_store(self, dimensions: int):
+        self._set_setting("dimensions", dimensions)
+        self._set_setting("capacity", self.initial_capacity)
+        self._set_setting("next_label", 0)
+        self._set_setting("seq", 0)
+        self.connection.commit()
+        self._open_store()
+
+    def _mark_deleted(self, label: int):
+        try:
+            self._graph.mark_deleted(label)
+        except RuntimeError:
+            # already deleted
+            pass
+
+    def _reserve(self, rows: int):
+        """Grow the vectors file and the graph, doubling them, to hold rows vectors."""
+        capacity = self._setting("capacity")
+        if rows <= capacity:
+            return
+        capacity = max(capacity * 2, rows)
+        self._vectors.flush()
+        self._vectors = None
+        self._map_vectors(capacity, self._setting("dimensions"))
+        self._graph.resize_index(capacity)
+        self._set_setting("capacity", capacity)
+
+    def _take_labels(self, count: int) -> list[int]:
+        """Labels of new documents, freed labels first."""
+        labels = [
+            label
+            for (label,) in self.connection.execute(
+                "SELECT label FROM free_labels ORDER BY label LIMIT ?", (count,)
+            )
+        ]
+        for labels_batch in _chunked(labels):
+            self.connection.execute(
+                f"DELETE FROM free_labels WHERE label IN ({_placeholders(labels_batch)})",
+                labels_batch,
+            )
+        next_label = self._setting("next_label")
+        new_labels = list(range(next_label, next_label + count - len(labels)))
+        self._reserve(next_label + len(new_labels))
+        self._set_setting("next_label", next_label + len(new_labels))
+        return labels + new_labels
+
+    def _embed_documents(self, texts: list[str]) -> np.ndarray:
+        batches = [
+            texts[batch_start : batch_start + self.batch_size]
+            for batch_start in range(0, len(texts), self.batch_size)
+        ]
+        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+            embedded_batches = executor.map(
+                self.embeddings_model.embed_documents, batches
+            )
+            embeddings = [
+                embedding for batch in embedded_batches for embedding in batch
+            ]
+        return self._normalize(np.asarray(embeddings, dtype=np.float32))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _labels_of_ids(self, docs_ids: list[str]) -> dict[str, int]:
+        labels = {}
+        for ids_batch in _chunked(list(docs_ids)):
+            labels.update(
+                self.connection.execute(
+                    f"SELECT id, label FROM documents WHERE id IN ({_placeholders(ids_batch)})",
+                    ids_batch,
+                ).fetchall()
+            )
+        return labels
+
+    def _write(self, keyed_docs: list[tuple[str, Document]]):
+        """Embed documents and write them, documents already stored keep their label."""
+        if not keyed_docs:
+            return
+        # a document listed twice is written once, with its last version
+        keyed_docs = list(dict(keyed_docs).items())
+        vectors = self._embed_documents([doc.page_content for _, doc in keyed_docs])
+        with self._lock.write():
+            if self._vectors is None:
+                self._create_store(vectors.shape[1])
+            elif vectors.shape[1] != self._vectors.shape[1]:
+                raise ValueError(
+                    f"Embeddings of {vectors.shape[1]} dimensions added to a store "
+                    f"of {self._vectors.shape[1]} dimensions"
+                )
+            try:
+                stored_labels = self._labels_of_ids([key for key, _ in keyed_docs])
+                new_labels = iter(
+                    self._take_labels(
+                        sum(1 for key, _ in keyed_docs if key not in stored_labels)
+                    )
+                )
+                labels = np.array(
+                    [
+                        stored_labels[key] if key in stored_labels else next(new_labels)
+                        for key, _ in keyed_docs
+                    ],
+                    dtype=np.int64,
+                )
+                seq = self._setting("seq") + 1
+                self._set_setting("seq", seq)
+                self.connection.executemany(
+                    "INSERT INTO documents (label, id, source, content, metadata, seq) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (label) DO UPDATE SET "
+                    "id = excluded.id, source = excluded.source, "
+                    "content = excluded.content, metadata = excluded.metadata, "
+                    "seq = excluded.seq",
+                    [
+                        (
+                            int(label),
+                            key,
+                            doc.metadata.get(self.source_id_key),
+                            doc.page_content,
+                            json.dumps(doc.metadata),
+                            seq,
+                        )
+                        for label, (key, doc) in zip(labels, keyed_docs)
+                    ],
+                )
+                self._vectors[labels] = vectors
+                self._vectors.flush()
+                self._graph.add_items(vectors, labels, num_threads=self.num_threads)
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+
+    def _remove(self, labels: list[int]) -> int:
+        """Delete documents by label, their labels are freed for new documents."""
+        if not labels:
+            return 0
+        with self._lock.write():
+            try:
+                for labels_batch in _chunked(labels):
+                    self.connection.execute(
+                        f"DELETE FROM documents WHERE label IN ({_placeholders(labels_batch)})",
+                        labels_batch,
+                    )
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO free_labels (label) VALUES (?)",
+                    [(label,) for label in labels],
+                )
+                for label in labels:
+                    self._mark_deleted(label)
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+        return len(labels)
+
+    def _source_labels(self, sources: list[str]) -> dict[str, int]:
+        labels = {}
+        for sources_batch in _chunked(sources):
+            labels.update(
+                self.connection.execute(
+                    f"SELECT id, label FROM documents WHERE source IN ({_placeholders(sources_batch)})",
+                    sources_batch,
+                ).fetchall()
+            )
+        return labels
+
+    def _filtered_labels(self, filters: dict) -> list[int]:
+        """Labels of the documents matching metadata equality filters."""
+        conditions = []
+        params = []
+        for metadata_key, value in filters.items():
+            if not METADATA_KEY_PATTERN.match(metadata_key):
+                raise ValueError(f"Invalid metadata filter key: {metadata_key}")
+            column = (
+                "source"
+                if metadata_key == self.source_id_key
+                else f"json_extract(metadata, '$.{metadata_key}')"
+            )
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            conditions.append(f"{column} IN ({_placeholders(values)})")
+            params += values
+        return [
+            label
+            for (label,) in self.connection.execute(
+                f"SELECT label FROM documents WHERE {' AND '.join(conditions)}", params
+            )
+        ]
+
+    def _documents_by_labels(self, labels: list[int]) -> list[Document]:
+        """Documents of labels, in the order of labels."""
+        rows = self._documents_of_labels(labels)
+        return [rows[label] for label in labels if label in rows]
+
+    def _documents_of_labels(self, labels: list[int]) -> dict[int, Document]:
+        """Documents of labels, by label."""
+        rows = {}
+        for labels_batch in _chunked(labels):
+            for label, doc_id, content, metadata in self.connection.execute(
+                "SELECT label, id, content, metadata FROM documents "
+                f"WHERE label IN ({_placeholders(labels_batch)})",
+                labels_batch,
+            ):
+                rows[label] = Document(
+                    id=doc_id, page_content=content, metadata=json.loads(metadata)
+                )
+        return rows
+
+    def configure_vector_store(self):
+        """Configure the vector store, the store is created by the first documents."""
+        pass
+
+    def create_index(self, **index_params):
+        """The HNSW graph is built incrementally, m and ef_construction are set on init."""
+        if index_params:
+            logger.warning(f"Local index parameters ignored: {list(index_params)}")
+
+    def retrieve_vector_store(self) -> tuple["LocalHnswEmbeddingsManager", None]:
+        """Retrieve the vector store, the manager holds the vectors itself."""
+        return self, None
+
+    def snapshot(self):
+        """Save the HNSW graph, so loading the store does not rebuild it."""
+        with self._lock.write():
+            if self._graph is None:
+                return
+            graph_path = os.path.join(self.index_path, GRAPH_FILE)
+            self._graph.save_index(f"{graph_path}.tmp")
+            os.replace(f"{graph_path}.tmp", graph_path)
+            self._set_setting("snapshot_seq", self._setting("seq"))
+            self.connection.commit()
+            logger.info(f"Snapshot of {self._graph.get_current_count()} vectors saved")
+
+    def close(self):
+        """Snapshot the graph and close the store."""
+        self.snapshot()
+        with self._lock.write():
+            if self._vectors is not None:
+                self._vectors.flush()
+            self.connection.close()
+
+    def index_documents(self, docs: list[Document]) -> list[str]:
+        """
+        Add documents to the vector store with their embeddings.
+
+        Documents are keyed by their id, indexing a document again overwrites it.
+
+        Args:
+          docs: A list of LangChain Document objects to add to the vector store
+        Returns:
+          The ids of the indexed documents
+
+        Raises:
+          Exception: If there's an error adding documents to the vector store
+        """
+        try:
+            logger.info(f"Indexing {len(docs)} documents in vector store")
+            keyed_docs = [(document_key_encoder(doc), doc) for doc in docs]
+            self._write(keyed_docs)
+            return [key for key, _ in keyed_docs]
+        except Exception as e:
+            logger.error(f"Error indexing documents: {str(e)}")
+            raise
+
+    def bulk_index_documents(
+        self,
+        docs: list[Document],
+        cleanup: bool = True,
+        force_update: bool = False,
+    ) -> dict[str, int]:
+        """
+        Re-index documents of many sources in a single pass.
+
+        Only documents whose key is not indexed yet are embedded and written, then
+        the documents of the touched sources missing from docs are deleted.
+
+        Args:
+            docs: Documents of one or many sources, every document must have the
+                  source_id_key metadata.
+            cleanup: Delete indexed documents of the touched sources not in docs
+            force_update: Embed and write documents already indexed
+
+        Returns:
+            Counts of added, updated, skipped and deleted documents
+        """
+        try:
+            keyed_docs = {}
+            for doc in docs:
+                if not doc.metadata.get(self.source_id_key):
+                    raise ValueError(
+                        f"Document without '{self.source_id_key}' metadata"
+                    )
+                keyed_docs[document_key_encoder(doc)] = doc
+            sources = sorted(
+                {doc.metadata[self.source_id_key] for doc in keyed_docs.values()}
+            )
+            logger.info(
+                f"Bulk indexing {len(keyed_docs)} documents of {len(sources)} sources"
+            )
+            indexed_labels = self._source_labels(sources)
+            pending_docs = [
+                (key, doc)
+                for key, doc in keyed_docs.items()
+                if force_update or key not in indexed_labels
+            ]
+            self._write(pending_docs)
+            num_deleted = 0
+            if cleanup:
+                num_deleted = self._remove(
+                    [
+                        label
+                        for key, label in indexed_labels.items()
+                        if key not in keyed_docs
+                    ]
+                )
+            num_updated = sum(1 for key, _ in pending_docs if key in indexed_labels)
+            return {
+                "num_added": len(pending_docs) - num_updated,
+                "num_updated": num_updated,
+                "num_skipped": len(keyed_docs) - len(pending_docs),
+                "num_deleted": num_deleted,
+            }
+        except Exception as e:
+            logger.error(f"Error bulk indexing documents: {str(e)}")
+            raise
+
+    def search_records(
+        self,
+        query: str,
+        k: int = 5,
+        filters: dict | None = None,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+    ) -> list[Document]:
+        """
+        Search documents by cosine similarity.
+
+        Unfiltered searches use the HNSW graph. Filtered searches matching at most
+        exact_search_max_candidates documents rank them exactly from the vectors
+        file, larger ones search the graph restricted to the matching labels.
+
+        Args:
+            query: The text searched
+            k: Number of documents returned
+            filters: Metadata equality filters, a list value matches any of its items
+            search_type: Only "similarity" is supported by the local store
+            fetch_k: Unused, candidates of the hybrid search
+
+        Returns:
+            The documents closest to the query
+
+        Raises:
+            ValueError: If search_type is not "similarity"
+        """
+        return self.search_records_many(
+            [query], k=k, filters=filters, search_type=search_type, fetch_k=fetch_k
+        )[0]
+
+    def search_records_many(
+        self,
+        queries: list[str],
+        k: int = 5,
+        filters: dict | None = None,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+    ) -> list[list[Document]]:
+        """
+        Search documents for many queries, embedded in batched requests.
+
+        Unfiltered queries are searched in the graph on num_threads threads, the
+        filter of filtered searches is resolved once for every query, and the
+        documents found are read from the sidecar in one pass.
+
+        Args:
+            queries: The texts searched
+            k: Number of documents returned per query
+            filters: Metadata equality filters shared by every query
+            search_type: Only "similarity" is supported by the local store
+            fetch_k: Unused, candidates of the hybrid search
+
+        Returns:
+            The documents closest to each query, in the order of queries
+
+        Raises:
+            ValueError: If search_type is not "similarity"
+        """
+        if search_type != "similarity":
+            raise ValueError(
+                f"{search_type} search is not supported by the local store"
+            )
+        try:
+            if not queries:
+                return []
+            query_vectors = self._normalize(
+                np.asarray(
+                    embed_queries(self.embeddings_model, queries), dtype=np.float32
+                )
+            )
+            with self._lock.read():
+                if self._graph is None or k <= 0:
+                    return [[] for _ in queries]
+                if filters:
+                    labels = self._filtered_search(query_vectors, k, filters)
+                else:
+                    labels = self._unfiltered_search(query_vectors, k)
+                documents = self._documents_of_labels(
+                    list({label for row in labels for label in row})
+                )
+                return [
+                    [documents[label] for label in row if label in documents]
+                    for row in labels
+                ]
+        except Exception as e:
+            logger.error(f"Error searching records: {str(e)}")
+            raise
+
+    def search_candidates(
+        self, query: str, k: int = 20, filters: dict | None = None
+    ) -> tuple[np.ndarray, list[Document], np.ndarray]:
+        """
+        Search documents and return them with their vectors, for re-ranking.
+
+        Args:
+            query: The text searched
+            k: Number of candidates returned
+            filters: Metadata equality filters, a list value matches any of its items
+
+        Returns:
+            The normalized query vector, the candidates best first and their
+            normalized vectors, one row per candidate
+        """
+        try:
+            query_vector = self._normalize(
+                np.asarray(self.embeddings_model.embed_query(query), dtype=np.float32)
+            )
+            with self._lock.read():
+                if self._graph is None or k <= 0:
+                    return query_vector, [], np.empty((0, len(query_vector)))
+                if filters:
+                    (labels,) = self._filtered_search(
+                        query_vector[np.newaxis], k, filters
+                    )
+                else:
+                    (labels,) = self._unfiltered_search(query_vector[np.newaxis], k)
+                documents = self._documents_of_labels(labels)
+                labels = [label for label in labels if label in documents]
+                return (
+                    query_vector,
+                    [documents[label] for label in labels],
+                    np.array(self._vectors[np.asarray(labels, dtype=np.int64)]),
+                )
+        except Exception as e:
+            logger.error(f"Error searching candidates: {str(e)}")
+            raise
+
+    def _graph_search(
+        self, query_vectors: np.ndarray, k: int, filter=None
+    ) -> list[list[int]]:
+        if k <= 0:
+            return [[] for _ in query_vectors]
+        # a python filter is called under the GIL, threads would only contend
+        num_threads = 1 if filter is not None else self.num_threads
+        labels, _ = self._graph.knn_query(
+            query_vectors, k=k, num_threads=num_threads, filter=filter
+        )
+        return [[int(label) for label in row] for row in labels]
+
+    def _unfiltered_search(self, query_vectors: np.ndarray, k: int):
+        count = self.connection.execute("SELECT count(*) FROM documents").fetchone()[0]
+        try:
+            return self._graph_search(query_vectors, min(k, count))
+        except RuntimeError:
+            # the graph search found fewer than k live documents, rank them exactly
+            labels = [
+                label
+                for (label,) in self.connection.execute("SELECT label FROM documents")
+            ]
+            return self._exact_search(query_vectors, k, labels)
+
+    def _filtered_search(self, query_vectors: np.ndarray, k: int, filters: dict):
+        labels = self._filtered_labels(filters)
+        if len(labels) > self.exact_search_max_candidates:
+            label_set = set(labels)
+            try:
+                return self._graph_search(
+                    query_vectors, min(k, len(labels)), label_set.__contains__
+                )
+            except RuntimeError:
+                # the graph search found fewer than k matches, rank them exactly
+                pass
+        return self._exact_search(query_vectors, k, labels)
+
+    def _exact_search(
+        self, query_vectors: np.ndarray, k: int, labels: list[int]
+    ) -> list[list[int]]:
+        if not labels:
+            return [[] for _ in query_vectors]
+        labels = np.asarray(labels, dtype=np.int64)
+        candidates = self._vectors[labels]
+        found = []
+        for block_start in range(0, len(query_vectors), SEARCH_QUERIES_BLOCK):
+            block = query_vectors[block_start : block_start + SEARCH_QUERIES_BLOCK]
+            for scores in (candidates @ block.T).T:
+                if k < len(labels):
+                    top = np.argpartition(-scores, k - 1)[:k]
+                else:
+                    top = np.arange(len(labels))
+                top = top[np.argsort(-scores[top], kind="stable")]
+                found.append([int(labels[index]) for index in top])
+        return found
+
+    def retrieve_documents_by_ids(self, docs_ids: list[str]) -> list[Document]:
+        """Find indexed documents by ids in the vector store."""
+        labels = self._labels_of_ids(docs_ids)
+        return self._documents_by_labels(
+            [labels[doc_id] for doc_id in docs_ids if doc_id in labels]
+        )
+
+    def retrieve_documents_by_file_name(self, file_name: str) -> list[str]:
+        """Find the ids of the documents of a file."""
+        return self.get_documents_keys_by_source_id(file_name)
+
+    def get_documents_keys_by_source_id(self, source_id: str) -> list[str]:
+        """Get documents keys by source ID."""
+        return sorted(self._source_labels([source_id]))
+
+    def delete_documents_by_ids(self, docs_ids: list[str]) -> list[str]:
+        """Delete documents by ids from the vector store."""
+        self._remove(list(self._labels_of_ids(docs_ids).values()))
+        return docs_ids
+
+    def delete_documents_by_source_id(self, source_id: str) -> dict[str, int]:
+        """Delete documents by source ID."""
+        try:
+            vectors_deleted = self._remove(
+                list(self._source_labels([source_id]).values())
+            )
+            logger.info(f"Deleted {vectors_deleted} vectors of {source_id}")
+            return {"vectors_deleted": vectors_deleted, "records_deleted": 0}
+        except Exception as e:
+            logger.error(f"Error deleting documents by source: {str(e)}")
+            raise
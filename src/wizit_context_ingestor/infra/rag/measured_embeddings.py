@@ -0,0 +1,41 @@
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from ...utils.metrics_utils import MetricsRecorder
+
+
+class MeasuredEmbeddings(Embeddings):
+    """
+    Embeddings adding the time of every embedding call to the embed stage of
+    the metrics of a document.
+    """
+
+    __slots__ = ("embeddings", "metrics_recorder")
+
+    def __init__(self, embeddings: Embeddings, metrics_recorder: MetricsRecorder):
+        """
+        Initialize the MeasuredEmbeddings.
+
+        Args:
+            embeddings: The embeddings model computing the vectors
+            metrics_recorder: Recorder of the document being processed
+        """
+        self.embeddings = embeddings
+        self.metrics_recorder = metrics_recorder
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self.metrics_recorder.measure("embed"):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self.metrics_recorder.measure("embed"):
+            return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self.metrics_recorder.measure("embed"):
+            return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        with self.metrics_recorder.measure("embed"):
+            return await self.embeddings.aembed_query(text)
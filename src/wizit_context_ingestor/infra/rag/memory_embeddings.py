@@ -0,0 +1,446 @@
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ...application.interfaces import EmbeddingsManager
+from .document_keys import document_key_encoder
+from .query_embeddings import embed_queries
+
+logger = logging.getLogger(__name__)
+
+# metadata values of these types are indexed for filters and source lookups
+INDEXED_METADATA_TYPES = (str, int, float, bool)
+# queries scored by one matrix product, bounds the scores matrix of big stores
+SEARCH_QUERIES_BLOCK = 64
+
+
+class InMemoryEmbeddingsManager(EmbeddingsManager):
+    """
+    Embeddings manager keeping documents and vectors in process memory.
+
+    Vectors are normalized float32 rows of one matrix, a search is a single matrix
+    vector product ranked by cosine similarity, so results are exact. Metadata
+    values are kept in inverted indexes: filters and deletes by source only touch
+    the matching rows. Nothing is persisted, the store is meant for local runs,
+    tests and benchmarks without Postgres, Redis or Chroma.
+    """
+
+    __slots__ = ("embeddings_model", "batch_size", "source_id_key")
+
+    def __init__(
+        self,
+        embeddings_model,
+        batch_size: int = 250,
+        max_concurrent_embeddings: int = 4,
+        source_id_key: str = "source",
+        initial_capacity: int = 1024,
+    ):
+        """
+        Initialize the InMemoryEmbeddingsManager.
+        Args:
+            embeddings_model: The embeddings model to use for generating vector embeddings
+                              (typically a LangChain embeddings model instance)
+            batch_size: Texts sent to the embeddings model per call
+            max_concurrent_embeddings: Embeddings calls in flight at the same time
+            source_id_key: Metadata key holding the document source
+            initial_capacity: Vectors allocated before the matrix first grows
+        """
+        if batch_size <= 0 or max_concurrent_embeddings <= 0:
+            raise ValueError(
+                "batch_size and max_concurrent_embeddings must be positive"
+            )
+        self.embeddings_model = embeddings_model
+        self.batch_size = batch_size
+        self.max_concurrent_embeddings = max_concurrent_embeddings
+        self.source_id_key = source_id_key
+        self.initial_capacity = max(initial_capacity, 1)
+        self._lock = threading.RLock()
+        self._vectors: np.ndarray | None = None
+        self._ids: list[str] = []
+        self._documents: list[Document] = []
+        self._rows: dict[str, int] = {}
+        self._metadata_index: dict[str, dict] = defaultdict(lambda: defaultdict(set))
+        logger.info("InMemoryEmbeddingsManager initialized")
+
+    def configure_vector_store(self):
+        """Configure the vector store, the in memory store needs no setup."""
+        pass
+
+    def create_index(self, **index_params):
+        """Searches are exact, the in memory store has no vector index."""
+        if index_params:
+            logger.warning(f"In memory index parameters ignored: {list(index_params)}")
+
+    def retrieve_vector_store(self) -> tuple["InMemoryEmbeddingsManager", None]:
+        """Retrieve the vector store, the manager holds the vectors itself."""
+        return self, None
+
+    def _embed_documents(self, texts: list[str]) -> np.ndarray:
+        batches = [
+            texts[batch_start : batch_start + self.batch_size]
+            for batch_start in range(0, len(texts), self.batch_size)
+        ]
+        if not batches:
+            return np.empty((0, 0), dtype=np.float32)
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_embeddings) as executor:
+            embedded_batches = executor.map(
+                self.embeddings_model.embed_documents, batches
+            )
+            embeddings = [
+                embedding for batch in embedded_batches for embedding in batch
+            ]
+        return self._normalize(np.asarray(embeddings, dtype=np.float32))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _reserve(self, rows: int, dimensions: int):
+        """Grow the vectors matrix, doubling its capacity, to hold rows vectors."""
+        if self._vectors is None:
+            capacity = max(self.initial_capacity, rows)
+            self._vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        elif self._vectors.shape[1] != dimensions:
+            raise ValueError(
+                f"Embeddings of {dimensions} dimensions added to a store of "
+                f"{self._vectors.shape[1]} dimensions"
+            )
+        elif rows > self._vectors.shape[0]:
+            capacity = max(self._vectors.shape[0] * 2, rows)
+            vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+            vectors[: len(self._ids)] = self._vectors[: len(self._ids)]
+            self._vectors = vectors
+
+    def _index_metadata(self, doc_id: str, metadata: dict, add: bool = True):
+        for metadata_key, value in metadata.items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            for item in values:
+                if not isinstance(item, INDEXED_METADATA_TYPES):
+                    continue
+                ids = self._metadata_index[metadata_key][item]
+                if add:
+                    ids.add(doc_id)
+                else:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del self._metadata_index[metadata_key][item]
+
+    def _upsert(self, keyed_docs: list[tuple[str, Document]], vectors: np.ndarray):
+        with self._lock:
+            new_keys = {key for key, _ in keyed_docs if key not in self._rows}
+            self._reserve(len(self._ids) + len(new_keys), vectors.shape[1])
+            for (key, doc), vector in zip(keyed_docs, vectors):
+                row = self._rows.get(key)
+                if row is None:
+                    row = len(self._ids)
+                    self._rows[key] = row
+                    self._ids.append(key)
+                    self._documents.append(doc)
+                else:
+                    self._index_metadata(key, self._documents[row].metadata, add=False)
+                    self._documents[row] = doc
+                self._vectors[row] = vector
+                self._index_metadata(key, doc.metadata)
+
+    def _remove(self, ids: list[str]) -> int:
+        """Remove documents, the last row fills each freed row."""
+        removed = 0
+        with self._lock:
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is None:
+                    continue
+                self._index_metadata(doc_id, self._documents[row].metadata, add=False)
+                last_row = len(self._ids) - 1
+                if row != last_row:
+                    self._vectors[row] = self._vectors[last_row]
+                    self._ids[row] = self._ids[last_row]
+                    self._documents[row] = self._documents[last_row]
+                    self._rows[self._ids[row]] = row
+                self._ids.pop()
+                self._documents.pop()
+                removed += 1
+        return removed
+
+    def _find_ids(self, filters: dict) -> set[str]:
+        """Ids of the documents matching all filters, a list matches any item."""
+        matching_ids = None
+        for metadata_key, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            key_index = self._metadata_index.get(metadata_key, {})
+            key_ids = set().union(*(key_index.get(item, ()) for item in values))
+            matching_ids = key_ids if matching_ids is None else matching_ids & key_ids
+            if not matching_ids:
+                break
+        return matching_ids or set()
+
+    def _to_document(self, row: int) -> Document:
+        doc = self._documents[row]
+        return Document(
+            id=self._ids[row],
+            page_content=doc.page_content,
+            metadata=dict(doc.metadata),
+        )
+
+    def index_documents(self, docs: list[Document]) -> list[str]:
+        """
+        Add documents to the vector store with their embeddings.
+
+        Documents are keyed by their id, indexing a document again overwrites it.
+
+        Args:
+          docs: A list of LangChain Document objects to add to the vector store
+        Returns:
+          The ids of the indexed documents
+
+        Raises:
+          Exception: If there's an error adding documents to the vector store
+        """
+        try:
+            logger.info(f"Indexing {len(docs)} documents in vector store")
+            keyed_docs = [(document_key_encoder(doc), doc) for doc in docs]
+            if not keyed_docs:
+                return []
+            vectors = self._embed_documents([doc.page_content for doc in docs])
+            self._upsert(keyed_docs, vectors)
+            return [key for key, _ in keyed_docs]
+        except Exception as e:
+            logger.error(f"Error indexing documents: {str(e)}")
+            raise
+
+    def bulk_index_documents(
+        self,
+        docs: list[Document],
+        cleanup: bool = True,
+        force_update: bool = False,
+    ) -> dict[str, int]:
+        """
+        Re-index documents of many sources in a single pass.
+
+        Only documents whose key is not indexed yet are embedded and written, then
+        the documents of the touched sources missing from docs are deleted.
+
+        Args:
+            docs: Documents of one or many sources, every document must have the
+                  source_id_key metadata.
+            cleanup: Delete indexed documents of the touched sources not in docs
+            force_update: Embed and write documents already indexed
+
+        Returns:
+            Counts of added, updated, skipped and deleted documents
+        """
+        try:
+            keyed_docs = {}
+            for doc in docs:
+                if not doc.metadata.get(self.source_id_key):
+                    raise ValueError(
+                        f"Document without '{self.source_id_key}' metadata"
+                    )
+                keyed_docs[document_key_encoder(doc)] = doc
+            sources = {doc.metadata[self.source_id_key] for doc in keyed_docs.values()}
+            logger.info(
+                f"Bulk indexing {len(keyed_docs)} documents of {len(sources)} sources"
+            )
+            with self._lock:
+                indexed_keys = self._find_ids({self.source_id_key: list(sources)})
+            pending_docs = [
+                (key, doc)
+                for key, doc in keyed_docs.items()
+                if force_update or key not in indexed_keys
+            ]
+            if pending_docs:
+                vectors = self._embed_documents(
+                    [doc.page_content for _, doc in pending_docs]
+                )
+                self._upsert(pending_docs, vectors)
+            num_deleted = 0
+            if cleanup:
+                num_deleted = self._remove(
+                    [key for key in indexed_keys if key not in keyed_docs]
+                )
+            num_updated = sum(1 for key, _ in pending_docs if key in indexed_keys)
+            return {
+                "num_added": len(pending_docs) - num_updated,
+                "num_updated": num_updated,
+                "num_skipped": len(keyed_docs) - len(pending_docs),
+                "num_deleted": num_deleted,
+            }
+        except Exception as e:
+            logger.error(f"Error bulk indexing documents: {str(e)}")
+            raise
+
+    def search_records(
+        self,
+        query: str,
+        k: int = 5,
+        filters: dict | None = None,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+    ) -> list[Document]:
+        """
+        Search documents by cosine similarity, exactly.
+
+        Args:
+            query: The text searched
+            k: Number of documents returned
+            filters: Metadata equality filters, a list value matches any of its items
+            search_type: Only "similarity" is supported by the in memory store
+            fetch_k: Unused, candidates of the hybrid search
+
+        Returns:
+            The documents closest to the query
+
+        Raises:
+            ValueError: If search_type is not "similarity"
+        """
+        return self.search_records_many(
+            [query], k=k, filters=filters, search_type=search_type, fetch_k=fetch_k
+        )[0]
+
+    def search_records_many(
+        self,
+        queries: list[str],
+        k: int = 5,
+        filters: dict | None = None,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+    ) -> list[list[Document]]:
+        """
+        Search documents for many queries, embedded in batched requests.
+
+        The candidate rows are scored against a block of queries with one matrix
+        product instead of a matrix vector product per query.
+
+        Args:
+            queries: The texts searched
+            k: Number of documents returned per query
+            filters: Metadata equality filters shared by every query
+            search_type: Only "similarity" is supported by the in memory store
+            fetch_k: Unused, candidates of the hybrid search
+
+        Returns:
+            The documents closest to each query, in the order of queries
+
+        Raises:
+            ValueError: If search_type is not "similarity"
+        """
+        if search_type != "similarity":
+            raise ValueError(
+                f"{search_type} search is not supported by the in memory store"
+            )
+        try:
+            if not queries:
+                return []
+            query_vectors = self._normalize(
+                np.asarray(
+                    embed_queries(self.embeddings_model, queries), dtype=np.float32
+                )
+            )
+            with self._lock:
+                return [
+                    [self._to_document(int(row)) for row in rows]
+                    for rows in self._top_rows(query_vectors, k, filters)
+                ]
+        except Exception as e:
+            logger.error(f"Error searching records: {str(e)}")
+            raise
+
+    def search_candidates(
+        self, query: str, k: int = 20, filters: dict | None = None
+    ) -> tuple[np.ndarray, list[Document], np.ndarray]:
+        """
+        Search documents and return them with their vectors, for re-ranking.
+
+        Args:
+            query: The text searched
+            k: Number of candidates returned
+            filters: Metadata equality filters, a list value matches any of its items
+
+        Returns:
+            The normalized query vector, the candidates best first and their
+            normalized vectors, one row per candidate
+        """
+        try:
+            query_vector = self._normalize(
+                np.asarray(self.embeddings_model.embed_query(query), dtype=np.float32)
+            )
+            with self._lock:
+                (rows,) = self._top_rows(query_vector[np.newaxis], k, filters)
+                if not len(rows):
+                    return query_vector, [], np.empty((0, len(query_vector)))
+                return (
+                    query_vector,
+                    [self._to_document(int(row)) for row in rows],
+                    self._vectors[rows],
+                )
+        except Exception as e:
+            logger.error(f"Error searching candidates: {str(e)}")
+            raise
+
+    def _top_rows(
+        self, query_vectors: np.ndarray, k: int, filters: dict | None
+    ) -> list[np.ndarray]:
+        """Rows of the k best matches of every query, best first, under the lock."""
+        if filters:
+            rows = np.fromiter(
+                (self._rows[doc_id] for doc_id in self._find_ids(filters)),
+                dtype=np.int64,
+            )
+            candidates = self._vectors[rows] if len(rows) else None
+        else:
+            rows = np.arange(len(self._ids))
+            # a slice is a view, indexing every row would copy the matrix
+            candidates = self._vectors[: len(self._ids)]
+        if k <= 0 or not len(rows):
+            return [rows[:0] for _ in query_vectors]
+        found = []
+        for block_start in range(0, len(query_vectors), SEARCH_QUERIES_BLOCK):
+            block = query_vectors[block_start : block_start + SEARCH_QUERIES_BLOCK]
+            for scores in (candidates @ block.T).T:
+                if k < len(rows):
+                    top = np.argpartition(-scores, k - 1)[:k]
+                else:
+                    top = np.arange(len(rows))
+                found.append(rows[top[np.argsort(-scores[top], kind="stable")]])
+        return found
+
+    def retrieve_documents_by_ids(self, docs_ids: list[str]) -> list[Document]:
+        """Find indexed documents by ids in the vector store."""
+        with self._lock:
+            return [
+                self._to_document(self._rows[doc_id])
+                for doc_id in docs_ids
+                if doc_id in self._rows
+            ]
+
+    def retrieve_documents_by_file_name(self, file_name: str) -> list[str]:
+        """Find the ids of the documents of a file."""
+        return self.get_documents_keys_by_source_id(file_name)
+
+    def get_documents_keys_by_source_id(self, source_id: str) -> list[str]:
+        """Get documents keys by source ID."""
+        with self._lock:
+            return sorted(self._find_ids({self.source_id_key: source_id}))
+
+    def delete_documents_by_ids(self, docs_ids: list[str]) -> list[str]:
+        """Delete documents by ids from the vector store."""
+        self._remove(docs_ids)
+        return docs_ids
+
+    def delete_documents_by_source_id(self, source_id: str) -> dict[str, int]:
+        """Delete documents by source ID."""
+        try:
+            with self._lock:
+                vectors_deleted = self._remove(
+                    list(self._find_ids({self.source_id_key: source_id}))
+                )
+            logger.info(f"Deleted {vectors_deleted} vectors of {source_id}")
+            return {"vectors_deleted": vectors_deleted, "records_deleted": 0}
+        except Exception as e:
+            logger.error(f"Error deleting documents by source: {str(e)}")
+            raise
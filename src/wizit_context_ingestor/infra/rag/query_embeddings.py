@@ -0,0 +1,33 @@
+import inspect
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embed many search queries with as few embedding requests as possible.
+
+    Langchain embeddings only embed documents in batches, and document
+    embeddings use another task type than query embeddings. Models exposing
+    embed_queries, or embed with a task type (VertexAIEmbeddings), embed the
+    queries in batched requests, other models embed them one by one.
+
+    Args:
+        embeddings: The embeddings model of the vector store
+        texts: The queries
+
+    Returns:
+        The query vectors, in the order of texts
+    """
+    if not texts:
+        return []
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    embed = getattr(embeddings, "embed", None)
+    if (
+        embed is not None
+        and "embeddings_task_type" in inspect.signature(embed).parameters
+    ):
+        return embed(texts, embeddings_task_type="RETRIEVAL_QUERY")
+    return [embeddings.embed_query(text) for text in texts]
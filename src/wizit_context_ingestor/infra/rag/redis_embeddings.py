@@ -1,22 +1,45 @@
 import logging
 from typing import List
 
+import numpy as np
 from langchain_core.documents import Document
 from langchain_redis import RedisConfig, RedisVectorStore
+from redis.commands.search.aggregation import AggregateRequest
+from redisvl.query.filter import FilterExpression, Num, Tag, Text
 
 # from dotenv import load_dotenv
 from ...application.interfaces import EmbeddingsManager
+from .document_keys import document_key_encoder
+from .query_embeddings import embed_queries
 
 # load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# documents embedded and written per pipeline round trip
+DEFAULT_BATCH_SIZE = 500
+
 
 class RedisEmbeddingsManager(EmbeddingsManager):
-    __slots__ = ("embeddings_model", "redis_conn_string", "metadata_tags")
+    __slots__ = (
+        "embeddings_model",
+        "redis_conn_string",
+        "metadata_tags",
+        "index_name",
+        "batch_size",
+        "source_id_key",
+    )
 
     def __init__(
-        self, embeddings_model, redis_conn_string: str, metadata_tags: List[str] = []
+        self,
+        embeddings_model,
+        redis_conn_string: str | None = None,
+        metadata_tags: List[str] = [],
+        index_name: str = "vector_store",
+        key_prefix: str | None = None,
+        redis_client=None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        source_id_key: str = "source",
     ):
         """
         Initialize the RedisEmbeddingsManager.
@@ -26,52 +49,85 @@ class RedisEmbeddingsManager(EmbeddingsManager):
             redis_conn_string: The Redis connection string
                           (format: redis://<host>:<port>)
             metadata_tags: Tags to add as metadata to redis vector store
+            index_name: Name of the search index, use one index per tenant
+                        (e.g. "vector_store_<tenant>") to keep tenants apart
+            key_prefix: Prefix of the documents keys, defaults to index_name
+            redis_client: Redis client used instead of redis_conn_string
+                          (e.g. a shared connection pool)
+            batch_size: Documents embedded and written per pipeline round trip
+            source_id_key: Metadata key holding the document source, indexed as a
+                           tag so deletes and filters by source only touch matches
 
         Raises:
             Exception: If there's an error initializing the RedisEmbeddingsManager
         """
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
         self.redis_conn_string = redis_conn_string
         self.embeddings_model = embeddings_model
-        self.metadata_tags_schema = [{"type": "text", "name": "context"}]
+        self.index_name = index_name
+        self.batch_size = batch_size
+        self.source_id_key = source_id_key
+        # indexes created before the source tag existed must be re-created
+        # (or replaced by a new index_name) to delete and filter by source
+        self.metadata_tags_schema = [
+            {"type": "text", "name": "context"},
+            {"type": "tag", "name": source_id_key},
+        ]
         for tag_key in metadata_tags:
-            self.metadata_tags_schema.append({"type": "text", "name": tag_key})
+            if tag_key != source_id_key:
+                self.metadata_tags_schema.append({"type": "text", "name": tag_key})
 
         try:
+            connection_params = (
+                {"redis_client": redis_client}
+                if redis_client is not None
+                else {"redis_url": self.redis_conn_string}
+            )
             self.redis_config = RedisConfig(
-                index_name="vector_store",
-                redis_url=self.redis_conn_string,
+                index_name=index_name,
+                key_prefix=key_prefix or index_name,
                 metadata_schema=self.metadata_tags_schema,
+                **connection_params,
             )
             self.vector_store = RedisVectorStore(
                 self.embeddings_model, config=self.redis_config
             )
-            logger.info("RedisEmbeddingsManager initialized")
+            logger.info(f"RedisEmbeddingsManager initialized on index {index_name}")
         except Exception as e:
             logger.error(f"Failed to initialize RedisEmbeddingsManager: {str(e)}")
             raise
 
-    def configure_vector_store(
-        self,
-        table_name: str = "langchain_pg_embedding",
-        vector_size: int = 768,
-        content_column: str = "document",
-        id_column: str = "id",
-        metadata_json_column: str = "metadata",
-        pg_record_manager: str = "postgres/langchain_pg_collection",
-    ):
-        """Configure the vector store."""
-        pass
+    def configure_vector_store(self):
+        """Create the search index when it does not exist."""
+        try:
+            search_index = self.vector_store.index
+            if not search_index.exists():
+                search_index.create(overwrite=False)
+                logger.info(f"Search index {self.index_name} created")
+        except Exception as e:
+            logger.error(f"Error configuring vector store: {str(e)}")
+            raise
 
-    def init_vector_store(
-        self,
-        table_name: str = "langchain_pg_embedding",
-        content_column: str = "document",
-        metadata_json_column: str = "metadata",
-        id_column: str = "id",
-    ):
+    def init_vector_store(self):
         """Initialize the vector store."""
         pass
 
+    def create_index(self, **index_params):
+        """
+        Create the search index.
+
+        The vector index is a field of the search index, its algorithm is set by
+        RedisConfig, so index_params are not used.
+        """
+        if index_params:
+            logger.warning(f"Redis index parameters ignored: {list(index_params)}")
+        self.configure_vector_store()
+
+    def retrieve_vector_store(self) -> tuple[RedisVectorStore, None]:
+        """Retrieve the vector store, redis does not use a record manager."""
+        return self.vector_store, None
+
     def vector_store_initialized(func):
         """validate vector store initialization"""
 
@@ -83,6 +139,92 @@ class RedisEmbeddingsManager(EmbeddingsManager):
 
         return wrapper
 
+    def _full_key(self, doc_id: str) -> str:
+        return f"{self.redis_config.key_prefix}:{doc_id}"
+
+    def _doc_id(self, full_key: str) -> str:
+        return full_key.removeprefix(f"{self.redis_config.key_prefix}:")
+
+    def _write_documents(self, keyed_docs: list[tuple[str, Document]]) -> list[str]:
+        """Embed and write documents, one embeddings call and one pipeline per batch."""
+        written_ids = []
+        for batch_start in range(0, len(keyed_docs), self.batch_size):
+            batch = keyed_docs[batch_start : batch_start + self.batch_size]
+            written_keys = self.vector_store.add_texts(
+                [doc.page_content for _, doc in batch],
+                metadatas=[doc.metadata for _, doc in batch],
+                keys=[key for key, _ in batch],
+                batch_size=len(batch),
+            )
+            written_ids += [self._doc_id(full_key) for full_key in written_keys]
+        return written_ids
+
+    def _build_filter(self, filters: dict | None) -> FilterExpression | None:
+        """
+        Filter expression of metadata equality filters.
+
+        Tag fields match exact values, text fields match the value as a phrase and
+        numeric fields match the number. A list value matches any of its items.
+        """
+        fields = self.vector_store.index.schema.fields
+        expression = None
+        for metadata_key, value in (filters or {}).items():
+            if metadata_key not in fields:
+                raise ValueError(f"Metadata key {metadata_key} is not indexed")
+            field_type = fields[metadata_key].type
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            if field_type == "tag":
+                condition = Tag(metadata_key) == [str(item) for item in values]
+            else:
+                field_filter = Num if field_type == "numeric" else Text
+                condition = None
+                for item in values:
+                    item_condition = field_filter(metadata_key) == item
+                    condition = (
+                        item_condition
+                        if condition is None
+                        else condition | item_condition
+                    )
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def _find_keys(self, filter_expression: FilterExpression) -> list[str]:
+        """
+        Ids of the documents matching a filter, fetched without their fields.
+
+        The keys are read with an FT.AGGREGATE cursor in pages of batch_size, so a
+        large source is neither read in a single unbounded reply nor capped by
+        MAXSEARCHRESULTS as offset paging of FT.SEARCH is, and the cursor keeps
+        its position in the index while other documents are written.
+        """
+        search_index = self.vector_store.index
+        keys_request = (
+            AggregateRequest(str(filter_expression))
+            .load("@__key")
+            .cursor(count=self.batch_size)
+            .dialect(2)
+        )
+        result = search_index.aggregate(keys_request)
+        docs_ids = []
+        while True:
+            # every row is the loaded field name followed by the key
+            for _, full_key in result.rows:
+                if isinstance(full_key, bytes):
+                    full_key = full_key.decode()
+                docs_ids.append(self._doc_id(full_key))
+            if result.cursor is None or not result.cursor.cid:
+                return docs_ids
+            result = search_index.aggregate(result.cursor)
+
+    def _delete_keys(self, docs_ids: list[str]) -> int:
+        """Delete documents in pipelined batches, returns the deleted count."""
+        if not docs_ids:
+            return 0
+        return self.vector_store.index.drop_keys(
+            [self._full_key(doc_id) for doc_id in docs_ids],
+            batch_size=self.batch_size,
+        )
+
     @vector_store_initialized
     def index_documents(self, docs: List[Document]):
         """
@@ -90,25 +232,225 @@ class RedisEmbeddingsManager(EmbeddingsManager):
 
         This method takes a list of Document objects, generates embeddings for them
         using the embeddings model, and stores both the documents and their
-        embeddings in the PostgreSQL database.
+        embeddings in Redis, in batches of batch_size documents written with a
+        single pipeline each. Documents are keyed by their id, indexing a document
+        again overwrites it.
 
         Args:
           docs: A list of LangChain Document objects to add to the vector store
                 Each Document should have page_content and metadata attributes
                 from langchain_core.documents import Document
         Returns:
-          None
+          The ids of the indexed documents
 
         Raises:
           Exception: If there's an error adding documents to the vector store
         """
         try:
             logger.info(f"Indexing {len(docs)} documents in vector store")
-            return self.vector_store.add_documents(docs)
+            return self._write_documents(
+                [(document_key_encoder(doc), doc) for doc in docs]
+            )
         except Exception as e:
             logger.error(f"Error indexing documents: {str(e)}")
             raise
 
+    @vector_store_initialized
+    def bulk_index_documents(
+        self,
+        docs: list[Document],
+        cleanup: bool = True,
+        force_update: bool = False,
+    ) -> dict[str, int]:
+        """
+        Re-index documents of many sources in a single pass.
+
+        Only documents whose key is not indexed yet are embedded and written, then
+        the documents of the touched sources missing from docs are deleted.
+
+        Args:
+            docs: Documents of one or many sources, every document must have the
+                  source_id_key metadata.
+            cleanup: Delete indexed documents of the touched sources not in docs
+            force_update: Embed and write documents already indexed
+
+        Returns:
+            Counts of added, updated, skipped and deleted documents
+        """
+        try:
+            keyed_docs = {}
+            for doc in docs:
+                if not doc.metadata.get(self.source_id_key):
+                    raise ValueError(
+                        f"Document without '{self.source_id_key}' metadata"
+                    )
+                keyed_docs[document_key_encoder(doc)] = doc
+            sources = sorted(
+                {str(doc.metadata[self.source_id_key]) for doc in keyed_docs.values()}
+            )
+            logger.info(
+                f"Bulk indexing {len(keyed_docs)} documents of {len(sources)} sources"
+            )
+            indexed_keys = set()
+            if sources:
+                indexed_keys = set(self._find_keys(Tag(self.source_id_key) == sources))
+            pending_docs = [
+                (key, doc)
+                for key, doc in keyed_docs.items()
+                if force_update or key not in indexed_keys
+            ]
+            self._write_documents(pending_docs)
+            num_deleted = 0
+            if cleanup:
+                num_deleted = self._delete_keys(
+                    [key for key in indexed_keys if key not in keyed_docs]
+                )
+            num_updated = sum(1 for key, _ in pending_docs if key in indexed_keys)
+            return {
+                "num_added": len(pending_docs) - num_updated,
+                "num_updated": num_updated,
+                "num_skipped": len(keyed_docs) - len(pending_docs),
+                "num_deleted": num_deleted,
+            }
+        except Exception as e:
+            logger.error(f"Error bulk indexing documents: {str(e)}")
+            raise
+
+    @vector_store_initialized
+    def search_records(
+        self,
+        query: str,
+        k: int = 5,
+        filters: dict | None = None,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+    ) -> list[Document]:
+        """
+        Search documents by vector similarity.
+
+        Filters are applied by the KNN query itself (hybrid pre-filtering), so
+        filtered searches return k matches of the filtered documents.
+
+        Args:
+            query: The text searched
+            k: Number of documents returned
+            filters: Metadata equality filters, a list value matches any of its items
+            search_type: Only "similarity" is supported by redis
+            fetch_k: Unused, candidates of the hybrid search
+
+        Returns:
+            The documents closest to the query
+
+        Raises:
+            ValueError: If search_type is not "similarity"
+        """
+        if search_type != "similarity":
+            raise ValueError(f"{search_type} search is not supported by redis")
+        try:
+            return self.vector_store.similarity_search(
+                query, k=k, filter=self._build_filter(filters)
+            )
+        except Exception as e:
+            logger.error(f"Error searching records: {str(e)}")
+            raise
+
+    @vector_store_initialized
+    def search_records_many(
+        self,
+        queries: list[str],
+        k: int = 5,
+        filters: dict | None = None,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+    ) -> list[list[Document]]:
+        """
+        Search documents for many queries in pipelined round trips.
+
+        The queries are embedded in batched requests, and their KNN queries are
+        sent batch_size at a time in one pipeline.
+
+        Args:
+            queries: The texts searched
+            k: Number of documents returned per query
+            filters: Metadata equality filters shared by every query
+            search_type: Only "similarity" is supported by redis
+            fetch_k: Unused, candidates of the hybrid search
+
+        Returns:
+            The documents closest to each query, in the order of queries
+
+        Raises:
+            ValueError: If search_type is not "similarity"
+        """
+        if search_type != "similarity":
+            raise ValueError(f"{search_type} search is not supported by redis")
+        try:
+            if not queries:
+                return []
+            filter_expression = self._build_filter(filters)
+            config = self.vector_store.config
+            # same fields and query as RedisVectorStore.similarity_search_by_vector
+            return_fields = [config.content_field] + [
+                field.name
+                for field in self.vector_store.index.schema.fields.values()
+                if field.name not in (config.embedding_field, config.content_field)
+            ]
+            knn_queries = [
+                self.vector_store._query_builder(
+                    embedding=embedding,
+                    k=k,
+                    filter=filter_expression,
+                    return_fields=return_fields,
+                )
+                for embedding in embed_queries(self.embeddings_model, queries)
+            ]
+            results = self.vector_store.index.batch_query(
+                knn_queries, batch_size=self.batch_size
+            )
+            return [
+                list(self.vector_store._prepare_docs(False, query_results, True))
+                for query_results in results
+            ]
+        except Exception as e:
+            logger.error(f"Error searching records: {str(e)}")
+            raise
+
+    @vector_store_initialized
+    def search_candidates(
+        self, query: str, k: int = 20, filters: dict | None = None
+    ) -> tuple[np.ndarray, list[Document], np.ndarray]:
+        """
+        Search documents and return them with their stored vectors, for re-ranking.
+
+        Args:
+            query: The text searched
+            k: Number of candidates returned
+            filters: Metadata equality filters, a list value matches any of its items
+
+        Returns:
+            The query vector, the candidates best first and their vectors, one
+            row per candidate
+        """
+        try:
+            query_vector = np.asarray(
+                self.embeddings_model.embed_query(query), dtype=np.float32
+            )
+            results = self.vector_store.similarity_search_with_score_by_vector(
+                query_vector.tolist(),
+                k=k,
+                filter=self._build_filter(filters),
+                with_vectors=True,
+            )
+            vectors = np.asarray([vector for _, _, vector in results], dtype=np.float32)
+            return (
+                query_vector,
+                [doc for doc, _, _ in results],
+                vectors.reshape(len(results), len(query_vector)),
+            )
+        except Exception as e:
+            logger.error(f"Error searching candidates: {str(e)}")
+            raise
+
     @vector_store_initialized
     def get_documents_by_id(self, id: str):
         """
@@ -120,29 +462,75 @@ class RedisEmbeddingsManager(EmbeddingsManager):
             logger.error(f"Error getting documents by ID: {str(e)}")
             raise
 
+    @vector_store_initialized
+    def retrieve_documents_by_ids(self, docs_ids: list[str]) -> List[Document]:
+        """
+        Find indexed documents by ids in the vector store.
+        """
+        try:
+            return self.vector_store.get_by_ids(ids=docs_ids)
+        except Exception as e:
+            logger.error(f"Error getting documents by ID: {str(e)}")
+            raise
+
+    @vector_store_initialized
+    def retrieve_documents_by_file_name(self, file_name: str) -> list[str]:
+        """Find the ids of the documents of a file."""
+        return self.get_documents_keys_by_source_id(file_name)
+
     @vector_store_initialized
     def delete_documents_by_id(self, ids: list[str]):
         """
         Delete documents by ID from the vector store.
         """
         try:
-            self.vector_store.delete(ids=ids)
+            self._delete_keys(ids)
         except Exception as e:
             logger.error(f"Error deleting documents by ID: {str(e)}")
             raise
 
+    def delete_documents_by_ids(self, docs_ids: list[str]) -> list[str]:
+        """Delete documents by ids from the vector store."""
+        self.delete_documents_by_id(docs_ids)
+        return docs_ids
+
     @vector_store_initialized
     def delete_documents_by_metadata_key(self, metadata_key: str, metadata_value: str):
         """
         Delete documents by filter from the vector store.
         """
-        # TODO investigate how to do this
-        pass
+        try:
+            docs_ids = self._find_keys(
+                self._build_filter({metadata_key: metadata_value})
+            )
+            return self._delete_keys(docs_ids)
+        except Exception as e:
+            logger.error(f"Error deleting documents by metadata: {str(e)}")
+            raise
 
-    def get_documents_keys_by_source_id(self, source_id: str):
+    @vector_store_initialized
+    def get_documents_keys_by_source_id(self, source_id: str) -> list[str]:
         """Get documents keys by source ID."""
-        pass
+        try:
+            return self._find_keys(Tag(self.source_id_key) == source_id)
+        except Exception as e:
+            logger.error(f"Error getting documents keys by source: {str(e)}")
+            raise
 
-    def delete_documents_by_source_id(self, source_id: str):
-        """Delete documents by source ID."""
-        pass
+    @vector_store_initialized
+    def delete_documents_by_source_id(self, source_id: str) -> dict[str, int]:
+        """
+        Delete documents by source ID.
+
+        The source tag index finds the documents of the source, so the delete
+        costs the number of matches instead of a scan of the keyspace.
+        """
+        try:
+            vectors_deleted = self._delete_keys(
+                self.get_documents_keys_by_source_id(source_id)
+            )
+            logger.info(f"Deleted {vectors_deleted} vectors of {source_id}")
+            return {"vectors_deleted": vectors_deleted, "records_deleted": 0}
+        except Exception as e:
+            logger.error(f"Error deleting documents by source: {str(e)}")
+            raise
@@ -2,6 +2,7 @@
 # https://python.langchain.com/docs/how_to/semantic-chunker/
 # https://github.com/FullStackRetrieval-com/RetrievalTutorials/blob/main/tutorials/LevelsOfTextSplitting/5_Levels_Of_Text_Splitting.ipynb
 # https://python.langchain.com/docs/how_to/embed_text/
+import hashlib
 import logging
 import uuid
 from typing import Any, List
@@ -13,6 +14,9 @@ from ...application.interfaces import RagChunker
 
 logger = logging.getLogger(__name__)
 
+# namespace for content-derived chunk ids, ids must stay stable across releases
+CHUNK_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "wizit_context_ingestor/chunks")
+
 
 class SemanticChunks(RagChunker):
     """
@@ -59,9 +63,12 @@ class SemanticChunks(RagChunker):
         try:
             chunks = self.text_splitter.split_documents([document])
             filtered_chunks = []
-            for i, chunk in enumerate(chunks):
-                if document.metadata["source"]:
-                    chunk.id = f"{uuid.uuid4()}"
+            source = document.metadata.get("source")
+            for chunk in chunks:
+                if source:
+                    chunk.id = self.gen_chunk_id(
+                        source, chunk.metadata.get("start_index"), chunk.page_content
+                    )
                 if chunk.page_content is not None and chunk.page_content != "":
                     filtered_chunks.append(chunk)
             logger.info(f"{len(filtered_chunks)} chunks generated successfully")
@@ -69,3 +76,24 @@ class SemanticChunks(RagChunker):
         except Exception as e:
             logger.error(f"Failed to get chunks: {str(e)}")
             raise
+
+    @staticmethod
+    def gen_chunk_id(source: str, start_index: int | None, content: str) -> str:
+        """
+        Derive a deterministic chunk id from its source, position and content.
+
+        The same chunk of the same document always gets the same id, so re-ingesting
+        a document only touches the chunks whose content changed.
+
+        Args:
+            source: The source (file key) of the chunked document
+            start_index: Character offset of the chunk in the document
+            content: The chunk text
+
+        Returns:
+            A UUID string, compatible with the vector stores id columns
+        """
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        return str(
+            uuid.uuid5(CHUNK_ID_NAMESPACE, f"{source}:{start_index}:{content_hash}")
+        )
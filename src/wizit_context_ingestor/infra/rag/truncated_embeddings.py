@@ -0,0 +1,88 @@
+import inspect
+import logging
+import math
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from .query_embeddings import embed_queries
+
+logger = logging.getLogger(__name__)
+
+
+class TruncatedEmbeddings(Embeddings):
+    """
+    Matryoshka style embeddings reduced to their leading dimensions.
+
+    Models accepting an output dimensionality (e.g. VertexAIEmbeddings.embed with
+    dimensions, supported by gemini-embedding-001 and text-embedding-005) are asked
+    for it, other models are truncated client side. Truncated vectors are L2
+    normalized again so cosine, inner product and binary quantization agree.
+    """
+
+    __slots__ = ("embeddings", "dimensions")
+
+    def __init__(self, embeddings: Embeddings, dimensions: int):
+        """
+        Initialize the TruncatedEmbeddings.
+
+        Args:
+            embeddings: The embeddings model producing the full vectors
+            dimensions: Number of leading dimensions kept
+
+        Raises:
+            ValueError: If dimensions is not positive
+        """
+        if dimensions <= 0:
+            raise ValueError("dimensions must be positive")
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+        embed = getattr(embeddings, "embed", None)
+        self.model_supports_dimensions = (
+            embed is not None and "dimensions" in inspect.signature(embed).parameters
+        )
+        logger.info(
+            f"Embeddings truncated to {dimensions} dimensions "
+            f"({'requested from the model' if self.model_supports_dimensions else 'client side'})"
+        )
+
+    def _truncate(self, embedding: List[float]) -> List[float]:
+        truncated = embedding[: self.dimensions]
+        norm = math.sqrt(sum(value * value for value in truncated))
+        if norm == 0:
+            return list(truncated)
+        return [value / norm for value in truncated]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.model_supports_dimensions:
+            embeddings = self.embeddings.embed(
+                texts,
+                embeddings_task_type="RETRIEVAL_DOCUMENT",
+                dimensions=self.dimensions,
+            )
+        else:
+            embeddings = self.embeddings.embed_documents(texts)
+        return [self._truncate(embedding) for embedding in embeddings]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.model_supports_dimensions:
+            (embedding,) = self.embeddings.embed(
+                [text],
+                embeddings_task_type="RETRIEVAL_QUERY",
+                dimensions=self.dimensions,
+            )
+        else:
+            embedding = self.embeddings.embed_query(text)
+        return self._truncate(embedding)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries in batched requests."""
+        if self.model_supports_dimensions:
+            embeddings = self.embeddings.embed(
+                texts,
+                embeddings_task_type="RETRIEVAL_QUERY",
+                dimensions=self.dimensions,
+            )
+        else:
+            embeddings = embed_queries(self.embeddings, texts)
+        return [self._truncate(embedding) for embedding in embeddings]
@@ -1,28 +1,58 @@
-from boto3 import client as boto3_client
 import logging
+import threading
+import time
+
+from boto3 import client as boto3_client
 
 logger = logging.getLogger(__name__)
 
 
 class AwsSecretsManager:
-    def __init__(self, aws_region="us-east-1"):
-        self.client = boto3_client("secretsmanager", region_name=aws_region)
+    # process wide caches, shared by every instance so warm invocations skip
+    # client creation and secret retrieval
+    _clients = {}
+    _secrets_cache = {}
+    _cache_lock = threading.Lock()
 
-    def get_secret(self, secret_name):
+    def __init__(self, aws_region="us-east-1", cache_ttl_seconds: float = 3600):
+        self.aws_region = aws_region
+        self.cache_ttl_seconds = cache_ttl_seconds
+        with self._cache_lock:
+            if aws_region not in self._clients:
+                self._clients[aws_region] = boto3_client(
+                    "secretsmanager", region_name=aws_region
+                )
+            self.client = self._clients[aws_region]
+
+    def get_secret(self, secret_name, refresh: bool = False):
         """
         Retrieve individual secrets from AWS Secrets Manager using the get_secret_value API.
         This function assumes the stack mentioned in the source code README has been successfully deployed.
         This stack includes 7 secrets, all of which have names beginning with "mySecret".
+        Secrets are cached process wide for cache_ttl_seconds.
 
         :param secret_name: The name of the secret fetched.
         :type secret_name: str
+        :param refresh: Skip the cache and fetch the secret again.
+        :type refresh: bool
         """
+        cache_key = (self.aws_region, secret_name)
+        if not refresh:
+            with self._cache_lock:
+                cached_secret = self._secrets_cache.get(cache_key)
+            if cached_secret is not None:
+                secret_value, fetched_at = cached_secret
+                if time.monotonic() - fetched_at < self.cache_ttl_seconds:
+                    return secret_value
         try:
             get_secret_value_response = self.client.get_secret_value(
                 SecretId=secret_name
             )
             logger.info("Secret retrieved successfully.")
-            return get_secret_value_response["SecretString"]
+            secret_value = get_secret_value_response["SecretString"]
+            with self._cache_lock:
+                self._secrets_cache[cache_key] = (secret_value, time.monotonic())
+            return secret_value
         except self.client.exceptions.ResourceNotFoundException:
             msg = f"The requested secret {secret_name} was not found."
             logger.info(msg)
@@ -30,3 +60,19 @@ class AwsSecretsManager:
         except Exception as e:
             logger.error(f"An unknown error occurred: {str(e)}.")
             raise
+
+    @classmethod
+    def clear_cache(cls, secret_name=None):
+        """
+        Drop cached secrets, all of them or the ones named secret_name.
+
+        :param secret_name: The name of the secret to forget, None forgets every secret.
+        :type secret_name: str
+        """
+        with cls._cache_lock:
+            if secret_name is None:
+                cls._secrets_cache.clear()
+                return
+            for cache_key in list(cls._secrets_cache):
+                if cache_key[1] == secret_name:
+                    del cls._secrets_cache[cache_key]
@@ -0,0 +1,211 @@
+import logging
+import random
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from langsmith import Client, tracing_context
+
+from ...domain.models import TracingPolicy
+from ...utils.tracing_utils import TRACING_MODES, PayloadRedactor
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorsOnlyClient(Client):
+    """
+    LangSmith client uploading only the traces in which a run failed.
+
+    Run operations are held in memory by trace, with their inputs and outputs
+    already redacted, until the root run of the trace ends. The trace is then
+    handed to the background batcher of the client when one of its runs
+    reported an error, and dropped otherwise. At most max_buffered_traces are
+    held, the oldest are evicted first.
+    """
+
+    def __init__(
+        self,
+        *args,
+        redactor: Optional[PayloadRedactor] = None,
+        max_buffered_traces: int = 1000,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.redactor = redactor
+        self.max_buffered_traces = max_buffered_traces
+        # trace id -> [failed, operations]
+        self._traces: OrderedDict[str, list] = OrderedDict()
+        self._buffer_lock = threading.Lock()
+        self.uploaded_traces = 0
+        self.dropped_traces = 0
+        self.evicted_traces = 0
+
+    def _redact(self, payload: Optional[dict]) -> Optional[dict]:
+        if payload and self.redactor is not None:
+            return self.redactor(payload)
+        return payload
+
+    def _buffer(
+        self, trace_id: str, run_id: str, operation: tuple, error: Any, ended: bool
+    ):
+        flushed = None
+        with self._buffer_lock:
+            trace = self._traces.get(trace_id)
+            if trace is None:
+                trace = self._traces[trace_id] = [False, []]
+                if len(self._traces) > self.max_buffered_traces:
+                    self._traces.popitem(last=False)
+                    self.evicted_traces += 1
+            trace[0] = trace[0] or bool(error)
+            trace[1].append(operation)
+            if ended and run_id == trace_id:
+                failed, operations = self._traces.pop(trace_id)
+                if failed:
+                    self.uploaded_traces += 1
+                    flushed = operations
+                else:
+                    self.dropped_traces += 1
+        # uploads are queued outside of the lock, by the parent client
+        for kind, args, kwargs in flushed or []:
+            if kind == "create":
+                super().create_run(*args, **kwargs)
+            else:
+                super().update_run(*args, **kwargs)
+
+    def create_run(self, name: str, inputs: dict, run_type, **kwargs: Any) -> None:
+        trace_id = kwargs.get("trace_id") or kwargs.get("id")
+        if trace_id is None:
+            return super().create_run(name, inputs, run_type, **kwargs)
+        if "outputs" in kwargs:
+            kwargs["outputs"] = self._redact(kwargs["outputs"])
+        self._buffer(
+            str(trace_id),
+            str(kwargs.get("id")),
+            ("create", (name, self._redact(inputs), run_type), kwargs),
+            kwargs.get("error"),
+            kwargs.get("end_time") is not None,
+        )
+
+    def update_run(self, run_id, **kwargs: Any) -> None:
+        trace_id = kwargs.get("trace_id")
+        if trace_id is None:
+            return super().update_run(run_id, **kwargs)
+        for key in ("inputs", "outputs"):
+            if key in kwargs:
+                kwargs[key] = self._redact(kwargs[key])
+        self._buffer(
+            str(trace_id),
+            str(run_id),
+            ("update", (run_id,), kwargs),
+            kwargs.get("error"),
+            kwargs.get("end_time") is not None,
+        )
+
+
+class LangSmithTracing:
+    """
+    LangSmith tracing of the manager calls under a TracingPolicy.
+
+    Modes: off creates no client and traces nothing, sampled traces a share of
+    the calls (the others run without any tracing callbacks), errors_only
+    traces every call but uploads only the traces with a failed run, always
+    traces and uploads every call. Inputs and outputs are redacted before they
+    are queued, uploads run on the background batcher of the client.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        project_name: Optional[str],
+        policy: Optional[TracingPolicy] = None,
+        api_url: Optional[str] = None,
+    ):
+        """
+        Initialize the LangSmithTracing.
+
+        Args:
+            api_key: LangSmith API key
+            project_name: LangSmith project receiving the traces
+            policy: Tracing policy, defaults to TracingPolicy()
+            api_url: LangSmith endpoint, e.g. of a self hosted instance
+
+        Raises:
+            ValueError: If the mode or the sample rate of the policy are invalid
+        """
+        self.policy = policy or TracingPolicy()
+        if self.policy.mode not in TRACING_MODES:
+            raise ValueError(f"tracing mode must be one of {', '.join(TRACING_MODES)}")
+        if not 0.0 <= self.policy.sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.project_name = project_name
+        self.redactor = PayloadRedactor(
+            self.policy.max_payload_chars, self.policy.redacted_keys
+        )
+        self.calls = 0
+        self.traced_calls = 0
+        self.client = None
+        if self.policy.mode == "errors_only":
+            self.client = ErrorsOnlyClient(
+                api_url=api_url,
+                api_key=api_key,
+                auto_batch_tracing=True,
+                redactor=self.redactor,
+                max_buffered_traces=self.policy.max_buffered_traces,
+                tracing_error_callback=self._log_upload_error,
+            )
+        elif self.policy.mode != "off":
+            self.client = Client(
+                api_url=api_url,
+                api_key=api_key,
+                auto_batch_tracing=True,
+                hide_inputs=self.redactor,
+                hide_outputs=self.redactor,
+                tracing_error_callback=self._log_upload_error,
+            )
+
+    @staticmethod
+    def _log_upload_error(error: Exception):
+        # tracing never fails the ingestion
+        logger.warning(f"Could not upload traces to LangSmith: {str(error)}")
+
+    def _should_trace(self) -> bool:
+        if self.client is None:
+            return False
+        if self.policy.mode == "sampled":
+            return random.random() < self.policy.sample_rate
+        return True
+
+    @contextmanager
+    def trace(self) -> Iterator[None]:
+        """Trace the calls made in the block when the policy selects it."""
+        self.calls += 1
+        if not self._should_trace():
+            # explicit disable, so LANGSMITH_TRACING in the environment is ignored
+            with tracing_context(enabled=False):
+                yield
+            return
+        self.traced_calls += 1
+        with tracing_context(
+            enabled=True, project_name=self.project_name, client=self.client
+        ):
+            yield
+
+    def flush(self):
+        """Wait for the queued traces to be uploaded."""
+        if self.client is not None:
+            self.client.flush()
+
+    def get_stats(self) -> dict:
+        """Calls traced and the cost of the payload redaction."""
+        stats = {
+            "mode": self.policy.mode,
+            "calls": self.calls,
+            "traced_calls": self.traced_calls,
+            "redaction": self.redactor.get_stats(),
+        }
+        if isinstance(self.client, ErrorsOnlyClient):
+            stats["uploaded_traces"] = self.client.uploaded_traces
+            stats["dropped_traces"] = self.client.dropped_traces
+            stats["evicted_traces"] = self.client.evicted_traces
+        return stats
@@ -4,7 +4,9 @@ from langchain_google_vertexai import VertexAIEmbeddings, ChatVertexAI
 from langchain_google_vertexai.model_garden import ChatAnthropicVertex
 from typing import Dict, Any, Optional, List, Union
 from ..application.interfaces import AiApplicationService
+from .rag.truncated_embeddings import TruncatedEmbeddings
 import logging
+import threading
 
 
 logger = logging.getLogger(__name__)
@@ -24,6 +26,13 @@ class VertexModels(AiApplicationService):
         "llm_model_id",
     )
 
+    # process wide caches, so managers built per event reuse credentials,
+    # vertex initialization and model instances
+    _credentials_cache = {}
+    _vertex_init_key = None
+    _registry = {}
+    _registry_lock = threading.RLock()
+
     def __init__(
         self,
         project_id: str,
@@ -44,15 +53,28 @@ class VertexModels(AiApplicationService):
         try:
             print(location)
             self.scopes = scopes or ["https://www.googleapis.com/auth/cloud-platform"]
-            self.credentials = service_account.Credentials.from_service_account_info(
-                json_service_account, scopes=self.scopes
-            )
+            credentials_key = self._credentials_key(json_service_account, self.scopes)
             self.llm_model_id = llm_model_id
             self.project_id = project_id
             self.location = location
-            vertexai_init(
-                project=project_id, location=location, credentials=self.credentials
-            )
+            self.embeddings_models = {}
+            with self._registry_lock:
+                if credentials_key not in self._credentials_cache:
+                    self._credentials_cache[credentials_key] = (
+                        service_account.Credentials.from_service_account_info(
+                            json_service_account, scopes=self.scopes
+                        )
+                    )
+                self.credentials = self._credentials_cache[credentials_key]
+                # vertexai keeps a single global configuration, only re-init on change
+                vertex_init_key = (project_id, location, credentials_key)
+                if VertexModels._vertex_init_key != vertex_init_key:
+                    vertexai_init(
+                        project=project_id,
+                        location=location,
+                        credentials=self.credentials,
+                    )
+                    VertexModels._vertex_init_key = vertex_init_key
             logger.info(
                 f"VertexModels initialized with project {project_id} in {location}"
             )
@@ -60,24 +82,84 @@ class VertexModels(AiApplicationService):
             logger.error(f"Failed to initialize VertexModels: {str(e)}")
             raise
 
+    @staticmethod
+    def _credentials_key(json_service_account: Dict[str, Any], scopes: List[str]):
+        return (
+            json_service_account.get("client_email"),
+            json_service_account.get("private_key_id"),
+            tuple(scopes),
+        )
+
+    @classmethod
+    def shared(
+        cls,
+        project_id: str,
+        location: str,
+        json_service_account: Dict[str, Any],
+        scopes: Optional[List[str]] = None,
+        llm_model_id: str = "claude-sonnet-4@20250514",
+    ) -> "VertexModels":
+        """
+        Return the process wide VertexModels for these settings, creating it once.
+
+        A rotated service account key (new private_key_id) gets a new instance.
+        """
+        registry_key = (
+            project_id,
+            location,
+            cls._credentials_key(
+                json_service_account,
+                scopes or ["https://www.googleapis.com/auth/cloud-platform"],
+            ),
+            llm_model_id,
+        )
+        with cls._registry_lock:
+            if registry_key not in cls._registry:
+                cls._registry[registry_key] = cls(
+                    project_id,
+                    location,
+                    json_service_account,
+                    scopes=scopes,
+                    llm_model_id=llm_model_id,
+                )
+            return cls._registry[registry_key]
+
+    @classmethod
+    def clear_registry(cls):
+        """Forget shared instances and cached credentials, forcing a refresh."""
+        with cls._registry_lock:
+            cls._registry.clear()
+            cls._credentials_cache.clear()
+            VertexModels._vertex_init_key = None
+
     def load_embeddings_model(
-        self, embeddings_model_id: str = "text-multilingual-embedding-002"
-    ) -> VertexAIEmbeddings:  # noqa: E125
+        self,
+        embeddings_model_id: str = "text-multilingual-embedding-002",
+        dimensions: Optional[int] = None,
+    ) -> Union[VertexAIEmbeddings, TruncatedEmbeddings]:  # noqa: E125
         """
         Load and return a Vertex AI embeddings model.
         default embeddings length is 768 https://cloud.google.com/vertex-ai/generative-ai/docs/embeddings/get-text-embeddings
         Args:
             embeddings_model_id: The ID of the embedding model to use.
                                 Default is "text-embedding-005".
+            dimensions: Output dimensionality requested from the model (Matryoshka
+                                truncation), None keeps the model default.
 
         Returns:
             An instance of VertexAIEmbeddings ready for generating embeddings.
         """
         try:
+            cache_key = (embeddings_model_id, dimensions)
+            if cache_key in self.embeddings_models:
+                return self.embeddings_models[cache_key]
             embeddings = VertexAIEmbeddings(
                 model=embeddings_model_id,
                 credentials=self.credentials,
             )
+            if dimensions is not None:
+                embeddings = TruncatedEmbeddings(embeddings, dimensions)
+            self.embeddings_models[cache_key] = embeddings
             logger.debug(f"Loaded embedding model: {embeddings_model_id}")
             return embeddings
         except Exception as e:
@@ -1,18 +1,27 @@
+import asyncio
 import json
-from typing import Dict, Any, Literal
+from typing import Dict, Any, AsyncIterator
 from .infra.vertex_model import VertexModels
 from .application.transcription_service import TranscriptionService
-from .application.context_chunk_service import ContextChunksInDocumentService
-from .infra.persistence.s3_storage import S3StorageService
-from .infra.persistence.local_storage import LocalStorageService
-from .infra.rag.semantic_chunks import SemanticChunks
-from .infra.rag.redis_embeddings import RedisEmbeddingsManager
-from .infra.rag.chroma_embeddings import ChromaEmbeddingsManager
 from .infra.secrets.aws_secrets_manager import AwsSecretsManager
+from .infra.tracing.langsmith_tracing import LangSmithTracing
 from .data.storage import storage_services, StorageServices
-from .data.kdb import kdb_services, KdbServices
+from .data.kdb import kdb_services
+from .domain.models import (
+    CascadePolicy,
+    DocumentBatchResult,
+    MemoryPolicy,
+    TracingPolicy,
+)
+from .utils.cascade_utils import CascadeStats
+from .utils.concurrency_utils import (
+    ByteBudget,
+    RetryBudget,
+    process_documents_concurrently,
+)
 from .utils.file_utils import validate_file_name_format
-from langsmith import Client, tracing_context
+from .utils.memory_utils import MemoryProfiler
+from .utils.metrics_utils import MetricsRecorder
 
 
 class KdbManager:
@@ -24,18 +33,12 @@ class KdbManager:
         self.embeddings_model = embeddings_model
 
     def retrieve_kdb_service(self):
-        if self.kdb_service == KdbServices.REDIS.value:
-            return RedisEmbeddingsManager(
-                self.embeddings_model,
-                **self.kdb_params,
-            )
-        elif self.kdb_service == KdbServices.CHROMA.value:
-            return ChromaEmbeddingsManager(
-                self.embeddings_model,
-                **self.kdb_params,
-            )
-        else:
-            raise ValueError(f"Unsupported kdb provider: {self.kdb_service}")
+        # vector store backends are imported on first use
+        from .infra.rag.kdb_registry import create_embeddings_manager
+
+        return create_embeddings_manager(
+            self.kdb_service, self.embeddings_model, **self.kdb_params
+        )
 
 
 class PersistenceManager:
@@ -51,11 +54,15 @@ class PersistenceManager:
 
     def retrieve_storage_service(self):
         if self.storage_service == StorageServices.S3.value:
+            from .infra.persistence.s3_storage import S3StorageService
+
             return S3StorageService(
                 origin_bucket_name=self.source_storage_route,
                 target_bucket_name=self.target_storage_route,
             )
         elif self.storage_service == StorageServices.LOCAL.value:
+            from .infra.persistence.local_storage import LocalStorageService
+
             return LocalStorageService(
                 source_storage_route=self.source_storage_route,
                 target_storage_route=self.target_storage_route,
@@ -63,6 +70,19 @@ class PersistenceManager:
         else:
             raise ValueError(f"Unsupported storage service: {self.storage_service}")
 
+    def retrieve_checkpoint_store(self, checkpoint_route: str):
+        """Checkpoint store on the same storage, a directory or a bucket."""
+        if self.storage_service == StorageServices.S3.value:
+            from .infra.persistence.s3_checkpoints import S3CheckpointStore
+
+            return S3CheckpointStore(bucket_name=checkpoint_route)
+        elif self.storage_service == StorageServices.LOCAL.value:
+            from .infra.persistence.local_checkpoints import LocalCheckpointStore
+
+            return LocalCheckpointStore(checkpoint_route=checkpoint_route)
+        else:
+            raise ValueError(f"Unsupported storage service: {self.storage_service}")
+
 
 class TranscriptionManager:
     def __init__(
@@ -80,6 +100,15 @@ class TranscriptionManager:
         transcription_additional_instructions: str = "",
         transcription_accuracy_threshold: float = 0.90,
         max_transcription_retries: int = 2,
+        checkpoint_route: str | None = None,
+        keep_checkpoints: bool = False,
+        max_page_attempts: int = 3,
+        llm_routes: list[dict] | None = None,
+        cascade_llm_model_id: str | None = None,
+        cascade_policy: CascadePolicy | None = None,
+        metrics_sinks: list | None = None,
+        tracing_policy: TracingPolicy | None = None,
+        memory_policy: MemoryPolicy | None = None,
     ):
         self.gcp_project_id = gcp_project_id
         self.gcp_project_location = gcp_project_location
@@ -95,11 +124,49 @@ class TranscriptionManager:
         )
         self.transcription_accuracy_threshold = transcription_accuracy_threshold
         self.max_transcription_retries = max_transcription_retries
+        # transcribed pages are checkpointed in this directory (local) or bucket
+        # (s3), a retried document only transcribes the pages it is missing
+        self.checkpoint_route = checkpoint_route
+        self.keep_checkpoints = keep_checkpoints
+        # failing pages are retried with backoff, then marked in the markdown
+        self.max_page_attempts = max_page_attempts
+        # peak memory per stage in the DocumentMetrics when profiling, documents
+        # whose page images exceed max_inflight_page_bytes render page by page
+        self.memory_policy = memory_policy or MemoryPolicy()
+        self.memory_profiler = None
+        if self.memory_policy.profile_memory:
+            self.memory_profiler = MemoryProfiler(self.memory_policy.memray_output_dir)
         self.gcp_sa_dict = self._get_gcp_sa_dict(gcp_secret_name)
         self.vertex_model = self._get_vertex_model()
+        # page transcriptions spread over several providers / regions when given,
+        # see infra.model_router.create_model_router for the route settings
+        self.ai_application_service = self.vertex_model
+        if llm_routes:
+            from .infra.model_router import create_model_router
+
+            self.ai_application_service = create_model_router(
+                llm_routes, gcp_project_id, self.gcp_sa_dict
+            )
+        # simple pages are transcribed by this cheaper model first (e.g. a gemini
+        # flash id), escalating to llm_model_id when they score below the threshold
+        self.cascade_llm_model_id = cascade_llm_model_id
+        self.cascade_policy = cascade_policy
+        self.fast_chat_model = None
+        if cascade_llm_model_id:
+            self.fast_chat_model = self.vertex_model.load_chat_model_gemini(
+                cascade_llm_model_id
+            )
+        self.cascade_stats = CascadeStats()
+        # DocumentMetrics of every transcribed document are emitted to these
+        # (e.g. LoggingMetricsSink, OpenTelemetryMetricsSink in infra.metrics)
+        self.metrics_sinks = metrics_sinks or []
         self.langsmith_api_key = langsmith_api_key
         self.langsmith_project_name = langsmith_project_name
-        self.langsmith_client = Client(api_key=self.langsmith_api_key)
+        # off, sampled, errors_only or always, payloads are redacted before upload
+        self.langsmith_tracing = LangSmithTracing(
+            self.langsmith_api_key, self.langsmith_project_name, tracing_policy
+        )
+        self.langsmith_client = self.langsmith_tracing.client
 
     def _get_gcp_sa_dict(self, gcp_secret_name: str):
         vertex_gcp_sa = self.aws_secrets_manager.get_secret(gcp_secret_name)
@@ -107,7 +174,7 @@ class TranscriptionManager:
         return vertex_gcp_sa_dict
 
     def _get_vertex_model(self):
-        vertex_model = VertexModels(
+        vertex_model = VertexModels.shared(
             self.gcp_project_id,
             self.gcp_project_location,
             self.gcp_sa_dict,
@@ -115,19 +182,52 @@ class TranscriptionManager:
         )
         return vertex_model
 
+    def get_cascade_stats(self) -> dict:
+        """Per tier page share, latency and token usage of the transcription cascade."""
+        return self.cascade_stats.summary()
+
+    def get_llm_route_stats(self) -> dict:
+        """Calls, throttles and latency by route of the model router, if any."""
+        if hasattr(self.ai_application_service, "get_stats"):
+            return self.ai_application_service.get_stats()
+        return {}
+
+    def _emit_metrics(self, metrics_recorder: MetricsRecorder):
+        metrics = metrics_recorder.finish()
+        for metrics_sink in self.metrics_sinks:
+            metrics_sink.emit(metrics)
+        return metrics
+
     def tracing(func):
         async def gen_tracing_context(self, *args, **kwargs):
-            with tracing_context(
-                enabled=True,
-                project_name=self.langsmith_project_name,
-                client=self.langsmith_client,
-            ):
+            with self.langsmith_tracing.trace():
                 return await func(self, *args, **kwargs)
 
         return gen_tracing_context
 
+    def get_tracing_stats(self) -> dict:
+        """Calls traced under the tracing policy and the cost of the redaction."""
+        return self.langsmith_tracing.get_stats()
+
+    def memory_profiling(func):
+        async def gen_memory_profiling_session(self, *args, **kwargs):
+            if self.memory_profiler is None:
+                return await func(self, *args, **kwargs)
+            with self.memory_profiler.session():
+                return await func(self, *args, **kwargs)
+
+        return gen_memory_profiling_session
+
     @tracing
-    async def transcribe_document(self, file_key: str):
+    @memory_profiling
+    async def transcribe_document(
+        self,
+        file_key: str,
+        llm_semaphore: asyncio.Semaphore | None = None,
+        retry_budget: RetryBudget | None = None,
+        return_metrics: bool = False,
+        page_bytes_budget: ByteBudget | None = None,
+    ):
         """Transcribe a document from source storage to target storage.
         This method serves as a generic interface for transcribing documents from
         various storage sources to target destinations. The specific implementation
@@ -135,13 +235,26 @@ class TranscriptionManager:
 
         Args:
             file_key (str): The unique identifier or path of the file to be transcribed.
+            llm_semaphore (asyncio.Semaphore, optional): Bounds concurrent page
+                transcriptions, shared when many documents are transcribed at once.
+            retry_budget (RetryBudget, optional): Bounds page retries, shared when
+                many documents are transcribed at once.
+            return_metrics (bool): Also return the DocumentMetrics of the document.
+            page_bytes_budget (ByteBudget, optional): Bounds the rendered page
+                images of documents over max_inflight_page_bytes, shared when
+                many documents are transcribed at once.
         Returns:
             The result of the transcription process, typically the path or identifier
-            of the transcribed document.
+            of the transcribed document, with return_metrics a tuple of it and the
+            DocumentMetrics (tokens, LLM latency and attempts per page, storage,
+            render and checkpoint seconds).
 
         Raises:
             Exception: If an error occurs during the transcription process.
         """
+        metrics_recorder = MetricsRecorder(
+            file_key, "transcription", self.memory_profiler
+        )
         try:
             if not validate_file_name_format(file_key):
                 raise ValueError(
@@ -153,36 +266,113 @@ class TranscriptionManager:
                 self.target_storage_route,
             )
             persistence_service = persistence_layer.retrieve_storage_service()
+            checkpoint_store = None
+            if self.checkpoint_route:
+                checkpoint_store = persistence_layer.retrieve_checkpoint_store(
+                    self.checkpoint_route
+                )
 
             transcribe_document_service = TranscriptionService(
-                ai_application_service=self.vertex_model,
+                ai_application_service=self.ai_application_service,
                 persistence_service=persistence_service,
                 target_language=self.target_language,
                 transcription_additional_instructions=self.transcription_additional_instructions,
                 transcription_accuracy_threshold=self.transcription_accuracy_threshold,
                 max_transcription_retries=self.max_transcription_retries,
+                llm_semaphore=llm_semaphore,
+                checkpoint_store=checkpoint_store,
+                max_page_attempts=self.max_page_attempts,
+                retry_budget=retry_budget,
+                fast_chat_model=self.fast_chat_model,
+                cascade_policy=self.cascade_policy,
+                cascade_stats=self.cascade_stats,
+                max_inflight_page_bytes=self.memory_policy.max_inflight_page_bytes,
+                page_bytes_budget=page_bytes_budget,
             )
             (
                 parsed_pages,
                 parsed_document,
-            ) = await transcribe_document_service.process_document(file_key)
+            ) = await transcribe_document_service.process_document(
+                file_key, metrics_recorder
+            )
             source_storage_file_tags = {}
-            if persistence_service.supports_tagging:
-                # source_storage_file_tags.tag_file(file_key, {"status": "transcribed"})
-                source_storage_file_tags = persistence_service.retrieve_file_tags(
-                    file_key, self.source_storage_route
+            with metrics_recorder.measure("storage"):
+                if persistence_service.supports_tagging:
+                    # source_storage_file_tags.tag_file(file_key, {"status": "transcribed"})
+                    source_storage_file_tags = await asyncio.to_thread(
+                        persistence_service.retrieve_file_tags,
+                        file_key,
+                        self.source_storage_route,
+                    )
+                await asyncio.to_thread(
+                    transcribe_document_service.save_parsed_document,
+                    f"{file_key}.md",
+                    parsed_document,
+                    source_storage_file_tags,
+                )
+            # pages left untranscribed keep the checkpoints of the others
+            if not self.keep_checkpoints and all(
+                page.page_text is not None for page in parsed_pages
+            ):
+                await asyncio.to_thread(
+                    transcribe_document_service.discard_checkpoints, file_key
                 )
-            transcribe_document_service.save_parsed_document(
-                f"{file_key}.md", parsed_document, source_storage_file_tags
-            )
             # create md document from parsed_pages
             print("parsed_pages", len(parsed_pages))
             # print("parsed_document", parsed_document)
+            metrics = self._emit_metrics(metrics_recorder)
+            if return_metrics:
+                return f"{file_key}.md", metrics
             return f"{file_key}.md"
         except Exception as e:
             print(f"Error processing document: {e}")
             raise e
 
+    async def transcribe_documents_many(
+        self,
+        file_keys: list[str],
+        max_concurrent_documents: int = 4,
+        max_concurrent_llm_calls: int = 16,
+        return_metrics: bool = False,
+    ) -> AsyncIterator[DocumentBatchResult]:
+        """Transcribe many documents concurrently.
+
+        All documents share a single budget of concurrent page transcriptions,
+        a single budget of page retries and, with max_inflight_page_bytes, a
+        single budget of rendered page bytes.
+        Results are yielded as soon as each document finishes, and a failing
+        document is reported in its result without cancelling the batch.
+
+        Args:
+            file_keys (list[str]): Keys of the files to be transcribed.
+            max_concurrent_documents (int): Maximum documents transcribed at once.
+            max_concurrent_llm_calls (int): Maximum page transcriptions in flight
+                across all documents.
+            return_metrics (bool): Set the DocumentMetrics of every transcribed
+                document in its result.
+        Yields:
+            DocumentBatchResult with the transcribed document key or the error.
+        """
+        llm_semaphore = asyncio.Semaphore(max_concurrent_llm_calls)
+        retry_budget = RetryBudget()
+        page_bytes_budget = None
+        if self.memory_policy.max_inflight_page_bytes is not None:
+            page_bytes_budget = ByteBudget(self.memory_policy.max_inflight_page_bytes)
+        async for document_result in process_documents_concurrently(
+            file_keys,
+            lambda file_key: self.transcribe_document(
+                file_key,
+                llm_semaphore=llm_semaphore,
+                retry_budget=retry_budget,
+                return_metrics=return_metrics,
+                page_bytes_budget=page_bytes_budget,
+            ),
+            max_concurrent_documents=max_concurrent_documents,
+        ):
+            if return_metrics and document_result.succeeded:
+                document_result.result, document_result.metrics = document_result.result
+            yield document_result
+
 
 class ChunksManager:
     def __init__(
@@ -193,11 +383,13 @@ class ChunksManager:
         langsmith_api_key: str,
         langsmith_project_name: str,
         storage_service: storage_services,
-        kdb_service: Literal["redis", "chroma"],
+        kdb_service: kdb_services,
         kdb_params: Dict[Any, Any],
         llm_model_id: str = "claude-3-5-haiku@20241022",
         embeddings_model_id: str = "text-multilingual-embedding-002",
         target_language: str = "es",
+        embeddings_dimensions: int | None = None,
+        tracing_policy: TracingPolicy | None = None,
     ):
         self.gcp_project_id = gcp_project_id
         self.gcp_project_location = gcp_project_location
@@ -211,11 +403,15 @@ class ChunksManager:
         self.kdb_service = kdb_service
         self.vertex_model = self._get_vertex_model()
         self.embeddings_model = self.vertex_model.load_embeddings_model(
-            embeddings_model_id
+            embeddings_model_id, embeddings_dimensions
         )
         self.langsmith_api_key = langsmith_api_key
         self.langsmith_project_name = langsmith_project_name
-        self.langsmith_client = Client(api_key=self.langsmith_api_key)
+        # off, sampled, errors_only or always, payloads are redacted before upload
+        self.langsmith_tracing = LangSmithTracing(
+            self.langsmith_api_key, self.langsmith_project_name, tracing_policy
+        )
+        self.langsmith_client = self.langsmith_tracing.client
 
     def _get_gcp_sa_dict(self, gcp_secret_name: str):
         vertex_gcp_sa = self.aws_secrets_manager.get_secret(gcp_secret_name)
@@ -223,7 +419,7 @@ class ChunksManager:
         return vertex_gcp_sa_dict
 
     def _get_vertex_model(self):
-        vertex_model = VertexModels(
+        vertex_model = VertexModels.shared(
             self.gcp_project_id,
             self.gcp_project_location,
             self.gcp_sa_dict,
@@ -233,15 +429,15 @@ class ChunksManager:
 
     def tracing(func):
         async def gen_tracing_context(self, *args, **kwargs):
-            with tracing_context(
-                enabled=True,
-                project_name=self.langsmith_project_name,
-                client=self.langsmith_client,
-            ):
+            with self.langsmith_tracing.trace():
                 return await func(self, *args, **kwargs)
 
         return gen_tracing_context
 
+    def get_tracing_stats(self) -> dict:
+        """Calls traced under the tracing policy and the cost of the redaction."""
+        return self.langsmith_tracing.get_stats()
+
     @tracing
     async def gen_context_chunks(
         self, file_key: str, source_storage_route: str, target_storage_route: str
@@ -260,6 +456,11 @@ class ChunksManager:
                 target_bucket_file_tags = persistence_service.retrieve_file_tags(
                     file_key, target_storage_route
                 )
+            from .application.context_chunk_service import (
+                ContextChunksInDocumentService,
+            )
+            from .infra.rag.semantic_chunks import SemanticChunks
+
             rag_chunker = SemanticChunks(self.embeddings_model)
             kdb_manager = KdbManager(
                 self.embeddings_model, self.kdb_service, self.kdb_params
@@ -1,20 +1,29 @@
+import asyncio
 import json
 from logging import getLogger
-from typing import Any, Dict, Literal
+from typing import Any, AsyncIterator, Dict, Literal
 
 from langchain_core.documents import Document
-from langsmith import Client, tracing_context
 
 from .application.context_chunk_service import ContextChunksInDocumentService
 from .application.kdb_service import KdbService
+from .data.kdb import kdb_services
 from .data.storage import StorageServices
-from .infra.persistence.local_storage import LocalStorageService
-from .infra.persistence.s3_storage import S3StorageService
+from .infra.cache.memory_search_cache import InMemorySearchResultCache
+from .infra.cache.sqlite_context_cache import SqliteContextCache
+from .infra.rag.cached_embeddings import CachedQueryEmbeddings
+from .infra.rag.kdb_registry import create_embeddings_manager
+from .infra.rag.measured_embeddings import MeasuredEmbeddings
 from .infra.rag.pg_embeddings import PgEmbeddingsManager
 from .infra.rag.semantic_chunks import SemanticChunks
 from .infra.secrets.aws_secrets_manager import AwsSecretsManager
+from .infra.tracing.langsmith_tracing import LangSmithTracing
 from .infra.vertex_model import VertexModels
+from .domain.models import DocumentBatchResult, MemoryPolicy, TracingPolicy
+from .utils.concurrency_utils import RetryBudget, process_documents_concurrently
 from .utils.file_utils import validate_file_name_format
+from .utils.memory_utils import MemoryProfiler
+from .utils.metrics_utils import MetricsRecorder
 
 logger = getLogger(__name__)
 
@@ -53,11 +62,15 @@ class PersistenceManager:
 
     def retrieve_storage_service(self):
         if self.storage_service == StorageServices.S3.value:
+            from .infra.persistence.s3_storage import S3StorageService
+
             return S3StorageService(
                 origin_bucket_name=self.source_storage_route,
                 target_bucket_name=self.target_storage_route,
             )
         elif self.storage_service == StorageServices.LOCAL.value:
+            from .infra.persistence.local_storage import LocalStorageService
+
             return LocalStorageService(
                 source_storage_route=self.source_storage_route,
                 target_storage_route=self.target_storage_route,
@@ -74,16 +87,17 @@ class PgKdbProvisioningManager:
         gcp_secret_name: str,
         embeddings_model_id: str,
         kdb_params: Dict[Any, Any],
+        embeddings_dimensions: int | None = None,
     ):
         self.aws_secrets_manager = AwsSecretsManager()
         vertex_gcp_sa = self.aws_secrets_manager.get_secret(gcp_secret_name)
         vertex_gcp_sa_dict = json.loads(vertex_gcp_sa)
 
-        self.vertex_model = VertexModels(
+        self.vertex_model = VertexModels.shared(
             gcp_project_id, gcp_project_location, vertex_gcp_sa_dict
         )
         self.embeddings_model = self.vertex_model.load_embeddings_model(
-            embeddings_model_id
+            embeddings_model_id, embeddings_dimensions
         )
 
         self.pg_embeddings_manager = PgEmbeddingsManager(
@@ -93,10 +107,17 @@ class PgKdbProvisioningManager:
             self.pg_embeddings_manager,
         )
 
-    def provision_vector_store(self):
+    def provision_vector_store(self, **index_params):
+        """
+        Create the vector store tables and their vector index.
+
+        Args:
+            **index_params: Vector index settings (index_type, m, ef_construction,
+                lists, replace), see PgEmbeddingsManager.create_index
+        """
         try:
             self.kdb_service.configure_kdb()
-            self.kdb_service.create_vector_store_hsnw_index()
+            self.kdb_service.create_vector_store_hsnw_index(**index_params)
         except Exception as e:
             logger.error(f"Error configuring vector store: {e}")
 
@@ -110,11 +131,25 @@ class ChunksManager:
         langsmith_api_key: str,
         langsmith_project_name: str,
         storage_service: Literal["s3", "local"],
-        kdb_service_name: Literal["pg"],
+        kdb_service_name: kdb_services,
         kdb_params: Dict[Any, Any],
         llm_model_id: str = "claude-3-5-haiku@20241022",
         embeddings_model_id: str = "text-multilingual-embedding-002",
         target_language: str = "es",
+        context_cache_path: str | None = None,
+        context_cache_ttl_seconds: int = 30 * 24 * 60 * 60,
+        context_cache_max_entries: int = 100_000,
+        embeddings_dimensions: int | None = None,
+        query_embeddings_cache_size: int = 1024,
+        search_cache_ttl_seconds: float = 30,
+        search_cache_max_entries: int = 1024,
+        cross_encoder_model: str | None = None,
+        rerank_batch_size: int = 32,
+        max_chunk_attempts: int = 3,
+        llm_routes: list[dict] | None = None,
+        metrics_sinks: list | None = None,
+        tracing_policy: TracingPolicy | None = None,
+        memory_policy: MemoryPolicy | None = None,
     ):
         self.gcp_project_id = gcp_project_id
         self.gcp_project_location = gcp_project_location
@@ -126,31 +161,89 @@ class ChunksManager:
         self.storage_service = storage_service
         self.kdb_params = kdb_params
         self.kdb_service_name = kdb_service_name
+        # peak memory per stage in the DocumentMetrics when profiling, longer
+        # documents than max_full_context_chars send chunks a window of them
+        self.memory_policy = memory_policy or MemoryPolicy()
+        self.memory_profiler = None
+        if self.memory_policy.profile_memory:
+            self.memory_profiler = MemoryProfiler(self.memory_policy.memray_output_dir)
+        # failing chunk contexts are retried with backoff, then left unindexed
+        self.max_chunk_attempts = max_chunk_attempts
+        # DocumentMetrics of every chunked document are emitted to these
+        # (e.g. LoggingMetricsSink, OpenTelemetryMetricsSink in infra.metrics)
+        self.metrics_sinks = metrics_sinks or []
         self.vertex_model = self._get_vertex_model()
+        # chunk contexts spread over several providers / regions when given,
+        # see infra.model_router.create_model_router for the route settings
+        self.ai_application_service = self.vertex_model
+        if llm_routes:
+            from .infra.model_router import create_model_router
+
+            self.ai_application_service = create_model_router(
+                llm_routes, gcp_project_id, self.gcp_sa_dict
+            )
         self.embeddings_model = self.vertex_model.load_embeddings_model(
-            embeddings_model_id
+            embeddings_model_id, embeddings_dimensions
         )
         self.langsmith_api_key = langsmith_api_key
         self.langsmith_project_name = langsmith_project_name
-        self.langsmith_client = Client(api_key=self.langsmith_api_key)
-        self.pg_embeddings_manager = PgEmbeddingsManager(
-            self.embeddings_model, **self.kdb_params
+        # off, sampled, errors_only or always, payloads are redacted before upload
+        self.langsmith_tracing = LangSmithTracing(
+            self.langsmith_api_key, self.langsmith_project_name, tracing_policy
         )
+        self.langsmith_client = self.langsmith_tracing.client
+        # repeated queries skip the remote embedding call, 0 disables the cache
+        self.query_embeddings_model = self.embeddings_model
+        if query_embeddings_cache_size:
+            self.query_embeddings_model = CachedQueryEmbeddings(
+                self.embeddings_model, max_entries=query_embeddings_cache_size
+            )
+        self.embeddings_manager = self._get_embeddings_manager()
+        # kept for callers of the postgres only version
+        self.pg_embeddings_manager = self.embeddings_manager
+        search_cache = None
+        if search_cache_ttl_seconds:
+            search_cache = InMemorySearchResultCache(
+                ttl_seconds=search_cache_ttl_seconds,
+                max_entries=search_cache_max_entries,
+            )
+        reranker = None
+        if cross_encoder_model:
+            # sentence-transformers is only needed when re-ranking is enabled
+            from .infra.rag.cross_encoder_reranker import CrossEncoderReranker
+
+            reranker = CrossEncoderReranker(
+                cross_encoder_model, batch_size=rerank_batch_size
+            )
         self.kdb_service = KdbService(
-            self.pg_embeddings_manager,
+            self.embeddings_manager,
+            search_cache=search_cache,
+            reranker=reranker,
         )
         # self.pg_kdb_manager = PgKdbManager(self.embeddings_model, self.kdb_params)
         # self.pg_embeddings_manager = self.pg_kdb_manager.pg_embeddings_manager
         # self.kdb_service = self.pg_kdb_manager.kdb_service
         self.rag_chunker = SemanticChunks(self.embeddings_model)
+        self.context_cache = None
+        if context_cache_path:
+            self.context_cache = SqliteContextCache(
+                context_cache_path,
+                ttl_seconds=context_cache_ttl_seconds,
+                max_entries=context_cache_max_entries,
+            )
 
     def _get_gcp_sa_dict(self, gcp_secret_name: str):
         vertex_gcp_sa = self.aws_secrets_manager.get_secret(gcp_secret_name)
         vertex_gcp_sa_dict = json.loads(vertex_gcp_sa)
         return vertex_gcp_sa_dict
 
+    def _get_embeddings_manager(self):
+        return create_embeddings_manager(
+            self.kdb_service_name, self.query_embeddings_model, **self.kdb_params
+        )
+
     def _get_vertex_model(self):
-        vertex_model = VertexModels(
+        vertex_model = VertexModels.shared(
             self.gcp_project_id,
             self.gcp_project_location,
             self.gcp_sa_dict,
@@ -171,8 +264,82 @@ class ChunksManager:
         except Exception as e:
             logger.error(f"Error indexing documents in vector store: {e}")
 
-    def search_records(self, query: str):
-        return self.kdb_service.search(query)
+    def bulk_index_documents_in_vector_store(self, docs: list[Document]):
+        """Re-index chunks of many files, embedding only new chunks, in one pass."""
+        try:
+            return self.kdb_service.bulk_index_documents_in_vector_store(docs)
+        except Exception as e:
+            logger.error(f"Error bulk indexing documents in vector store: {e}")
+            raise
+
+    def search_records(
+        self,
+        query: str,
+        k: int = 5,
+        filters: dict | None = None,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+    ):
+        """
+        Search chunks, filters narrow the search to metadata values (e.g. sources).
+
+        The "mmr" search type runs the retrieve pipeline: fetch_k candidates,
+        MMR over their stored vectors and the cross encoder when configured.
+        """
+        if search_type == "mmr":
+            return self.kdb_service.retrieve(
+                query, k=k, filters=filters, fetch_k=fetch_k
+            )
+        return self.kdb_service.search(
+            query, k=k, filters=filters, search_type=search_type, fetch_k=fetch_k
+        )
+
+    def retrieve_records(
+        self,
+        query: str,
+        k: int = 5,
+        filters: dict | None = None,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        use_mmr: bool = True,
+        rerank_k: int | None = None,
+    ) -> list[Document]:
+        """Retrieve chunks with MMR and the optional cross encoder, see KdbService.retrieve."""
+        return self.kdb_service.retrieve(
+            query,
+            k=k,
+            filters=filters,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            use_mmr=use_mmr,
+            rerank_k=rerank_k,
+        )
+
+    def search_records_many(
+        self,
+        queries: list[str],
+        k: int = 5,
+        filters: dict | None = None,
+        search_type: str = "similarity",
+        fetch_k: int = 20,
+    ) -> list[list[Document]]:
+        """Search chunks for many queries at once, results follow the queries order."""
+        return self.kdb_service.search_many(
+            queries, k=k, filters=filters, search_type=search_type, fetch_k=fetch_k
+        )
+
+    def get_retrieval_stats(self) -> dict:
+        """Search latency percentiles and hit rates of the retrieval caches."""
+        stats = self.kdb_service.get_search_stats()
+        if isinstance(self.query_embeddings_model, CachedQueryEmbeddings):
+            stats["query_embeddings_cache"] = self.query_embeddings_model.get_stats()
+        return stats
+
+    def get_llm_route_stats(self) -> dict:
+        """Calls, throttles and latency by route of the model router, if any."""
+        if hasattr(self.ai_application_service, "get_stats"):
+            return self.ai_application_service.get_stats()
+        return {}
 
     def search_documents_by_file_name(self, file_name: str):
         return self.kdb_service.retrieve_documents_by_file_name(file_name)
@@ -182,19 +349,55 @@ class ChunksManager:
 
     def tracing(func):
         async def gen_tracing_context(self, *args, **kwargs):
-            with tracing_context(
-                enabled=True,
-                project_name=self.langsmith_project_name,
-                client=self.langsmith_client,
-            ):
+            with self.langsmith_tracing.trace():
                 return await func(self, *args, **kwargs)
 
         return gen_tracing_context
 
+    def get_tracing_stats(self) -> dict:
+        """Calls traced under the tracing policy and the cost of the redaction."""
+        return self.langsmith_tracing.get_stats()
+
+    def memory_profiling(func):
+        async def gen_memory_profiling_session(self, *args, **kwargs):
+            if self.memory_profiler is None:
+                return await func(self, *args, **kwargs)
+            with self.memory_profiler.session():
+                return await func(self, *args, **kwargs)
+
+        return gen_memory_profiling_session
+
     @tracing
+    @memory_profiling
     async def gen_context_chunks(
-        self, file_key: str, source_storage_route: str, target_storage_route: str
+        self,
+        file_key: str,
+        source_storage_route: str,
+        target_storage_route: str,
+        llm_semaphore: asyncio.Semaphore | None = None,
+        retry_budget: RetryBudget | None = None,
+        return_metrics: bool = False,
     ):
+        """Generate the context chunks of a markdown document.
+
+        Args:
+            file_key: Key of the markdown document
+            source_storage_route: Source storage route (bucket or folder)
+            target_storage_route: Target storage route (bucket or folder)
+            llm_semaphore: Bounds concurrent context workflow calls, shared when
+                many documents are processed at once
+            retry_budget: Bounds chunk retries, shared when many documents are
+                processed at once
+            return_metrics: Also return the DocumentMetrics of the document
+
+        Returns:
+            The context chunks, with return_metrics a tuple of them and the
+            DocumentMetrics (tokens, LLM latency and attempts per chunk, storage,
+            chunking, embed and db seconds)
+        """
+        metrics_recorder = MetricsRecorder(
+            file_key, "context_chunks", self.memory_profiler
+        )
         try:
             validate_file_name_format(file_key)
             persistence_layer = PersistenceManager(
@@ -203,25 +406,85 @@ class ChunksManager:
             persistence_service = persistence_layer.retrieve_storage_service()
             target_bucket_file_tags = {}
             if persistence_service.supports_tagging:
-                target_bucket_file_tags = persistence_service.retrieve_file_tags(
-                    file_key, target_storage_route
-                )
-            rag_chunker = SemanticChunks(self.embeddings_model)
+                with metrics_recorder.measure("storage"):
+                    target_bucket_file_tags = persistence_service.retrieve_file_tags(
+                        file_key, target_storage_route
+                    )
+            rag_chunker = SemanticChunks(
+                MeasuredEmbeddings(self.embeddings_model, metrics_recorder)
+            )
             # kdb_manager = KdbManager(self.embeddings_model, self.kdb_params)
             # kdb_service = kdb_manager.retrieve_kdb_service()
             context_chunks_in_document_service = ContextChunksInDocumentService(
-                ai_application_service=self.vertex_model,
+                ai_application_service=self.ai_application_service,
                 persistence_service=persistence_service,
                 rag_chunker=rag_chunker,
-                embeddings_manager=self.pg_embeddings_manager,
+                embeddings_manager=self.embeddings_manager,
                 target_language=self.target_language,
+                context_cache=self.context_cache,
+                llm_semaphore=llm_semaphore,
+                max_chunk_attempts=self.max_chunk_attempts,
+                retry_budget=retry_budget,
+                max_full_context_chars=self.memory_policy.max_full_context_chars,
             )
             context_chunks = (
                 await context_chunks_in_document_service.get_context_chunks_in_document(
-                    file_key, target_bucket_file_tags
+                    file_key, target_bucket_file_tags, metrics_recorder
                 )
             )
+            metrics = metrics_recorder.finish()
+            for metrics_sink in self.metrics_sinks:
+                metrics_sink.emit(metrics)
+            if return_metrics:
+                return context_chunks, metrics
             return context_chunks
         except Exception as e:
             print(f"Error getting context chunks in document: {e}")
             raise e
+
+    async def gen_context_chunks_many(
+        self,
+        file_keys: list[str],
+        source_storage_route: str,
+        target_storage_route: str,
+        max_concurrent_documents: int = 4,
+        max_concurrent_llm_calls: int = 16,
+        return_metrics: bool = False,
+    ) -> AsyncIterator[DocumentBatchResult]:
+        """Generate context chunks for many documents concurrently.
+
+        All documents share a single budget of concurrent LLM calls and a single
+        budget of chunk retries. Results are yielded as soon as each document
+        finishes, and a failing document is reported in its result without
+        cancelling the rest of the batch.
+
+        Args:
+            file_keys: Keys of the markdown documents to chunk
+            source_storage_route: Source storage route (bucket or folder)
+            target_storage_route: Target storage route (bucket or folder)
+            max_concurrent_documents: Maximum number of documents processed at once
+            max_concurrent_llm_calls: Maximum context workflow calls in flight
+                across all documents
+            return_metrics: Set the DocumentMetrics of every processed document
+                in its result
+
+        Yields:
+            DocumentBatchResult with the context chunks or the error of a document
+        """
+        llm_semaphore = asyncio.Semaphore(max_concurrent_llm_calls)
+        retry_budget = RetryBudget()
+        async for document_result in process_documents_concurrently(
+            file_keys,
+            lambda file_key: self.gen_context_chunks(
+                file_key,
+                source_storage_route,
+                target_storage_route,
+                llm_semaphore=llm_semaphore,
+                retry_budget=retry_budget,
+                return_metrics=return_metrics,
+            ),
+            max_concurrent_documents=max_concurrent_documents,
+        ):
+            if return_metrics and document_result.succeeded:
+                document_result.result, document_result.metrics = document_result.result
+            yield document_result
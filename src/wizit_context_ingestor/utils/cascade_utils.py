@@ -0,0 +1,80 @@
+import threading
+from collections import defaultdict
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+
+from .latency_utils import LatencyRecorder
+
+FAST_TIER = "fast"
+STRONG_TIER = "strong"
+
+
+class CascadeStats:
+    """
+    Pages, escalations, latency and token usage of a transcription cascade by tier.
+
+    A page is counted in the tier that delivered its transcription. Latency and
+    tokens are counted in the tier whose workflow spent them, so an escalated
+    page adds to both tiers. Shared between the documents of a batch.
+    """
+
+    def __init__(self, window_size: int = 1024):
+        """
+        Initialize the CascadeStats.
+
+        Args:
+            window_size: Number of recent workflow runs kept per tier for the
+                latency percentiles
+        """
+        self.latency_recorder = LatencyRecorder(window_size)
+        self.usage_handlers = {
+            FAST_TIER: UsageMetadataCallbackHandler(),
+            STRONG_TIER: UsageMetadataCallbackHandler(),
+        }
+        self._pages: dict[str, int] = defaultdict(int)
+        self._escalated = 0
+        self._lock = threading.Lock()
+
+    def record_page(self, tier: str):
+        with self._lock:
+            self._pages[tier] += 1
+
+    def record_escalation(self):
+        with self._lock:
+            self._escalated += 1
+
+    def summary(self) -> dict:
+        """
+        Per tier page share, workflow latency and token usage.
+
+        Returns:
+            The total and escalated pages, and per tier the pages delivered, their
+            share, the p50/p95 workflow latency and the input/output tokens by model
+        """
+        with self._lock:
+            pages = dict(self._pages)
+            escalated = self._escalated
+        total_pages = sum(pages.values())
+        latencies = self.latency_recorder.summary()
+        tiers = {}
+        for tier, usage_handler in self.usage_handlers.items():
+            usage_by_model = {
+                model_name: {
+                    "input_tokens": usage.get("input_tokens", 0),
+                    "output_tokens": usage.get("output_tokens", 0),
+                }
+                for model_name, usage in dict(usage_handler.usage_metadata).items()
+            }
+            tiers[tier] = {
+                "pages": pages.get(tier, 0),
+                "share": pages.get(tier, 0) / total_pages if total_pages else 0.0,
+                "latency": latencies.get(tier, {}),
+                "input_tokens": sum(
+                    usage["input_tokens"] for usage in usage_by_model.values()
+                ),
+                "output_tokens": sum(
+                    usage["output_tokens"] for usage in usage_by_model.values()
+                ),
+                "usage_by_model": usage_by_model,
+            }
+        return {"pages": total_pages, "escalated": escalated, "tiers": tiers}
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import random
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional, Sequence
+
+from ..domain.models import DocumentBatchResult, GatherResult, TaskFailure
+
+logger = logging.getLogger(__name__)
+
+
+async def process_documents_concurrently(
+    file_keys: Iterable[str],
+    process_document: Callable[[str], Awaitable[Any]],
+    max_concurrent_documents: int = 4,
+) -> AsyncIterator[DocumentBatchResult]:
+    """Process documents concurrently, yielding each result as soon as it finishes.
+
+    A failing document is reported in its result instead of cancelling the batch.
+
+    Args:
+        file_keys: Keys of the documents to process
+        process_document: Coroutine function processing a single document key
+        max_concurrent_documents: Maximum number of documents processed at once
+
+    Yields:
+        DocumentBatchResult for every document, in completion order
+    """
+    if max_concurrent_documents < 1:
+        raise ValueError("max_concurrent_documents must be at least 1")
+    documents_semaphore = asyncio.Semaphore(max_concurrent_documents)
+
+    async def process(file_key: str) -> DocumentBatchResult:
+        async with documents_semaphore:
+            try:
+                return DocumentBatchResult(
+                    file_key=file_key, result=await process_document(file_key)
+                )
+            except Exception as e:
+                logger.error(f"Error processing document {file_key}: {e}")
+                return DocumentBatchResult(file_key=file_key, error=e)
+
+    tasks = [asyncio.create_task(process(file_key)) for file_key in file_keys]
+    try:
+        for finished_task in asyncio.as_completed(tasks):
+            yield await finished_task
+    finally:
+        # consumer stopped early, do not leave documents running in background
+        for task in tasks:
+            task.cancel()
+
+
+class RetryBudget:
+    """
+    Retries allowed across many items, shared to keep retries from piling up.
+
+    Every item run deposits retry_ratio retries and min_retries are always
+    available, so a flaky provider gets its failures retried while an outage
+    adds at most retry_ratio extra calls per item instead of multiplying the
+    load by the attempts. Meant to be shared within one event loop.
+    """
+
+    __slots__ = ("retry_ratio", "min_retries", "items", "retries")
+
+    def __init__(self, retry_ratio: float = 0.2, min_retries: int = 10):
+        if retry_ratio < 0 or min_retries < 0:
+            raise ValueError("retry_ratio and min_retries must not be negative")
+        self.retry_ratio = retry_ratio
+        self.min_retries = min_retries
+        self.items = 0
+        self.retries = 0
+
+    def record_item(self):
+        self.items += 1
+
+    def try_spend(self) -> bool:
+        """Take a retry from the budget, False when it is exhausted."""
+        if self.retries < self.min_retries + self.retry_ratio * self.items:
+            self.retries += 1
+            return True
+        return False
+
+
+class ByteBudget:
+    """
+    Bytes held at once by concurrent tasks, e.g. the rendered images of pages.
+
+    A task waits until its bytes fit in the budget. A task is always let in when
+    nothing is held, so an item bigger than the budget runs alone instead of
+    blocking forever. Meant to be shared within one event loop.
+    """
+
+    __slots__ = ("max_bytes", "held_bytes", "peak_bytes", "_condition")
+
+    def __init__(self, max_bytes: int):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.max_bytes = max_bytes
+        self.held_bytes = 0
+        self.peak_bytes = 0
+        self._condition = asyncio.Condition()
+
+    def _hold(self, num_bytes: int):
+        self.held_bytes += num_bytes
+        self.peak_bytes = max(self.peak_bytes, self.held_bytes)
+        self._condition.notify_all()
+
+    async def acquire(self, num_bytes: int):
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: (
+                    not self.held_bytes or self.held_bytes + num_bytes <= self.max_bytes
+                )
+            )
+            self._hold(num_bytes)
+
+    async def resize(self, held_bytes: int, num_bytes: int):
+        """Replace held_bytes acquired on an estimate by the measured num_bytes."""
+        async with self._condition:
+            self._hold(num_bytes - held_bytes)
+
+    async def release(self, num_bytes: int):
+        async with self._condition:
+            self._hold(-num_bytes)
+
+
+def backoff_delay(
+    attempt: int, base_delay_seconds: float, max_delay_seconds: float
+) -> float:
+    """Exponential backoff with full jitter for the retry after an attempt."""
+    return random.uniform(
+        0, min(max_delay_seconds, base_delay_seconds * 2 ** (attempt - 1))
+    )
+
+
+async def gather_with_retries(
+    items: Sequence[Any],
+    run_item: Callable[[Any], Awaitable[Any]],
+    max_attempts: int = 3,
+    base_delay_seconds: float = 1.0,
+    max_delay_seconds: float = 30.0,
+    retry_budget: Optional[RetryBudget] = None,
+    is_retryable: Optional[Callable[[Exception], bool]] = None,
+) -> GatherResult:
+    """Run items concurrently, collecting successes and failures.
+
+    Unlike asyncio.gather a failing item does not hide the others: every item
+    runs to completion and failures are returned next to the results. Failed
+    items are retried after a jittered exponential backoff while attempts and
+    the retry budget last, sleeping outside of any semaphore held by run_item.
+
+    Args:
+        items: Items to run
+        run_item: Coroutine function running a single item
+        max_attempts: Maximum attempts of an item, 1 disables retries
+        base_delay_seconds: Backoff before the first retry, doubled by attempt
+        max_delay_seconds: Maximum backoff before a retry
+        retry_budget: Budget of retries, shared between calls to bound the
+            retries of a batch, a budget of this call is used when None
+        is_retryable: Tells whether an error is worth retrying, all by default
+
+    Returns:
+        GatherResult with the results in the order of items (None for failed
+        items), the failures and the retries spent
+    """
+    if max_attempts < 1:
+        raise ValueError("max_attempts must be at least 1")
+    if retry_budget is None:
+        retry_budget = RetryBudget()
+    retries = 0
+
+    async def run(index: int, item: Any) -> Any:
+        nonlocal retries
+        retry_budget.record_item()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await run_item(item)
+            except Exception as e:
+                retryable = is_retryable(e) if is_retryable is not None else True
+                if (
+                    not retryable
+                    or attempt >= max_attempts
+                    or not retry_budget.try_spend()
+                ):
+                    return TaskFailure(
+                        index=index, error=e, attempts=attempt, retryable=retryable
+                    )
+                retries += 1
+                delay = backoff_delay(attempt, base_delay_seconds, max_delay_seconds)
+                logger.warning(
+                    f"Attempt {attempt} of item {index} failed, retrying in {delay:.2f}s: {e}"
+                )
+                await asyncio.sleep(delay)
+
+    outcomes = await asyncio.gather(
+        *[run(index, item) for index, item in enumerate(items)]
+    )
+    failures = [outcome for outcome in outcomes if isinstance(outcome, TaskFailure)]
+    return GatherResult(
+        results=[
+            None if isinstance(outcome, TaskFailure) else outcome
+            for outcome in outcomes
+        ],
+        failures=failures,
+        retries=retries,
+    )
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Iterator
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest rank percentile of the values, 0 when there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[rank]
+
+
+class LatencyRecorder:
+    """
+    Latencies of named operations over a window of their most recent calls.
+
+    Percentiles are computed over the last window_size calls of each operation,
+    so they follow the current load and memory stays bounded.
+    """
+
+    def __init__(self, window_size: int = 1024):
+        """
+        Initialize the LatencyRecorder.
+
+        Args:
+            window_size: Number of recent calls kept per operation
+
+        Raises:
+            ValueError: If window_size is not positive
+        """
+        if window_size <= 0:
+            raise ValueError("window_size must be positive")
+        self.window_size = window_size
+        self._latencies: dict[str, deque[float]] = defaultdict(
+            lambda: deque(maxlen=self.window_size)
+        )
+        self._counts: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, seconds: float):
+        with self._lock:
+            self._latencies[operation].append(seconds)
+            self._counts[operation] += 1
+
+    @contextmanager
+    def measure(self, operation: str) -> Iterator[None]:
+        """Record the elapsed time of the block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(operation, time.perf_counter() - start)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Latency percentiles of every operation.
+
+        Returns:
+            Per operation, the total number of calls and the p50, p95 and max
+            milliseconds of the calls in the window
+        """
+        with self._lock:
+            windows = {
+                operation: list(latencies)
+                for operation, latencies in self._latencies.items()
+            }
+            counts = dict(self._counts)
+        return {
+            operation: {
+                "count": counts[operation],
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "max_ms": max(latencies) * 1000,
+            }
+            for operation, latencies in windows.items()
+        }
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+            self._counts.clear()
@@ -0,0 +1,112 @@
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryProfiler:
+    """
+    Peak memory of the pipeline stages of the documents being processed.
+
+    Python allocations are traced with tracemalloc while a profiling session is
+    open. The peak of the traced memory is sampled, then reset, whenever a stage
+    starts or ends, and attributed to every stage running in that interval. So
+    a stage gets the highest memory in use while it ran, including what
+    concurrent stages and documents held at the time. With memray_output_dir,
+    sessions are also captured by memray for flame graphs and leak reports.
+    Tracing slows allocations down, it is meant for profiling runs.
+    """
+
+    def __init__(self, memray_output_dir: Optional[str] = None):
+        """
+        Initialize the MemoryProfiler.
+
+        Args:
+            memray_output_dir: Optional directory receiving a memray capture file
+                per profiling session, needs memray
+
+        Raises:
+            ImportError: If memray_output_dir is set and memray is not installed
+        """
+        self.memray_output_dir = memray_output_dir
+        self._memray = None
+        if memray_output_dir:
+            try:
+                import memray
+            except ImportError as e:
+                raise ImportError(
+                    "memray is required to capture memory profiles, install it with: "
+                    "pip install 'wizit_context_ingestor[memory]'"
+                ) from e
+            self._memray = memray
+        self._lock = threading.Lock()
+        self._sessions = 0
+        self._started_tracemalloc = False
+        self._memray_tracker = None
+        # (id of the peaks dict, stage) -> [peaks, stage, running blocks]
+        self._active: Dict[Tuple[int, str], list] = {}
+
+    def _start_memray(self):
+        os.makedirs(self.memray_output_dir, exist_ok=True)
+        output_path = os.path.join(
+            self.memray_output_dir, f"memray-{os.getpid()}-{time.time_ns()}.bin"
+        )
+        self._memray_tracker = self._memray.Tracker(output_path)
+        self._memray_tracker.__enter__()
+        logger.info(f"Capturing memory profile in {output_path}")
+
+    @contextmanager
+    def session(self) -> Iterator[None]:
+        """Trace the allocations of the block, sessions may overlap."""
+        with self._lock:
+            self._sessions += 1
+            if self._sessions == 1:
+                # a tracemalloc started by the caller is left running
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._started_tracemalloc = True
+                if self._memray is not None:
+                    self._start_memray()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._sessions -= 1
+                if self._sessions == 0:
+                    if self._memray_tracker is not None:
+                        self._memray_tracker.__exit__(None, None, None)
+                        self._memray_tracker = None
+                    if self._started_tracemalloc:
+                        tracemalloc.stop()
+                        self._started_tracemalloc = False
+
+    def _sample(self):
+        if not tracemalloc.is_tracing():
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        for peaks, stage, _ in self._active.values():
+            if peak > peaks.get(stage, 0):
+                peaks[stage] = peak
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def track(self, peaks: Dict[str, int], stage: str) -> Iterator[None]:
+        """Keep in peaks[stage] the peak traced memory while the block runs."""
+        key = (id(peaks), stage)
+        with self._lock:
+            self._sample()
+            entry = self._active.setdefault(key, [peaks, stage, 0])
+            entry[2] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._sample()
+                entry[2] -= 1
+                if not entry[2]:
+                    del self._active[key]
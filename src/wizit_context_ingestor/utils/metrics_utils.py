@@ -0,0 +1,186 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from ..domain.models import DocumentMetrics, LlmCallMetrics, TaskMetrics
+from .memory_utils import MemoryProfiler
+
+
+class LlmMetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Callback handler adding the tokens and latency of every LLM call of a run to
+    a LlmCallMetrics.
+
+    Cached tokens are the cache reads reported in the input token details.
+    """
+
+    # cheap bookkeeping, run in the calling thread instead of an executor
+    run_inline = True
+
+    def __init__(self, llm_metrics: LlmCallMetrics, lock: threading.Lock):
+        super().__init__()
+        self.llm_metrics = llm_metrics
+        self._lock = lock
+        self._starts: Dict[UUID, float] = {}
+
+    def _start(self, run_id: UUID):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id)
+
+    def _end(self, run_id: UUID, usage_metadata: Optional[dict]):
+        start = self._starts.pop(run_id, None)
+        with self._lock:
+            self.llm_metrics.calls += 1
+            if start is not None:
+                self.llm_metrics.latency_seconds += time.perf_counter() - start
+            if usage_metadata:
+                self.llm_metrics.input_tokens += usage_metadata.get("input_tokens", 0)
+                self.llm_metrics.output_tokens += usage_metadata.get("output_tokens", 0)
+                self.llm_metrics.cached_tokens += (
+                    usage_metadata.get("input_token_details") or {}
+                ).get("cache_read", 0)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        usage_metadata = None
+        try:
+            generation = response.generations[0][0]
+        except IndexError:
+            generation = None
+        if isinstance(generation, ChatGeneration) and isinstance(
+            generation.message, AIMessage
+        ):
+            usage_metadata = generation.message.usage_metadata
+        self._end(run_id, usage_metadata)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, None)
+
+
+class MetricsRecorder:
+    """
+    Collects the DocumentMetrics of a document while it runs through a pipeline.
+
+    Stages (storage, render, embed, db, ...) accumulate their elapsed seconds,
+    pages and chunks get their own attempts and LLM usage through
+    llm_callback. With a memory profiler, stages also record their peak memory.
+    Safe to use from the threads and tasks of the document.
+    """
+
+    def __init__(
+        self,
+        file_key: str,
+        pipeline: str,
+        memory_profiler: Optional[MemoryProfiler] = None,
+    ):
+        """
+        Initialize the MetricsRecorder.
+
+        Args:
+            file_key: Key of the document
+            pipeline: Name of the pipeline, e.g. transcription or context_chunks
+            memory_profiler: Optional profiler recording the peak memory of the
+                stages, within one of its sessions
+        """
+        self.metrics = DocumentMetrics(file_key=file_key, pipeline=pipeline)
+        self.memory_profiler = memory_profiler
+        self._pages: Dict[int, TaskMetrics] = {}
+        self._chunks: Dict[int, TaskMetrics] = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def add_stage_seconds(self, stage: str, seconds: float):
+        with self._lock:
+            self.metrics.stage_seconds[stage] = (
+                self.metrics.stage_seconds.get(stage, 0.0) + seconds
+            )
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """Add the elapsed time of the block to the stage, also when it raises."""
+        start = time.perf_counter()
+        try:
+            with self.track_memory(stage):
+                yield
+        finally:
+            self.add_stage_seconds(stage, time.perf_counter() - start)
+
+    def track_memory(self, stage: str):
+        """Record the peak memory of the block in the stage, when profiling."""
+        if self.memory_profiler is None:
+            return nullcontext()
+        return self.memory_profiler.track(self.metrics.stage_peak_memory_bytes, stage)
+
+    def add_guardrail(self, guardrail: str):
+        """Record a guardrail that switched the document to low memory behaviour."""
+        with self._lock:
+            if guardrail not in self.metrics.guardrails:
+                self.metrics.guardrails.append(guardrail)
+
+    def _task(self, tasks: Dict[int, TaskMetrics], index: int) -> TaskMetrics:
+        with self._lock:
+            if index not in tasks:
+                tasks[index] = TaskMetrics(index=index)
+            return tasks[index]
+
+    def page(self, page_number: int) -> TaskMetrics:
+        return self._task(self._pages, page_number)
+
+    def chunk(self, chunk_index: int) -> TaskMetrics:
+        return self._task(self._chunks, chunk_index)
+
+    def llm_callback(self, task: TaskMetrics) -> LlmMetricsCallbackHandler:
+        """Callback handler to pass to the LLM calls made for a page or chunk."""
+        return LlmMetricsCallbackHandler(task.llm, self._lock)
+
+    def add_retries(self, retries: int):
+        with self._lock:
+            self.metrics.retries += retries
+
+    def add_checkpoint_error(self):
+        """Record a checkpoint or job record write that failed."""
+        with self._lock:
+            self.metrics.checkpoint_errors += 1
+
+    def finish(self) -> DocumentMetrics:
+        """Complete the metrics with the tasks in order and the total time."""
+        with self._lock:
+            self.metrics.pages = [self._pages[key] for key in sorted(self._pages)]
+            self.metrics.chunks = [self._chunks[key] for key in sorted(self._chunks)]
+            self.metrics.total_seconds = time.perf_counter() - self._start
+        return self.metrics
+
+
+def summarize_metrics(metrics: DocumentMetrics) -> dict:
+    """Totals of the metrics of a document, without the per task details."""
+    llm = metrics.llm
+    tasks = metrics.pages + metrics.chunks
+    return {
+        "file_key": metrics.file_key,
+        "pipeline": metrics.pipeline,
+        "pages": len(metrics.pages),
+        "chunks": len(metrics.chunks),
+        "failed": sum(task.failed for task in tasks),
+        "cached": sum(task.cached for task in tasks),
+        "retries": metrics.retries,
+        "checkpoint_errors": metrics.checkpoint_errors,
+        "llm_calls": llm.calls,
+        "input_tokens": llm.input_tokens,
+        "output_tokens": llm.output_tokens,
+        "cached_tokens": llm.cached_tokens,
+        "llm_seconds": llm.latency_seconds,
+        "stage_seconds": dict(metrics.stage_seconds),
+        "stage_peak_memory_bytes": dict(metrics.stage_peak_memory_bytes),
+        "guardrails": list(metrics.guardrails),
+        "total_seconds": metrics.total_seconds,
+    }
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+def maximal_marginal_relevance(
+    query_vector: np.ndarray,
+    candidate_vectors: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+) -> list[int]:
+    """Select diverse candidates with maximal marginal relevance.
+
+    Every step picks the candidate maximizing
+    lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected)).
+    Cosine similarities between candidates are computed once as a matrix, and
+    the distance of each candidate to the selection is kept as a running maximum,
+    so a step is a few vector operations over the candidates.
+
+    Args:
+        query_vector: The query vector
+        candidate_vectors: Candidate vectors, one row per candidate
+        k: Number of candidates selected
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only
+
+    Returns:
+        Indexes of the selected candidates, in selection order
+
+    Raises:
+        ValueError: If lambda_mult is not between 0 and 1
+    """
+    if not 0 <= lambda_mult <= 1:
+        raise ValueError("lambda_mult must be between 0 and 1")
+    count = len(candidate_vectors)
+    k = min(k, count)
+    if k <= 0:
+        return []
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    norms = np.linalg.norm(candidates, axis=1, keepdims=True)
+    candidates = candidates / np.where(norms == 0, 1, norms)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1)
+
+    relevance = candidates @ query
+    similarities = candidates @ candidates.T
+    redundancy = np.full(count, -np.inf, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    selected = []
+    for _ in range(k):
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        else:
+            # nothing selected yet, the most relevant candidate goes first
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarities[best], out=redundancy)
+    return selected
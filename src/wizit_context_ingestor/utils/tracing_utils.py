@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Any, Iterable, List
+
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
+
+TRACING_MODES = ("off", "sampled", "errors_only", "always")
+
+
+def is_inline_image(value: str) -> bool:
+    """Whether a string is a base64 data URL, e.g. a page image sent to the LLM."""
+    return value.startswith("data:") and ";base64," in value[:64]
+
+
+class PayloadRedactor:
+    """
+    Shrinks trace payloads before they are queued for upload.
+
+    Inline images and the values of the redacted keys are replaced by a short
+    placeholder, other strings are truncated to max_chars. Messages are reduced
+    to their type and content. Keeps the time spent and the characters removed,
+    so the cost of tracing on the hot path can be measured.
+    """
+
+    def __init__(self, max_chars: int = 4000, redacted_keys: Iterable[str] = ()):
+        """
+        Initialize the PayloadRedactor.
+
+        Args:
+            max_chars: Characters kept of every string
+            redacted_keys: Keys whose string values are replaced entirely
+
+        Raises:
+            ValueError: If max_chars is not positive
+        """
+        if max_chars <= 0:
+            raise ValueError("max_chars must be positive")
+        self.max_chars = max_chars
+        self.redacted_keys = frozenset(redacted_keys)
+        self.payloads = 0
+        self.removed_chars = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _redact(self, value: Any, removed: List[int], key: Any = None) -> Any:
+        if isinstance(value, str):
+            if key in self.redacted_keys:
+                removed[0] += len(value)
+                return f"<{key} redacted, {len(value)} chars>"
+            if is_inline_image(value):
+                removed[0] += len(value)
+                return f"<image redacted, {len(value)} chars>"
+            if len(value) > self.max_chars:
+                removed[0] += len(value) - self.max_chars
+                return f"{value[: self.max_chars]}... <{len(value) - self.max_chars} chars truncated>"
+            return value
+        if isinstance(value, dict):
+            return {
+                item_key: self._redact(item, removed, item_key)
+                for item_key, item in value.items()
+            }
+        if isinstance(value, (list, tuple)):
+            return [self._redact(item, removed) for item in value]
+        if isinstance(value, BaseMessage):
+            return {"type": value.type, "content": self._redact(value.content, removed)}
+        if isinstance(value, BaseModel):
+            # e.g. the ChatPromptValue output of prompt templates
+            return self._redact(value.model_dump(), removed)
+        return value
+
+    def __call__(self, payload: dict) -> dict:
+        start = time.perf_counter()
+        removed = [0]
+        try:
+            return self._redact(payload, removed)
+        finally:
+            with self._lock:
+                self.payloads += 1
+                self.removed_chars += removed[0]
+                self.seconds += time.perf_counter() - start
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "payloads": self.payloads,
+                "removed_chars": self.removed_chars,
+                "seconds": self.seconds,
+            }
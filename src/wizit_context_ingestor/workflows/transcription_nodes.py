@@ -12,13 +12,21 @@ from .transcription_state import TranscriptionState
 
 
 class TranscriptionNodes:
-    __slots__ = ("llm_model", "transcription_additional_instructions")
+    __slots__ = (
+        "llm_model",
+        "transcription_additional_instructions",
+        "check_llm_model",
+    )
 
-    def __init__(self, llm_model, transcription_additional_instructions):
+    def __init__(
+        self, llm_model, transcription_additional_instructions, check_llm_model=None
+    ):
         self.llm_model = llm_model
         self.transcription_additional_instructions = (
             transcription_additional_instructions
         )
+        # scores the transcriptions, the transcribing model when not given
+        self.check_llm_model = check_llm_model or llm_model
 
     def transcribe(self, state: TranscriptionState, config):
         try:
@@ -61,7 +69,6 @@ class TranscriptionNodes:
         try:
             transcription = state["transcription"]
             messages = state["messages"]
-            print("last message, ", messages[-1])
             if not transcription:
                 raise ValueError("No transcription provided")
             # parser = PydanticOutputParser(pydantic_object=TranscriptionCheck)
@@ -78,7 +85,7 @@ class TranscriptionNodes:
                     MessagesPlaceholder("messages"),
                 ]
             )
-            model_with_structured_output = self.llm_model.with_structured_output(
+            model_with_structured_output = self.check_llm_model.with_structured_output(
                 TranscriptionCheck
             )
             transcription_check_chain = prompt | model_with_structured_output
@@ -10,15 +10,21 @@ class TranscriptionWorkflow:
         "llm_model",
         "transcription_nodes",
         "transcription_additional_instructions",
+        "check_llm_model",
     )
 
-    def __init__(self, llm_model, transcription_additional_instructions):
+    def __init__(
+        self, llm_model, transcription_additional_instructions, check_llm_model=None
+    ):
         self.llm_model = llm_model
         self.transcription_additional_instructions = (
             transcription_additional_instructions
         )
+        self.check_llm_model = check_llm_model
         self.transcription_nodes = TranscriptionNodes(
-            self.llm_model, self.transcription_additional_instructions
+            self.llm_model,
+            self.transcription_additional_instructions,
+            self.check_llm_model,
         )
 
     def gen_workflow(self):
@@ -231,4 +231,4 @@ if __name__ == "__main__":
             deleted_docs = deelab_chunks_manager.delete_documents_by_file_name(
                 file_name
             )
-            print(len(deleted_docs))
+            print(deleted_docs)